@@ -1,13 +1,113 @@
+import asyncio
 from abc import ABC, abstractmethod
+from contextlib import nullcontext
+from utils.task_context import task_scope
 
 class BaseAgent(ABC):
+    # Task types this agent handles; lets TaskManager dispatch without constructing the agent
+    TASK_TYPES = ()
+
     def __init__(self, name: str):
         self.name = name
 
-    @abstractmethod
     def can_handle(self, task_type: str) -> bool:
-        pass
+        return task_type in self.TASK_TYPES
 
     @abstractmethod
     def perform_task(self, data: dict, context: dict = None):
         pass
+
+    async def perform_task_async(self, data: dict, context: dict = None):
+        """Async variant of perform_task; by default runs perform_task on a worker thread."""
+        return await asyncio.to_thread(self.perform_task, data, context)
+
+
+class LLMCall:
+    """The single LLM round trip a task needs.
+
+    ``finish(text)`` turns the completion into the task result and
+    ``on_error(exception)`` builds the result when the call fails.
+    ``task_type`` runs the call as a different task than the one requested
+    (model route, caching, metrics), e.g. the evaluation that ends an interview.
+    ``streamable=False`` keeps ``stream_task`` from showing the raw completion
+    (JSON meant for parsing, not for the reader).
+    ``validate(text)`` tells whether the completion is usable; one that isn't
+    is still passed to ``finish`` but kept out of the LLM response cache.
+    """
+
+    def __init__(self, prompt: str, finish=None, on_error=None, task_type: str = None, streamable: bool = True,
+                 validate=None):
+        self.prompt = prompt
+        self.finish = finish or (lambda text: text)
+        self.on_error = on_error or (lambda e: f"Error invoking LLM: {str(e)}")
+        self.task_type = task_type
+        self.streamable = streamable
+        self.validate = validate
+
+    def scope(self):
+        return task_scope(self.task_type) if self.task_type else nullcontext()
+
+
+class LLMAgent(BaseAgent):
+    """Base for agents whose tasks are: blocking preparation → one LLM call → post-processing.
+
+    Subclasses set ``self.llm`` (the LLM gateway) and implement ``prepare_task``.
+    The sync path blocks a thread on the LLM call; the async path only runs the
+    preparation (PDF parsing, scraping, ...) on a thread and awaits the LLM call
+    on the event loop, so many calls can be in flight without a thread each.
+    """
+
+    @abstractmethod
+    def prepare_task(self, data: dict, context: dict = None):
+        """Return an ``LLMCall``, or the final result when no LLM call is needed."""
+
+    def perform_task(self, data: dict, context: dict = None):
+        call = self.prepare_task(data, context)
+        if not isinstance(call, LLMCall):
+            return call
+        with call.scope():
+            try:
+                text = self.llm.invoke(call.prompt, validate=call.validate)
+            except Exception as e:
+                return call.on_error(e)
+            return call.finish(text)
+
+    def stream_task(self, data: dict, context: dict = None):
+        """Like ``perform_task``, but yields ``("token", text)`` while the model writes, then ``("result", result)``.
+
+        The result is the same value ``perform_task`` would return; tokens are a preview of it.
+        """
+        call = self.prepare_task(data, context)
+        if not isinstance(call, LLMCall):
+            yield "result", call
+            return
+        with call.scope():
+            if not call.streamable:
+                try:
+                    text = self.llm.invoke(call.prompt, validate=call.validate)
+                except Exception as e:
+                    yield "result", call.on_error(e)
+                    return
+                yield "result", call.finish(text)
+                return
+
+            parts = []
+            try:
+                for text in self.llm.stream(call.prompt):
+                    parts.append(text)
+                    yield "token", text
+            except Exception as e:
+                yield "result", call.on_error(e)
+                return
+            yield "result", call.finish("".join(parts))
+
+    async def perform_task_async(self, data: dict, context: dict = None):
+        call = await asyncio.to_thread(self.prepare_task, data, context)
+        if not isinstance(call, LLMCall):
+            return call
+        with call.scope():
+            try:
+                text = await self.llm.ainvoke(call.prompt, validate=call.validate)
+            except Exception as e:
+                return call.on_error(e)
+            return call.finish(text)
@@ -11,20 +11,21 @@ from. langchain_github_summary_agent import LangChainGitHubSummaryAgent
 
 
 # Add job post generation agent to existing agents so it can be used via run_task
+# (classes are registered by task type and constructed on first use)
 existing_agents = [
-    LangChainCVSummaryAgent(),
-    LangChainJobMatcherAgent(),
-    LangChainInterviewAgent(),
-    LangChainEmailGenerationAgent(),
-    LangChainCVInfoExtractorAgent(),
-    JobPostGenerationAgent(),
-    LangChainGitHubSummaryAgent(),
+    LangChainCVSummaryAgent,
+    LangChainJobMatcherAgent,
+    LangChainInterviewAgent,
+    LangChainEmailGenerationAgent,
+    LangChainCVInfoExtractorAgent,
+    JobPostGenerationAgent,
+    LangChainGitHubSummaryAgent,
 ]
 
 
 infra_agents = [
-    FileDownloadAgent(),
-    DataPrivacyAgent()
+    FileDownloadAgent,
+    DataPrivacyAgent
 ]
 
 # All agents combined
@@ -40,3 +41,7 @@ def run_task(task_type: str, **kwargs):
 def run_full_application_pipeline(job_post: dict, candidates: list):
  
     return task_manager.orchestrate_application(job_post, candidates)
+
+def run_matrix_pipeline(job_posts: list, candidates: list):
+
+    return task_manager.orchestrate_matrix(job_posts, candidates)
@@ -2,12 +2,11 @@
 from agents.base_agent import BaseAgent
 
 class DataPrivacyAgent(BaseAgent):
+    TASK_TYPES = ("safeguard_data_check",)
+
     def __init__(self):
         super().__init__("data_privacy_agent")
 
-    def can_handle(self, task_type: str) -> bool:
-        return task_type == "safeguard_data_check"
-
     def perform_task(self, data: dict, context: dict = None):
         candidate = data.get("candidate_data", {})
         # Basic example check for sensitive info
@@ -1,14 +1,15 @@
 from agents.base_agent import BaseAgent
 from utils.file_utils import download_pdf_from_url
+from utils.deadline import deadline_from_context
+from config.langchain_config import LangChainConfig
 import os
 
 class FileDownloadAgent(BaseAgent):
+    TASK_TYPES = ("download_file",)
+
     def __init__(self):
         super().__init__("file_download_agent")
 
-    def can_handle(self, task_type: str) -> bool:
-        return task_type == "download_file"
-
     def perform_task(self, data: dict, context: dict = None):
         url = data.get("url")
         filename = data.get("filename")
@@ -17,7 +18,11 @@ class FileDownloadAgent(BaseAgent):
             return {"error": "Missing 'url' or 'filename'"}
 
         os.makedirs(save_dir, exist_ok=True)
-        file_path = download_pdf_from_url(url, save_dir, filename)
+        timeout = LangChainConfig.HTTP_TIMEOUT_SECONDS
+        deadline = deadline_from_context(context)
+        if deadline:
+            timeout = deadline.timeout(timeout)
+        file_path = download_pdf_from_url(url, save_dir, filename, timeout=timeout)
         if not file_path:
             return {"error": "Download failed"}
         return {"file_path": file_path}
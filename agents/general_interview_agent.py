@@ -1,16 +1,17 @@
-from .base_agent import BaseAgent
+from .base_agent import LLMAgent, LLMCall
+from config.llm_gateway import get_llm_gateway
 from config.langchain_config import LangChainConfig
+from utils.token_budget import recent_qa_pairs
+
+class GeneralInterviewAgent(LLMAgent):
+    TASK_TYPES = ("start_general_interview", "answer_general")
 
-class GeneralInterviewAgent(BaseAgent):
     def __init__(self):
         super().__init__("GeneralInterviewAgent")
-        self.llm = LangChainConfig.get_llm()
+        self.llm = get_llm_gateway()
         self.max_questions = 5
 
-    def can_handle(self, task_type: str) -> bool:
-        return task_type in ["start_general_interview", "answer_general"]
-
-    def perform_task(self, data: dict, context: dict = None):
+    def prepare_task(self, data: dict, context: dict = None):
         task_type = data.get("task_type")
         qa_history = data.get("qa_history", [])
 
@@ -22,15 +23,7 @@ class GeneralInterviewAgent(BaseAgent):
     "Start with a warm, friendly, introductory question (e.g., background, personal story, interests). "
     "Keep it short, human-like, and non-technical."
 )
-            try:
-                ai_message = self.llm.invoke(prompt)
-                first_question = ai_message.content.strip()
-                if not first_question:
-                    first_question = "Tell me about yourself."
-            except Exception:
-                first_question = "Tell me about yourself."
-
-            return {"success": True, "question": first_question}
+            return self._question_call(prompt, "Tell me about yourself.")
 
         # ---------------- ANSWER GENERAL ----------------
         elif task_type == "answer_general":
@@ -43,7 +36,8 @@ class GeneralInterviewAgent(BaseAgent):
                 }
 
             # Generate next question dynamically
-            history_text = "\n".join([f"Q: {qa['question']}\nA: {qa['answer']}" for qa in qa_history])
+            recent = recent_qa_pairs(qa_history, LangChainConfig.PROMPT_TOKEN_BUDGETS["general_interview"])
+            history_text = "\n".join([f"Q: {qa['question']}\nA: {qa['answer']}" for qa in recent])
             prompt = (
             f"You are an HR interviewer conducting a soft-skills interview.\n"
             f"Here is the conversation so far:\n{history_text}\n\n"
@@ -56,15 +50,14 @@ class GeneralInterviewAgent(BaseAgent):
             "Ask only ONE question."
         )
 
+            return self._question_call(prompt, "Tell me something interesting about yourself.")
 
-            try:
-                ai_message = self.llm.invoke(prompt)
-                next_question = ai_message.content.strip()
-                if not next_question:
-                    next_question = "Tell me something interesting about yourself."
-            except Exception:
-                next_question = "Tell me something interesting about yourself."
+        return {"success": False, "message": "Unsupported task type"}
 
-            return {"success": True, "question": next_question}
+    def _question_call(self, prompt: str, fallback: str) -> LLMCall:
+        # Empty or failed completions fall back to a stock question
+        def finish(text):
+            self.llm.record_output(bool(text.strip()))
+            return {"success": True, "question": text.strip() or fallback}
 
-        return {"success": False, "message": "Unsupported task type"}
+        return LLMCall(prompt, finish=finish, on_error=lambda e: {"success": True, "question": fallback})
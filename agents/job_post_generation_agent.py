@@ -1,12 +1,11 @@
 from agents.base_agent import BaseAgent
 
 class JobPostGenerationAgent(BaseAgent):
+    TASK_TYPES = ("generate_job_post",)
+
     def __init__(self):
         super().__init__("job_post_generation_agent")
 
-    def can_handle(self, task_type: str) -> bool:
-        return task_type == "generate_job_post"
-
     def perform_task(self, data: dict, context: dict = None):
         try:
             # Get input data
@@ -1,24 +1,28 @@
 import os
 import json
 import re
-from agents.base_agent import BaseAgent
+from agents.base_agent import LLMAgent, LLMCall
 from utils.file_utils import download_pdf_from_url
 from utils.pdf_utils import extract_text_from_pdf
+from utils.token_budget import fit_cv_text
+from config.llm_gateway import get_llm_gateway
 from config.langchain_config import LangChainConfig
 
-class LangChainCVInfoExtractorAgent(BaseAgent):
+class LangChainCVInfoExtractorAgent(LLMAgent):
+    TASK_TYPES = ("extract_profile_info", "extract_cv_info")
+
     def __init__(self):
         super().__init__("cv_info_extractor_agent")
-        self.llm = LangChainConfig.get_llm()
-
-    def can_handle(self, task_type: str) -> bool:
-        return task_type in ["extract_profile_info", "extract_cv_info"]
+        self.llm = get_llm_gateway()
 
-    def perform_task(self, data: dict, context: dict = None):
+    def prepare_task(self, data: dict, context: dict = None):
         cv_url = data.get("cv_url")
         if not cv_url:
             return {"error": "'cv_url' is required for extracting CV info"}
-        return self.extract_profile_info(cv_url)
+        return self.prepare_extraction(cv_url)
+
+    def extract_profile_info(self, cv_url: str):
+        return self.perform_task({"cv_url": cv_url})
 
     def clean_llm_json(self, text: str) -> str:
         """
@@ -27,7 +31,28 @@ class LangChainCVInfoExtractorAgent(BaseAgent):
         cleaned = re.sub(r"^```(?:json)?|```$", "", text.strip(), flags=re.MULTILINE)
         return cleaned.strip()
 
-    def extract_profile_info(self, cv_url: str):
+    def is_profile_json(self, result: str) -> bool:
+        """Whether the completion parses as the profile JSON (invalid ones aren't cached)."""
+        try:
+            json.loads(self.clean_llm_json(result))
+            return True
+        except json.JSONDecodeError:
+            return False
+
+    def parse_profile(self, result: str):
+        try:
+            cleaned = self.clean_llm_json(result)
+            profile = json.loads(cleaned)
+            self.llm.record_output(True)
+            return profile
+        except json.JSONDecodeError:
+            self.llm.record_output(False)
+            return {
+                "error": "LLM returned invalid JSON",
+                "raw_response": result
+            }
+
+    def prepare_extraction(self, cv_url: str):
         try:
             # Prepare file path
             # Extract filename from URL and remove query parameters
@@ -48,6 +73,9 @@ class LangChainCVInfoExtractorAgent(BaseAgent):
             if not cv_text:
                 return {"error": "Failed to extract text from CV"}
 
+            # Contact details live in the CV header, which fit_cv_text keeps first
+            cv_text = fit_cv_text(cv_text, LangChainConfig.PROMPT_TOKEN_BUDGETS["extract_profile_info"])
+
             # Prepare prompt for LLM
             prompt = f"""
 Extract the following fields from the CV content and return a valid JSON object:
@@ -58,43 +86,13 @@ Extract the following fields from the CV content and return a valid JSON object:
 - github_url
 
 CV CONTENT:
-{cv_text[:3000]}
+{cv_text}
 
 Respond in raw JSON format only. Do NOT include markdown or triple backticks. Use null if any field is missing.
 """
-
-            # Use LangChain-style LLM client if available
-            if hasattr(self.llm, 'invoke'):
-                from langchain_core.messages import HumanMessage
-                result = self.llm.invoke([HumanMessage(content=prompt)])
-                try:
-                    cleaned = self.clean_llm_json(result.content)
-                    return json.loads(cleaned)
-                except json.JSONDecodeError:
-                    return {
-                        "error": "LLM returned invalid JSON",
-                        "raw_response": result.content
-                    }
-
-            # Use OpenAI/Groq-style client
-            elif hasattr(self.llm, 'chat'):
-                result = self.llm.chat.completions.create(
-                    messages=[{"role": "user", "content": prompt}],
-                    model="llama-3.3-70b-versatile",
-                    temperature=0.2,
-                    max_tokens=512
-                )
-                try:
-                    cleaned = self.clean_llm_json(result.choices[0].message.content)
-                    return json.loads(cleaned)
-                except json.JSONDecodeError:
-                    return {
-                        "error": "LLM returned invalid JSON",
-                        "raw_response": result.choices[0].message.content
-                    }
-
-            else:
-                return {"error": "Unsupported LLM client in LangChainConfig"}
+            return LLMCall(
+                prompt, finish=self.parse_profile, on_error=lambda e: {"error": str(e)}, validate=self.is_profile_json
+            )
 
         except Exception as e:
             return {"error": str(e)}
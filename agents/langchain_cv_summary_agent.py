@@ -1,28 +1,32 @@
 import os
-from agents.base_agent import BaseAgent
+from agents.base_agent import LLMAgent, LLMCall
 from utils.pdf_utils import extract_text_from_pdf
 from utils.linkedin_scraper import scrape_linkedin
+from utils.token_budget import fit_cv_text, fit_sections
+from config.llm_gateway import get_llm_gateway
 from config.langchain_config import LangChainConfig
 
-class LangChainCVSummaryAgent(BaseAgent):
+class LangChainCVSummaryAgent(LLMAgent):
+    TASK_TYPES = ("summarize_cv",)
+
     def __init__(self):
         super().__init__("cv_summary_agent")
-        self.llm = LangChainConfig.get_llm()
-    
-    def can_handle(self, task_type: str) -> bool:
-        return task_type == "summarize_cv"
+        self.llm = get_llm_gateway()
 
-    def perform_task(self, data: dict, context: dict = None):
+    def prepare_task(self, data: dict, context: dict = None):
         cv_path = data.get("cv_path")
         linkedin_url = data.get("linkedin_url")
 
         if not cv_path:
             return "Error: 'cv_path' is required to summarize CV"
 
-        return self.summarize_cv(cv_path, linkedin_url)
+        return self.prepare_summary(cv_path, linkedin_url)
 
     def summarize_cv(self, cv_path: str, linkedin_url: str = None):
-        """Summarize CV using either LangChain ChatGroq or direct Groq API"""
+        """Summarize CV using the shared LLM gateway"""
+        return self.perform_task({"cv_path": cv_path, "linkedin_url": linkedin_url})
+
+    def prepare_summary(self, cv_path: str, linkedin_url: str = None):
         try:
             # Extract CV text using existing utility
             cv_text = extract_text_from_pdf(cv_path)
@@ -38,16 +42,23 @@ class LangChainCVSummaryAgent(BaseAgent):
                     linkedin_data = f"LinkedIn scraping failed: {str(e)}"
             else:
                 linkedin_data = "No LinkedIn URL provided"
-            
-            # Create comprehensive prompt
-            prompt = f"""
+        except Exception as e:
+            return f"Error summarizing CV: {str(e)}"
+
+        # CV first: prioritise its skills/experience sections, give LinkedIn whatever is left
+        budget = LangChainConfig.PROMPT_TOKEN_BUDGETS["summarize_cv"]
+        cv_text = fit_cv_text(cv_text, int(budget * 0.75))
+        fitted = fit_sections([("cv", cv_text, 3), ("linkedin", linkedin_data, 1)], budget)
+
+        # Create comprehensive prompt
+        prompt = f"""
 Analyze this candidate's CV and create a comprehensive summary:
 
 CV CONTENT:
-{cv_text[:4000]}
+{fitted["cv"]}
 
 LINKEDIN DATA:
-{linkedin_data}
+{fitted["linkedin"]}
 
 Please provide a detailed candidate summary including:
 
@@ -81,25 +92,4 @@ Please provide a detailed candidate summary including:
 
 Provide a comprehensive, professional summary:
 """
-            # Use LangChain ChatGroq client if available
-            if hasattr(self.llm, 'invoke'):
-                from langchain_core.messages import HumanMessage
-                response = self.llm.invoke([HumanMessage(content=prompt)])
-                return response.content
-            
-            # Otherwise use direct Groq API client
-            elif hasattr(self.llm, 'chat'):
-                response = self.llm.chat.completions.create(
-                    messages=[{"role": "user", "content": prompt}],
-                    model="llama-3.3-70b-versatile",
-                    temperature=0.1,
-                    max_tokens=2048
-                )
-                return response.choices[0].message.content
-            
-            # Fallback to returning partial text summary
-            else:
-                return f"CV Summary for {cv_path}: {cv_text[:500]}..."
-        
-        except Exception as e:
-            return f"Error summarizing CV: {str(e)}"
+        return LLMCall(prompt, on_error=lambda e: f"Error summarizing CV: {str(e)}")
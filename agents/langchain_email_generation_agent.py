@@ -1,12 +1,15 @@
 from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
+from config.llm_gateway import get_llm_gateway
+from agents.base_agent import LLMAgent, LLMCall
 from config.langchain_config import LangChainConfig
-from agents.base_agent import BaseAgent
+from utils.token_budget import truncate_to_tokens
+
+class LangChainEmailGenerationAgent(LLMAgent):
+    TASK_TYPES = ("send_email",)
 
-class LangChainEmailGenerationAgent(BaseAgent):
     def __init__(self):
         super().__init__("email_generation_agent")
-        self.llm = LangChainConfig.get_llm()
+        self.llm = get_llm_gateway()
 
         self.email_prompt = PromptTemplate(
             input_variables=[
@@ -60,23 +63,24 @@ Generate the complete email below:
 """
         )
 
-        self.chain = LLMChain(llm=self.llm, prompt=self.email_prompt)
-
-    def can_handle(self, task_type: str) -> bool:
-        return task_type == "send_email"
+    @staticmethod
+    def email_error(e: Exception) -> str:
+        return f"Error generating email: {str(e)}"
 
-    def perform_task(self, data: dict, context: dict = None):
+    def prepare_task(self, data: dict, context: dict = None):
         try:
-            return self.chain.run(
-                job_description=data["job_description"],
+            prompt = self.email_prompt.format(
+                job_description=truncate_to_tokens(
+                    data["job_description"], LangChainConfig.PROMPT_TOKEN_BUDGETS["send_email"]
+                ),
                 interview_date=data["interview_date"],
                 candidate_name=data["candidate_name"],
                 candidate_email=data["candidate_email"],
                 job_title=data["job_title"],
                 closing_date=data["closing_date"],
                 company_name=data["company_name"],
-                contact_info=data["contact_info"],
-                
+                contact_info=data["contact_info"]
             )
         except Exception as e:
-            return f"Error generating email: {str(e)}"
+            return self.email_error(e)
+        return LLMCall(prompt, on_error=self.email_error)
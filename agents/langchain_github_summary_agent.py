@@ -1,13 +1,17 @@
 # agents/langchain_github_summary_agent.py
-from agents.base_agent import BaseAgent
+from agents.base_agent import LLMAgent, LLMCall
+from config.llm_gateway import get_llm_gateway
 from config.langchain_config import LangChainConfig
+from utils.token_budget import truncate_to_tokens
 from utils.github_scraper import scrape_github_profile
 from urllib.parse import urlparse
 
-class LangChainGitHubSummaryAgent(BaseAgent):
+class LangChainGitHubSummaryAgent(LLMAgent):
+    TASK_TYPES = ("summarize_github", "summarize_github_profile")
+
     def __init__(self):
         super().__init__("github_summary_agent")
-        self.llm = LangChainConfig.get_llm()
+        self.llm = get_llm_gateway()
 
     def extract_username(self, github_url: str) -> str:
         """Extract GitHub username from full URL."""
@@ -16,11 +20,8 @@ class LangChainGitHubSummaryAgent(BaseAgent):
         if len(path_parts) >= 1:
             return path_parts[0]
         return github_url 
-    
-    def can_handle(self, task_type: str) -> bool:
-        return task_type in ["summarize_github", "summarize_github_profile"]
 
-    def perform_task(self, data: dict, context: dict = None):
+    def prepare_task(self, data: dict, context: dict = None):
         github_url = data.get("github_url")
         if not github_url:
             return "Error: 'github_url' is required"
@@ -29,6 +30,7 @@ class LangChainGitHubSummaryAgent(BaseAgent):
             github_data = scrape_github_profile(username)
         except Exception as e:
             return f"Error scraping GitHub: {str(e)}"
+        github_data = truncate_to_tokens(str(github_data), LangChainConfig.PROMPT_TOKEN_BUDGETS["summarize_github"])
 
         prompt = f"""
 Analyze this GitHub profile and summarize the candidate's technical strengths and coding style.
@@ -43,22 +45,4 @@ Please provide:
 4. Code quality and documentation
 5. Strengths and possible improvement areas
 """
-
-        try:
-            if hasattr(self.llm, "invoke"):
-                from langchain_core.messages import HumanMessage
-                response = self.llm.invoke([HumanMessage(content=prompt)])
-                return response.content
-            elif hasattr(self.llm, "chat"):
-                response = self.llm.chat.completions.create(
-                    messages=[{"role": "user", "content": prompt}],
-                    model="llama-3.3-70b-versatile",
-                    temperature=0.1,
-                    max_tokens=2048
-                )
-                return response.choices[0].message.content
-            else:
-                return f"GitHub Summary for {github_url}:\n\n{github_data[:500]}..."
-
-        except Exception as e:
-            return f"Error generating GitHub summary: {str(e)}"
+        return LLMCall(prompt, on_error=lambda e: f"Error generating GitHub summary: {str(e)}")
@@ -1,26 +1,28 @@
 import json
 import uuid
-from database.langchain_vector_db import LangChainVectorDB
+from database.langchain_vector_db import get_shared_vector_db
+from config.llm_gateway import get_llm_gateway
 from config.langchain_config import LangChainConfig
-from agents.base_agent import BaseAgent
+from utils.token_budget import count_tokens, fit_sections, recent_qa_pairs, truncate_to_tokens
+from agents.base_agent import LLMAgent, LLMCall
 import re
-class LangChainInterviewAgent(BaseAgent):
+class LangChainInterviewAgent(LLMAgent):
+    TASK_TYPES = (
+        "start_interview",
+        "continue_interview",
+        "conduct_full_interview",
+        "evaluate_interview"
+    )
+    # Smallest share of the evaluation prompt a question and its answer are cut down to
+    MIN_TOKENS_PER_PAIR = 48
+
     def __init__(self):
         super().__init__("interview_agent")
-        self.db = LangChainVectorDB()
-        self.llm = LangChainConfig.get_llm()
+        self.db = get_shared_vector_db()
+        self.llm = get_llm_gateway()
         self.sessions = {}
 
-    def can_handle(self, task_type: str) -> bool:
-        # Define task types this agent handles
-        return task_type in {
-            "start_interview",
-            "continue_interview",
-            "conduct_full_interview",
-            "evaluate_interview"
-        }
-
-    def perform_task(self, data: dict, context: dict = None):
+    def prepare_task(self, data: dict, context: dict = None):
         task_type = data.get("task_type")
         email = data.get("email")
         job_description = data.get("job_description", "")
@@ -44,9 +46,11 @@ class LangChainInterviewAgent(BaseAgent):
         session = self.sessions[email]
 
         if task_type == "start_interview":
-            first_question = self._start_interview(cv_summary, job_description)
-            session["qa_history"].append({"question": first_question, "answer": ""})
-            return {"question": first_question}
+            def first_question(question):
+                session["qa_history"].append({"question": question, "answer": ""})
+                return {"question": question}
+
+            return self._question_call(self._start_prompt(cv_summary, job_description), first_question)
 
         elif task_type == "continue_interview":
             # Save previous answer if present
@@ -57,62 +61,81 @@ class LangChainInterviewAgent(BaseAgent):
                 session.setdefault("violations", []).extend(violations)
 
             if len(session["qa_history"]) >= 5:
-                evaluation = self._evaluate_interview(
-                    session["cv_summary"], 
+                def finished(evaluation):
+                    self.sessions.pop(email, None)
+
+                    return {
+                        "success": True,
+                        "finished": True,
+                        "message": "Thank you for completing the technical interview!",
+                        "qa_history": session["qa_history"],
+                        "violations": session.get("violations", []),
+                        "evaluation": {
+                            "total_score": evaluation.get("total_score"),
+                            "overall_feedback": evaluation.get("overall_feedback"),
+                            "question_wise": evaluation.get("questions", [])
+                        }
+                    }
+
+                return self._evaluation_call(
+                    session["cv_summary"],
                     session["qa_history"],
-                    session.get("violations", [])
+                    session.get("violations", []),
+                    finished
                 )
 
-                self.sessions.pop(email, None)
-
+            # Otherwise, continue with next question
+            def next_question(question):
                 return {
                     "success": True,
-                    "finished": True,
-                    "message": "Thank you for completing the technical interview!",
+                    "next_question": question,
                     "qa_history": session["qa_history"],
-                    "violations": session.get("violations", []),
-                    "evaluation": {
-                        "total_score": evaluation.get("total_score"),
-                        "overall_feedback": evaluation.get("overall_feedback"),
-                        "question_wise": evaluation.get("questions", [])
-                    }
+                    "violations": session.get("violations", [])
                 }
 
-            # Otherwise, continue with next question
-            next_question = self._continue_interview(session["cv_summary"], session["qa_history"])
-            return {
-                "success": True,
-                "next_question": next_question,
-                "qa_history": session["qa_history"],
-                "violations": session.get("violations", [])
-            }
+            return self._question_call(self._continue_prompt(session["cv_summary"], session["qa_history"]), next_question)
 
+        elif task_type == "conduct_full_interview":
+            full_qa = qa_history.copy()
+            # Only the next question is generated per call
+            if len(full_qa) >= 6:
+                return None
 
+            def append_question(question):
+                full_qa.append({"question": question, "answer": ""})
+                return full_qa
 
-        elif task_type == "conduct_full_interview":
-            full_qa = self._conduct_full_interview(cv_summary, qa_history)
-            return full_qa
+            return self._question_call(self._full_interview_prompt(cv_summary, full_qa), append_question)
 
         elif task_type == "evaluate_interview":
-            evaluation = self._evaluate_interview(cv_summary, qa_history)
-            return evaluation
+            return self._evaluation_call(cv_summary, qa_history)
 
         else:
             return {"error": f"Unknown task type: {task_type}"}
 
-    def _invoke_llm(self, prompt: str) -> str:
-        try:
-            if hasattr(self.llm, 'invoke'):
-                response = self.llm.invoke(prompt)
-                return response.content.strip() if hasattr(response, 'content') else response.strip()
-            else:
-                response = self.llm(prompt)
-                return response.content.strip() if hasattr(response, 'content') else response.strip()
-        except Exception as e:
-            return f"Error invoking LLM: {str(e)}"
-
-    def _start_interview(self, cv_summary: str, job_description: str="") -> str:
-        prompt = f"""
+    def _question_call(self, prompt: str, finish) -> LLMCall:
+        def question(text):
+            self.llm.record_output(bool(text.strip()))
+            return finish(text.strip())
+
+        # A failed call still yields a "question" carrying the error text, as before
+        return LLMCall(prompt, finish=question, on_error=lambda e: finish(f"Error invoking LLM: {str(e)}"))
+
+    @staticmethod
+    def _fit_cv_and_history(cv_summary: str, qa_history: list):
+        """Budget the CV summary and Q&A history; older pairs drop out first as the interview grows."""
+        budget = LangChainConfig.PROMPT_TOKEN_BUDGETS["interview"]
+        cv_summary = truncate_to_tokens(cv_summary, budget // 2)
+        pairs = recent_qa_pairs(qa_history, budget - count_tokens(cv_summary))
+        return cv_summary, pairs, len(qa_history) - len(pairs) + 1
+
+    def _start_prompt(self, cv_summary: str, job_description: str="") -> str:
+        fitted = fit_sections(
+            [("cv_summary", cv_summary, 1), ("job_description", job_description, 1)],
+            LangChainConfig.PROMPT_TOKEN_BUDGETS["interview"]
+        )
+        cv_summary, job_description = fitted["cv_summary"], fitted["job_description"]
+        return f"""
 You are an expert technical interviewer. 
 Your goal is to generate the first **technical question** for a candidate applying for this role.
 Carefully analyze the following information:
@@ -136,16 +159,16 @@ Instructions:
 5. The question must be relevant to the candidate's background and the job role.
 6. Only return the question text.
 """
-        return self._invoke_llm(prompt)
 
-    def _continue_interview(self, cv_summary: str, qa_history: list) -> str:
+    def _continue_prompt(self, cv_summary: str, qa_history: list) -> str:
+        cv_summary, pairs, first = self._fit_cv_and_history(cv_summary, qa_history)
         history_str = ""
-        for i, pair in enumerate(qa_history, 1):
+        for i, pair in enumerate(pairs, first):
             q = pair.get("question", "")
             a = pair.get("answer", "")
             history_str += f"Q{i}: {q}\nA{i}: {a}\n"
 
-        prompt = f"""
+        return f"""
 You are an expert technical interviewer continuing an interview with a candidate, 
 tailoring questions to their role and expected skill level from the job description.
 
@@ -164,19 +187,16 @@ Instructions:
 4. Ensure each question aligns with the candidate's background and the job requirements.
 5. Only return the question text — no explanation or commentary.
 """
-        return self._invoke_llm(prompt)
-
-    def _conduct_full_interview(self, cv_summary: str, qa_history: list) -> list:
-        full_qa = qa_history.copy()
 
-        for _ in range(6 - len(full_qa)):
-            history_str = ""
-            for i, pair in enumerate(full_qa, 1):
-                q = pair.get("question", "").strip()
-                a = pair.get("answer", "").strip()
-                history_str += f"Q{i}: {q}\nA{i}: {a}\n"
+    def _full_interview_prompt(self, cv_summary: str, full_qa: list) -> str:
+        cv_summary, pairs, first = self._fit_cv_and_history(cv_summary, full_qa)
+        history_str = ""
+        for i, pair in enumerate(pairs, first):
+            q = pair.get("question", "").strip()
+            a = pair.get("answer", "").strip()
+            history_str += f"Q{i}: {q}\nA{i}: {a}\n"
 
-            prompt = f"""
+        return f"""
 You are an expert technical interviewer continuing an interview with a candidate, 
 tailoring questions to their role and expected skill level from the job description.
 
@@ -190,26 +210,36 @@ Using the candidate's last answer as context, ask the next technical question.
 Increase difficulty step-by-step, focusing on reasoning, architecture, tools, deployment,
 performance, and real-world trade-offs relevant to the candidate's field.
 """
-            question = self._invoke_llm(prompt)
-            full_qa.append({"question": question, "answer": ""})
-
-            return full_qa
 
-    def _evaluate_interview(self, cv_summary: str, qa_history: list, violations: list = None) -> dict:
+    def _evaluation_call(self, cv_summary: str, qa_history: list, violations: list = None, finish=None) -> LLMCall:
         """
         Evaluate the candidate's answers using the LLM.
-        Handles escaped characters, code fences, single quotes, unquoted keys, and invalid JSON.
+        ``finish`` post-processes the evaluation dict (also on failure).
         """
-        import json, re
+        finish = finish or (lambda evaluation: evaluation)
 
         qa_history = qa_history or []
         violations = violations or []
 
+        # Every question is scored, so long questions and answers are shortened rather than whole
+        # pairs dropped. Answers weigh twice as much as questions, and each pair keeps at least
+        # MIN_TOKENS_PER_PAIR even if a very long interview then runs over the budget.
+        budget = LangChainConfig.PROMPT_TOKEN_BUDGETS["evaluate_interview"]
+        cv_summary = truncate_to_tokens(cv_summary, budget // 4)
+        sections = []
+        for i, pair in enumerate(qa_history, 1):
+            sections.append((f"Q{i}", pair.get("question", "").strip(), 1))
+            sections.append((f"A{i}", pair.get("answer", "").strip(), 2))
+        fitted = fit_sections(
+            sections,
+            max(budget - count_tokens(cv_summary), self.MIN_TOKENS_PER_PAIR * len(qa_history))
+        )
+
         # Build conversation string for LLM prompt
         history_str = ""
-        for i, pair in enumerate(qa_history, 1):
-            q = pair.get("question", "").strip()
-            a = pair.get("answer", "").strip()
+        for i in range(1, len(qa_history) + 1):
+            q = fitted[f"Q{i}"]
+            a = fitted[f"A{i}"]
             history_str += f"Q{i}: {q}\nA{i}: {a}\n"
 
         # Build violations string
@@ -245,43 +275,62 @@ performance, and real-world trade-offs relevant to the candidate's field.
     Return ONLY valid JSON. Do NOT include any commentary or code fences.
     """
 
-        # Robust JSON extraction
-        def _extract_json_from_llm(response_str: str) -> dict:
-            # Remove code fences and leading/trailing quotes
-            cleaned = re.sub(r"```(?:json)?", "", response_str).strip().strip("'\"")
-
-            # Replace single quotes with double quotes (only for values)
-            cleaned = re.sub(r'(?<!")\'([^\']*?)\'(?!")', r'"\1"', cleaned)
-
-            # Quote unquoted keys
-            cleaned = re.sub(r'([{,]\s*)([a-zA-Z0-9_]+)\s*:', r'\1"\2":', cleaned)
-
-            # Find first balanced JSON object
-            stack = []
-            start_idx = None
-            for i, c in enumerate(cleaned):
-                if c == '{':
-                    if not stack:
-                        start_idx = i
-                    stack.append('{')
-                elif c == '}':
-                    stack.pop()
-                    if not stack and start_idx is not None:
-                        json_str = cleaned[start_idx:i+1]
-                        try:
-                            return json.loads(json_str)
-                        except json.JSONDecodeError:
-                            break
-            raise ValueError("No valid JSON found in LLM output")
-
+        return LLMCall(
+            prompt,
+            finish=lambda text: finish(self._parse_evaluation(text.strip(), qa_history, violations)),
+            on_error=lambda e: finish(self._evaluation_fallback(qa_history, violations, f"Error invoking LLM: {str(e)}")),
+            # Also when it ends a continue_interview request: routed and measured as an evaluation
+            task_type="evaluate_interview",
+            streamable=False,
+            # The fallback evaluation is only for this request: don't cache the completion behind it
+            validate=self._has_json
+        )
+
+    @classmethod
+    def _has_json(cls, response_str: str) -> bool:
+        try:
+            cls._extract_json_from_llm(response_str)
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _extract_json_from_llm(response_str: str) -> dict:
+        """Robust JSON extraction: handles code fences, single quotes, unquoted keys and invalid JSON."""
+        # Remove code fences and leading/trailing quotes
+        cleaned = re.sub(r"```(?:json)?", "", response_str).strip().strip("'\"")
+
+        # Replace single quotes with double quotes (only for values)
+        cleaned = re.sub(r'(?<!")\'([^\']*?)\'(?!")', r'"\1"', cleaned)
+
+        # Quote unquoted keys
+        cleaned = re.sub(r'([{,]\s*)([a-zA-Z0-9_]+)\s*:', r'\1"\2":', cleaned)
+
+        # Find first balanced JSON object
+        stack = []
+        start_idx = None
+        for i, c in enumerate(cleaned):
+            if c == '{':
+                if not stack:
+                    start_idx = i
+                stack.append('{')
+            elif c == '}':
+                stack.pop()
+                if not stack and start_idx is not None:
+                    json_str = cleaned[start_idx:i+1]
+                    try:
+                        return json.loads(json_str)
+                    except json.JSONDecodeError:
+                        break
+        raise ValueError("No valid JSON found in LLM output")
+
+    def _parse_evaluation(self, response_str: str, qa_history: list, violations: list) -> dict:
         try:
-            # Invoke LLM
-            response_str = self._invoke_llm(prompt)
             print("Raw LLM response:", repr(response_str))
 
             # Parse JSON robustly
-            evaluation_json = _extract_json_from_llm(response_str)
-
+            evaluation_json = self._extract_json_from_llm(response_str)
+            self.llm.record_output(True)
             # Ensure keys exist
             evaluation_json.setdefault("questions", [])
             evaluation_json.setdefault("question_wise", evaluation_json.get("questions", []))
@@ -296,24 +345,29 @@ performance, and real-world trade-offs relevant to the candidate's field.
             return evaluation_json
 
         except Exception as e:
-            # Fallback: return original QA with zero scores
-            questions_list = []
-            for q in qa_history:
-                questions_list.append({
-                    "question": q.get("question", ""),
-                    "answer": q.get("answer", ""),
-                    "score": 0,
-                    "feedback": "LLM evaluation failed.",
-                    "masked": False
-                })
-
-            return {
-                "questions": questions_list,
-                "question_wise": questions_list,
-                "violations": violations or [],
-                "total_score": 0,
-                "overall_feedback": f"LLM evaluation failed: {str(e)}"
-            }
+            self.llm.record_output(False)
+            return self._evaluation_fallback(qa_history, violations, str(e))
+
+    @staticmethod
+    def _evaluation_fallback(qa_history: list, violations: list, reason: str) -> dict:
+        # Fallback: return original QA with zero scores
+        questions_list = []
+        for q in qa_history:
+            questions_list.append({
+                "question": q.get("question", ""),
+                "answer": q.get("answer", ""),
+                "score": 0,
+                "feedback": "LLM evaluation failed.",
+                "masked": False
+            })
+
+        return {
+            "questions": questions_list,
+            "question_wise": questions_list,
+            "violations": violations or [],
+            "total_score": 0,
+            "overall_feedback": f"LLM evaluation failed: {reason}"
+        }
 
 
 # ######################################################################################################
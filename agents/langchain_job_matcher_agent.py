@@ -1,21 +1,32 @@
+import json
 import re
 from abc import ABC
+from config.llm_gateway import get_llm_gateway
 from config.langchain_config import LangChainConfig
+from utils.token_budget import fit_sections
 
 try:
     from langchain_community.tools import DuckDuckGoSearchRun
 except ImportError:
     DuckDuckGoSearchRun = None
 
-from agents.base_agent import BaseAgent
+from agents.base_agent import LLMAgent, LLMCall
+
+# Tolerates markdown and brackets around the label and the number, e.g. "**OVERALL MATCH SCORE:** [60%]"
+MATCH_SCORE_PATTERN = re.compile(r'OVERALL\s+MATCH\s+SCORE[\s:*_#\[\]-]*(\d{1,3})(?:\.\d+)?\s*%', re.IGNORECASE)
+RECOMMENDATIONS = ("Strong Hire", "Hire", "Maybe", "No Hire")
+CONFIDENCE_LEVELS = ("High", "Medium", "Low")
+SKILL_LISTS = ("matching_skills", "partial_skills", "missing_skills", "bonus_skills", "focus_areas")
+
+class LangChainJobMatcherAgent(LLMAgent):
+    TASK_TYPES = ("match_cv", "explain_match")
 
-class LangChainJobMatcherAgent(BaseAgent):
     def __init__(self):
         super().__init__("job_matcher_agent")
-        self.llm = LangChainConfig.get_llm()
+        self.llm = get_llm_gateway()
 
         try:
-            if DuckDuckGoSearchRun:
+            if DuckDuckGoSearchRun and LangChainConfig.MARKET_RESEARCH_ENABLED:
                 self.search_tool = DuckDuckGoSearchRun()
             else:
                 self.search_tool = None
@@ -23,45 +34,109 @@ class LangChainJobMatcherAgent(BaseAgent):
             print(f"Warning: Could not initialize search tool: {e}")
             self.search_tool = None
 
-    def can_handle(self, task_type: str) -> bool:
-        return task_type == "match_cv"
-
-    def perform_task(self, data: dict, context: dict = None):
+    def prepare_task(self, data: dict, context: dict = None):
         cv_summary = data.get("cv_summary", "")
         job_summary = data.get("job_summary", "")
         github_summary = data.get("github_summary", "") 
+
+        # Long-form analysis, written on demand (e.g. for shortlisted candidates)
+        if data.get("task_type") == "explain_match":
+            if not cv_summary or not job_summary:
+                return {"error": "Missing cv_summary or job_summary"}
+            return self.prepare_narrative(cv_summary, job_summary, github_summary, data.get("match_analysis"))
+
         if not cv_summary or not job_summary or not github_summary:
             return {"error": "Missing cv_summary or job_summary or github_summary"}
 
-        return self.match_cv_to_job(cv_summary, job_summary, github_summary)
+        if LangChainConfig.MATCH_OUTPUT_MODE == "narrative":
+            return self.prepare_narrative(cv_summary, job_summary, github_summary)
+        return self.prepare_match(cv_summary, job_summary, github_summary)
 
     def match_cv_to_job(self, cv_summary: str, job_summary: str, github_summary: str):
+        return self.perform_task({"cv_summary": cv_summary, "job_summary": job_summary, "github_summary": github_summary})
+
+    def prepare_match(self, cv_summary: str, job_summary: str, github_summary: str):
+        """Compact screening: one JSON object with the score, skill lists, recommendation and focus areas."""
+        fitted = fit_sections([
+            ("cv_summary", cv_summary, 3),
+            ("github_summary", github_summary, 2),
+            ("job_summary", job_summary, 3)
+        ], LangChainConfig.PROMPT_TOKEN_BUDGETS["match_cv"])
+
+        prompt = f"""
+Screen this candidate against the job requirements. Respond with a single JSON object and nothing else:
+
+{{
+  "score": <overall match, integer 0-100>,
+  "matching_skills": [<required skills the candidate has>],
+  "partial_skills": [<required skills the candidate only partly has>],
+  "missing_skills": [<critical required skills the candidate lacks>],
+  "bonus_skills": [<relevant skills beyond the requirements>],
+  "experience_fit": "Overqualified" | "Perfect Fit" | "Underqualified",
+  "recommendation": "Strong Hire" | "Hire" | "Maybe" | "No Hire",
+  "confidence": "High" | "Medium" | "Low",
+  "focus_areas": [<up to 3 topics to explore in the interview>],
+  "summary": "<one sentence explaining the score>"
+}}
+
+Keep each list to at most 6 short items.
+
+CANDIDATE PROFILE:
+{fitted["cv_summary"]}
+
+GITHUB PROFILE:
+{fitted["github_summary"] if fitted["github_summary"] else "GitHub data not available"}
+
+JOB REQUIREMENTS:
+{fitted["job_summary"]}
+"""
+        return LLMCall(
+            prompt, finish=self.check_match_json, on_error=self.match_error, streamable=False,
+            validate=lambda text: parse_match_json(text) is not None
+        )
+
+    def prepare_narrative(self, cv_summary: str, job_summary: str, github_summary: str, match_analysis: dict = None):
+        market_info = ""
         try:
-            market_info = ""
-            try:
-                if self.search_tool:
-                    market_query = "current job market trends hiring requirements software development 2024"
-                    market_info = self.search_tool.run(market_query)
-                else:
-                    market_info = "Market research unavailable - search tool not available"
-            except Exception as e:
-                market_info = f"Market research unavailable: {str(e)}"
-
-            prompt = f"""
+            if self.search_tool:
+                market_query = "current job market trends hiring requirements software development 2024"
+                market_info = self.search_tool.run(market_query)
+            else:
+                market_info = "Market research unavailable - search tool not available"
+        except Exception as e:
+            market_info = f"Market research unavailable: {str(e)}"
+
+        # Market research is background; the candidate and the job get most of the budget
+        fitted = fit_sections([
+            ("cv_summary", cv_summary, 3),
+            ("github_summary", github_summary, 2),
+            ("job_summary", job_summary, 3),
+            ("market_info", market_info, 1)
+        ], LangChainConfig.PROMPT_TOKEN_BUDGETS["match_cv"])
+
+        # Expand on an earlier structured screening rather than re-scoring from scratch
+        screening = ""
+        if isinstance(match_analysis, dict):
+            screening = f"""
+SCREENING RESULT (use its score unless the profile clearly contradicts it):
+{json.dumps(match_analysis)}
+"""
+
+        prompt = f"""
 Analyze the compatibility between this candidate and job position:
 
 CANDIDATE PROFILE:
-{cv_summary}
+{fitted["cv_summary"]}
 GiTHUB PROFILE:
 GitHub Summary (projects, code quality, contributions, skills):
-{github_summary if github_summary else "GitHub data not available"}
+{fitted["github_summary"] if fitted["github_summary"] else "GitHub data not available"}
 
 JOB REQUIREMENTS:
-{job_summary}
+{fitted["job_summary"]}
 
 CURRENT MARKET INSIGHTS:
-{market_info}
-
+{fitted["market_info"]}
+{screening}
 Please provide a comprehensive matching analysis:
 
 1. OVERALL MATCH SCORE: [0-100%]
@@ -94,33 +169,76 @@ Please provide a comprehensive matching analysis:
 
 Provide detailed analysis:
 """
-
-            if hasattr(self.llm, 'invoke'):
-                from langchain_core.messages import HumanMessage
-                response = self.llm.invoke([HumanMessage(content=prompt)])
-                return response.content
-            elif hasattr(self.llm, 'chat'):
-                response = self.llm.chat.completions.create(
-                    messages=[{"role": "user", "content": prompt}],
-                    model="llama-3.3-70b-versatile",
-                    temperature=0.1,
-                    max_tokens=2048
-                )
-                return response.choices[0].message.content
-            else:
-                return "Job matching analysis for candidate based on CV and job requirements."
-
-        except Exception as e:
-            return f"Error matching CV to job: {str(e)}"
-
-
-def extract_match_score(analysis_text: str) -> int:
+        return LLMCall(prompt, finish=self.check_match, on_error=self.match_error)
+
+    @staticmethod
+    def match_error(e: Exception) -> str:
+        return f"Error matching CV to job: {str(e)}"
+
+    def check_match(self, analysis_text: str) -> str:
+        # An analysis without a parseable score ranks the candidate at 0
+        self.llm.record_output(MATCH_SCORE_PATTERN.search(analysis_text) is not None)
+        return analysis_text
+
+    def check_match_json(self, text: str):
+        analysis = parse_match_json(text)
+        self.llm.record_output(analysis is not None)
+        if analysis is None:
+            # An error rather than a score of 0, so the result isn't memoized or checkpointed; the
+            # completion itself was kept out of the LLM response cache by the call's validator
+            return f"Error matching CV to job: no valid JSON match result in: {text[:200]}"
+        return analysis
+
+
+def _pick(value, choices: tuple):
+    """Case-insensitive match of ``value`` against ``choices``; None when it isn't one of them."""
+    if isinstance(value, str):
+        for choice in choices:
+            if value.strip().lower() == choice.lower():
+                return choice
+    return None
+
+
+def parse_match_json(text: str):
+    """The structured match result in ``text`` with normalized fields, or None when there is none."""
+    cleaned = re.sub(r"```(?:json)?", "", text or "")
+    start, end = cleaned.find("{"), cleaned.rfind("}")
+    if start == -1 or end < start:
+        return None
+    try:
+        data = json.loads(cleaned[start:end + 1])
+        score = int(round(float(str(data.get("score")).strip().rstrip("%"))))
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+    analysis = {"score": max(0, min(100, score))}
+    for field in SKILL_LISTS:
+        items = data.get(field) or []
+        if isinstance(items, str):
+            items = [items]
+        analysis[field] = [str(item).strip() for item in items if str(item).strip()] if isinstance(items, list) else []
+    analysis["experience_fit"] = data.get("experience_fit") if isinstance(data.get("experience_fit"), str) else None
+    analysis["recommendation"] = _pick(data.get("recommendation"), RECOMMENDATIONS)
+    analysis["confidence"] = _pick(data.get("confidence"), CONFIDENCE_LEVELS)
+    analysis["summary"] = str(data.get("summary") or "").strip()
+    return analysis
+
+
+def extract_match_score(analysis) -> int:
+    """Score of a match result: the ``score`` of a structured result, or the one in a narrative analysis."""
+    if isinstance(analysis, dict):
+        return analysis.get("score") if isinstance(analysis.get("score"), int) else 0
+    if not isinstance(analysis, str):
+        return 0
     try:
-        match = re.search(r'OVERALL MATCH SCORE:\s*(\d{1,3})%', analysis_text, re.IGNORECASE)
+        match = MATCH_SCORE_PATTERN.search(analysis)
         if match:
-            score = int(match.group(1))
+            score = min(100, int(match.group(1)))
             print(f"[DEBUG] Extracted score: {score}")
             return score
+        structured = parse_match_json(analysis)
+        if structured is not None:
+            return structured["score"]
     except Exception as e:
         print(f"[DEBUG] Error extracting score: {e}")
     return 0
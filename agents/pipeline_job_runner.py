@@ -0,0 +1,170 @@
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from config.langchain_config import LangChainConfig
+from database.pipeline_job_store import PipelineJobStore
+from database.llm_usage_store import get_llm_usage_store
+from agents.task_manager import ranking_key
+from utils.admission import AdmissionRejected
+from utils.single_flight import request_key
+
+
+class PipelineJobRunner:
+    """Run /trigger_pipeline requests as background jobs with pollable progress.
+
+    Each process runs jobs on its own bounded executor and heartbeats the jobs it
+    owns, queued ones included. Jobs left behind by a dead worker are picked up by the next heartbeat of
+    any live worker and resume from the candidates (and stages) they had not finished yet.
+    With an ``admission`` controller every job holds a "batch" slot while it runs,
+    so background jobs count against the same limits as synchronous pipelines.
+    """
+
+    def __init__(self, task_manager, store: PipelineJobStore = None, max_jobs: int = None, admission=None):
+        self.task_manager = task_manager
+        self.admission = admission
+        self.store = store or PipelineJobStore()
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.executor = ThreadPoolExecutor(max_workers=max_jobs or LangChainConfig.PIPELINE_JOB_WORKERS)
+        self.lease_seconds = LangChainConfig.PIPELINE_JOB_LEASE_SECONDS
+        self.heartbeat_seconds = LangChainConfig.PIPELINE_JOB_HEARTBEAT_SECONDS
+        self._active = set()
+        # request key -> job id of queued/running jobs submitted to this process
+        self._job_by_key = {}
+        self._lock = threading.Lock()
+        self._submit_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat_thread = None
+
+    def start(self):
+        if self._heartbeat_thread is None:
+            self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name="pipeline-job-heartbeat", daemon=True)
+            self._heartbeat_thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def submit(self, job_post: dict, candidates: list, options: dict = None) -> str:
+        """Queue a pipeline job; ``options`` are orchestrate_application keyword options.
+
+        Submitting a payload identical to a job that is still queued or running
+        returns that job's id instead of starting a second run.
+        """
+        payload = {"jobPost": job_post, "candidateList": candidates, "options": options or {}}
+        key = request_key(payload)
+        # Serialize submissions so two identical requests can't both create a job
+        with self._submit_lock:
+            with self._lock:
+                job_id = self._job_by_key.get(key)
+                if job_id in self._active:
+                    return job_id
+                backlog = len(self._active)
+            if backlog >= LangChainConfig.PIPELINE_JOB_MAX_BACKLOG:
+                raise AdmissionRejected(f"{backlog} pipeline jobs already queued or running", LangChainConfig.PIPELINE_JOB_HEARTBEAT_SECONDS)
+
+            job_id = self.store.create_job(payload, total=len(candidates), owner=self.owner)
+            with self._lock:
+                self._job_by_key[key] = job_id
+            self._schedule(job_id)
+        return job_id
+
+    def get_job(self, job_id: str):
+        job = self.store.get_job(job_id)
+        if job:
+            job["results"].sort(key=ranking_key, reverse=True)
+            if LangChainConfig.LLM_USAGE_ENABLED:
+                # From the usage log (the job id is the run id), so calls by a worker that died mid-job count too
+                job["usage"] = get_llm_usage_store().summary({"run_id": job_id}, group_by="task_type")
+        return job
+
+    def _schedule(self, job_id: str):
+        with self._lock:
+            if job_id in self._active:
+                return
+            self._active.add(job_id)
+        self.executor.submit(self._run, job_id)
+
+    def _admit(self):
+        """Wait for a batch admission slot; a busy server delays the job rather than failing it."""
+        while True:
+            try:
+                return self.admission.acquire("batch")
+            except AdmissionRejected as e:
+                time.sleep(e.retry_after)
+
+    def _run(self, job_id: str):
+        # The job stays queued (and heartbeated) until a slot frees up
+        slot = self._admit() if self.admission else None
+        try:
+            if not self.store.claim_job(job_id, self.owner):
+                return
+
+            payload = self.store.get_payload(job_id) or {}
+            candidates = payload.get("candidateList", [])
+            done = self.store.get_results(job_id)
+            pending = [index for index in range(len(candidates)) if index not in done]
+            if done:
+                print(f"Resuming pipeline job {job_id}: {len(done)}/{len(candidates)} candidates already done")
+
+            indexes = {}
+            lost = []
+
+            def on_result(position, result):
+                indexes[id(result)] = pending[position]
+                # Another worker reclaimed the job (our heartbeats stalled): stop rather than race it
+                if not self.store.record_result(job_id, pending[position], result, self.owner):
+                    lost.append(position)
+                    return False
+
+            results = self.task_manager.orchestrate_application(
+                payload.get("jobPost", {}),
+                [candidates[index] for index in pending],
+                on_result=on_result,
+                # The job id doubles as the checkpoint run id, so a recovered job skips finished stages
+                run_id=job_id,
+                resume=True,
+                # Candidates finished before the restart keep their places in the embedding shortlist
+                shortlist_pool=[result["embedding_similarity"] for result in done.values() if "embedding_similarity" in result],
+                **payload.get("options", {})
+            )
+            # Match narratives are written once the ranking is known, after on_result stored the result
+            for result in results:
+                if lost:
+                    break
+                if "match_narrative" in result or "match_narrative_error" in result:
+                    if not self.store.record_result(job_id, indexes[id(result)], result, self.owner):
+                        lost.append(indexes[id(result)])
+            if lost or not self.store.finish_job(job_id, "completed", self.owner):
+                print(f"Pipeline job {job_id} was reclaimed by another worker; stopped here")
+        except Exception:
+            tb = traceback.format_exc()
+            print(f"Error in pipeline job {job_id}:", tb)
+            self.store.finish_job(job_id, "failed", self.owner, error=tb)
+        finally:
+            if slot:
+                slot.release()
+            with self._lock:
+                self._active.discard(job_id)
+                self._job_by_key = {key: active_id for key, active_id in self._job_by_key.items() if active_id != job_id}
+
+    def _heartbeat_loop(self):
+        while not self._stop.is_set():
+            try:
+                with self._lock:
+                    active = list(self._active)
+                self.store.heartbeat(active, self.owner)
+
+                for job_id in self.store.find_stale_jobs(self.lease_seconds):
+                    with self._lock:
+                        # Leave the rest to other workers (or a later heartbeat) rather than overrun the backlog
+                        if len(self._active) >= LangChainConfig.PIPELINE_JOB_MAX_BACKLOG:
+                            break
+                    if self.store.reclaim_job(job_id, self.owner, self.lease_seconds):
+                        print(f"Recovering stale pipeline job {job_id}")
+                        self._schedule(job_id)
+            except Exception as e:
+                print(f"Error in pipeline job heartbeat: {e}")
+            self._stop.wait(self.heartbeat_seconds)
@@ -1,122 +1,739 @@
+import asyncio
+import contextvars
 import os
-from database.langchain_vector_db import LangChainVectorDB
+import json
+import hashlib
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED, TimeoutError as FuturesTimeout
+from config.langchain_config import LangChainConfig
+from database.langchain_vector_db import get_shared_vector_db
+from database.pipeline_checkpoint_store import PipelineCheckpointStore
+from database.candidate_result_store import CandidateResultStore
+from database.job_ranking_store import JobRankingStore
 from utils.hash_utils import get_file_hash
+from utils.metrics import TASK_DURATION, CV_SUMMARY_CACHE, CANDIDATE_RESULT_CACHE
+from utils.embedding_shortlist import cosine_similarities, select_shortlist
+from utils.deadline import Deadline, deadline_from_context
+from utils.llm_usage import UsageTotals
+from utils.task_context import task_scope, attribution_scope
 from agents.langchain_job_matcher_agent import extract_match_score
+from agents.base_agent import BaseAgent
 from agents.langchain_github_summary_agent import LangChainGitHubSummaryAgent  # ✅ fixed import
 
 
+def ranking_key(result: dict):
+    """Sort key for ranked results (use with reverse=True).
+
+    LLM-scored candidates always rank above embedding-only scores from the shortlist stage.
+    """
+    return (result.get("score_source") != "embedding", result.get("score", 0))
+
+
+class StageFailed(Exception):
+    """Raised by a pipeline stage to stop every stage that depends on it."""
+
+
+class Stage:
+    def __init__(self, name: str, func, requires: tuple = (), inline: bool = False, checkpoint: bool = True):
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        # Inline stages are cheap CPU checks run on the caller's thread
+        self.inline = inline
+        # Checkpointed outputs must be JSON-serializable; others re-run when a dependent needs them
+        self.checkpoint = checkpoint
+
+
+class StageGraph:
+    """Run a small dependency graph of stages, overlapping independent branches.
+
+    Each stage function receives a dict with the outputs of the stages it requires.
+    A stage that raises is recorded in ``errors`` and all of its dependents are skipped.
+    ``completed`` holds outputs restored from a checkpoint: those stages are not re-run,
+    and non-checkpointed stages only run when a stage that still has to run needs them.
+    """
+
+    def __init__(self, stages: list):
+        self.stages = {}
+        for stage in stages:
+            for dep in stage.requires:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage '{stage.name}' requires '{dep}', which must be declared before it")
+            self.stages[stage.name] = stage
+
+    def _stages_to_run(self, completed: dict) -> set:
+        to_run = set()
+        # Walk dependents before their requirements so "needed by" is known for each stage
+        for name in reversed(list(self.stages)):
+            if name in completed:
+                continue
+            stage = self.stages[name]
+            needed = any(name in self.stages[other].requires for other in to_run)
+            if stage.checkpoint or needed:
+                to_run.add(name)
+        return to_run
+
+    def run(self, executor, completed: dict = None, on_stage_done=None):
+        completed = {name: output for name, output in (completed or {}).items() if name in self.stages}
+        to_run = self._stages_to_run(completed)
+        outputs, errors, skipped = dict(completed), {}, []
+        remaining = {name: stage for name, stage in self.stages.items() if name in to_run}
+        running = {}
+
+        def finish(name, output):
+            outputs[name] = output
+            if on_stage_done and self.stages[name].checkpoint:
+                try:
+                    on_stage_done(name, output)
+                except Exception as e:
+                    print(f"Error checkpointing stage '{name}': {e}")
+
+        while remaining or running:
+            progressed = True
+            while progressed:
+                progressed = False
+                for name, stage in list(remaining.items()):
+                    if any(dep in errors or dep in skipped for dep in stage.requires):
+                        skipped.append(name)
+                        del remaining[name]
+                        progressed = True
+                    elif all(dep in outputs for dep in stage.requires):
+                        inputs = {dep: outputs[dep] for dep in stage.requires}
+                        del remaining[name]
+                        if stage.inline:
+                            try:
+                                finish(name, stage.func(inputs))
+                            except Exception as e:
+                                errors[name] = str(e)
+                            progressed = True
+                        else:
+                            # Stage threads keep the caller's task context (LLM usage attribution)
+                            running[executor.submit(contextvars.copy_context().run, stage.func, inputs)] = name
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    finish(name, future.result())
+                except Exception as e:
+                    errors[name] = str(e)
+
+        return outputs, errors, skipped
+
+
+class _AgentSlot:
+    """Holds an agent factory and constructs the agent on first use."""
+
+    def __init__(self, factory=None, instance=None):
+        self.factory = factory
+        self.instance = instance
+        self.lock = threading.Lock()
+
+    def get(self):
+        if self.instance is None:
+            with self.lock:
+                if self.instance is None:
+                    self.instance = self.factory()
+        return self.instance
+
+
 class TaskManager:
+    # Job-independent stages, shared across jobs in matrix mode
+    PREPARE_STAGES = ("safeguard", "download", "cv_hash", "cv_summary", "github_summary")
+    # Stages every candidate goes through before the embedding shortlist
+    SHORTLIST_STAGES = ("safeguard", "download", "cv_hash", "cv_summary")
+    # Enough to look up a memoized result for the candidate
+    FINGERPRINT_STAGES = ("safeguard", "download", "cv_hash")
+    # Task types the LLM stages of a candidate's result run as
+    STAGE_TASK_TYPES = {
+        "cv_summary": "summarize_cv",
+        "github_summary": "summarize_github_profile",
+        "match": "match_cv"
+    }
+    # LLM usage of interview tasks is attributed to a session per candidate email and interview kind
+    INTERVIEW_SESSIONS = {
+        "start_interview": "interview",
+        "continue_interview": "interview",
+        "conduct_full_interview": "interview",
+        "evaluate_interview": "interview",
+        "start_general_interview": "general_interview",
+        "answer_general": "general_interview"
+    }
+
     def __init__(self, agents):
-        self.agents = agents
+        # task_type -> _AgentSlot; agents are built lazily the first time one of their tasks runs
+        self._registry = {}
+        # Agents that don't declare TASK_TYPES are still matched with a can_handle scan
+        self._fallback_agents = []
+        # Runs tasks that carry a deadline, so run_task can give up on a stuck call
+        self._deadline_executor = ThreadPoolExecutor(
+            max_workers=LangChainConfig.TASK_DEADLINE_WORKERS, thread_name_prefix="task-deadline"
+        )
+        for agent in agents:
+            self.register_agent(agent)
+
         # Optionally auto-add GitHub agent if missing
-        if not any(isinstance(agent, LangChainGitHubSummaryAgent) for agent in agents):
-            self.agents.append(LangChainGitHubSummaryAgent())
+        if "summarize_github_profile" not in self._registry:
+            self.register_agent(LangChainGitHubSummaryAgent)
+
+    def register_agent(self, agent, task_types=None):
+        """Register an agent instance, or an agent class / zero-arg factory built on first use."""
+        if isinstance(agent, BaseAgent):
+            slot = _AgentSlot(instance=agent)
+            task_types = task_types or agent.TASK_TYPES
+            if not task_types:
+                self._fallback_agents.append(agent)
+                return
+        else:
+            slot = _AgentSlot(factory=agent)
+            task_types = task_types or getattr(agent, "TASK_TYPES", ())
+            if not task_types:
+                raise ValueError(f"Agent factory {agent!r} must declare TASK_TYPES or pass task_types")
+
+        for task_type in task_types:
+            self._registry[task_type] = slot
+
+    @property
+    def agents(self):
+        """Agents constructed so far."""
+        built = {id(slot.instance): slot.instance for slot in self._registry.values() if slot.instance is not None}
+        return list(built.values()) + self._fallback_agents
+
+    def get_agent(self, task_type: str):
+        slot = self._registry.get(task_type)
+        if slot is not None:
+            return slot.get()
+        for agent in self._fallback_agents:
+            if agent.can_handle(task_type):
+                return agent
+        return None
 
     def run_task(self, task_type: str, data: dict = None, context: dict = None):
-        """Run a specific task by delegating to the appropriate agent."""
+        """Run a specific task by delegating to the appropriate agent.
+
+        When ``context["deadline"]`` is a :class:`Deadline`, the task returns
+        ``{"error": ..., "timed_out": True}`` once it expires instead of blocking the caller.
+        """
         data = data or {}
 
         # Ensure 'task_type' is inside data
         data.setdefault("task_type", task_type)
 
-        for agent in self.agents:
-            if agent.can_handle(task_type):
+        start = time.perf_counter()
+        agent_name = "none"
+        try:
+            agent = self.get_agent(task_type)
+            if agent is None:
+                result = {"error": f"No agent found to handle task type: {task_type}"}
+            else:
+                agent_name = agent.name
+                deadline = deadline_from_context(context)
+                if deadline is None:
+                    result = self._perform(agent, task_type, data, context)
+                else:
+                    result = self._perform_with_deadline(agent, task_type, data, context, deadline)
+        except Exception as e:
+            result = {"error": f"Error in task '{task_type}' by agent '{agent_name}': {str(e)}"}
+
+        if self._timed_out(result):
+            status = "timeout"
+        else:
+            status = "error" if self._is_error(result) else "success"
+        TASK_DURATION.observe(time.perf_counter() - start, task_type=task_type, agent=agent_name, status=status)
+        return result
+
+    def stream_task(self, task_type: str, data: dict = None, context: dict = None):
+        """Streaming ``run_task``: yields ``("token", text)`` chunks, then ``("result", result)``.
+
+        Agents without a streaming path yield just the result. Meant for short
+        interactive generations, so deadlines in ``context`` are not applied.
+        """
+        data = data or {}
+        data.setdefault("task_type", task_type)
+
+        start = time.perf_counter()
+        agent_name = "none"
+        result = None
+        with task_scope(task_type), attribution_scope(**self._attribution(task_type, data)):
+            try:
+                agent = self.get_agent(task_type)
+                if agent is None:
+                    result = {"error": f"No agent found to handle task type: {task_type}"}
+                elif not hasattr(agent, "stream_task"):
+                    agent_name = agent.name
+                    result = agent.perform_task(data, context)
+                else:
+                    agent_name = agent.name
+                    for kind, value in agent.stream_task(data, context):
+                        if kind == "result":
+                            result = value
+                        else:
+                            yield kind, value
+            except Exception as e:
+                result = {"error": f"Error in task '{task_type}' by agent '{agent_name}': {str(e)}"}
+
+        status = "error" if self._is_error(result) else "success"
+        TASK_DURATION.observe(time.perf_counter() - start, task_type=task_type, agent=agent_name, status=status)
+        yield "result", result
+
+    async def run_task_async(self, task_type: str, data: dict = None, context: dict = None):
+        """Async ``run_task``: awaits the agent's ``perform_task_async`` on the running event loop.
+
+        Results, deadline handling and metrics match ``run_task``; an expired deadline
+        cancels the awaited LLM call instead of leaving a thread behind.
+        """
+        data = data or {}
+        data.setdefault("task_type", task_type)
+
+        start = time.perf_counter()
+        agent_name = "none"
+        try:
+            # Agent construction may load models or open databases, so keep it off the loop
+            agent = await asyncio.to_thread(self.get_agent, task_type)
+            if agent is None:
+                result = {"error": f"No agent found to handle task type: {task_type}"}
+            else:
+                agent_name = agent.name
+                deadline = deadline_from_context(context)
+                if deadline is None:
+                    result = await self._perform_async(agent, task_type, data, context)
+                elif deadline.expired():
+                    result = {"error": f"Task '{task_type}' timed out before it started", "timed_out": True}
+                else:
+                    try:
+                        result = await asyncio.wait_for(
+                            self._perform_async(agent, task_type, data, context), timeout=deadline.remaining()
+                        )
+                    except asyncio.TimeoutError:
+                        result = {"error": f"Task '{task_type}' timed out", "timed_out": True}
+        except Exception as e:
+            result = {"error": f"Error in task '{task_type}' by agent '{agent_name}': {str(e)}"}
+
+        if self._timed_out(result):
+            status = "timeout"
+        else:
+            status = "error" if self._is_error(result) else "success"
+        TASK_DURATION.observe(time.perf_counter() - start, task_type=task_type, agent=agent_name, status=status)
+        return result
+
+    def _perform_with_deadline(self, agent, task_type: str, data: dict, context: dict, deadline: Deadline):
+        if deadline.expired():
+            return {"error": f"Task '{task_type}' timed out before it started", "timed_out": True}
+
+        future = self._deadline_executor.submit(
+            contextvars.copy_context().run, self._perform, agent, task_type, data, context
+        )
+        try:
+            return future.result(timeout=deadline.remaining())
+        except FuturesTimeout:
+            # The call itself can't be interrupted; its HTTP timeout bounds how long the thread lingers
+            future.cancel()
+            return {"error": f"Task '{task_type}' timed out", "timed_out": True}
+
+    @classmethod
+    def _attribution(cls, task_type: str, data: dict) -> dict:
+        """LLM usage labels carried by the task data itself: candidate email and interview session."""
+        email = data.get("candidate_email") or data.get("email")
+        kind = cls.INTERVIEW_SESSIONS.get(task_type)
+        return {"candidate": email, "session": f"{kind}:{email}" if kind and email else None}
+
+    @classmethod
+    def _perform(cls, agent, task_type: str, data: dict, context: dict):
+        # The task scope lets the LLM layer attribute (and cache or not) calls per task type
+        with task_scope(task_type), attribution_scope(**cls._attribution(task_type, data)):
+            return agent.perform_task(data, context)
+
+    @classmethod
+    async def _perform_async(cls, agent, task_type: str, data: dict, context: dict):
+        with task_scope(task_type), attribution_scope(**cls._attribution(task_type, data)):
+            return await agent.perform_task_async(data, context)
+
+    @staticmethod
+    def _timed_out(result) -> bool:
+        return isinstance(result, dict) and result.get("timed_out") is True
+
+    @staticmethod
+    def _is_error(result) -> bool:
+        """Agents report failures either as {"error": ...} dicts or as "Error ..." strings."""
+        if isinstance(result, dict):
+            return "error" in result
+        return isinstance(result, str) and result.startswith("Error")
+
+    def orchestrate_application(self, job_post: dict, candidates: list, on_result=None,
+                                narrative_top_k: int = None, **options):
+        """Coordinate full hiring workflow: download → summarize → match → email.
+
+        Candidates are processed concurrently on a bounded thread pool; a failure
+        in one candidate is reported in its own result and never aborts the run.
+        Within a candidate, independent stages (CV and GitHub summaries) overlap.
+        ``on_result(index, result)`` is called as each candidate finishes; if it returns
+        False the run stops there and only the results so far are returned, unranked.
+        The ``narrative_top_k`` best candidates (default ``MATCH_NARRATIVE_TOP_K``)
+        also get a long-form ``match_narrative`` once the ranking is known.
+        ``options`` are passed to :meth:`iter_application_results`.
+        """
+        results = [None] * len(candidates)
+        for index, result in self.iter_application_results(job_post, candidates, **options):
+            results[index] = result
+            if on_result:
                 try:
-                    return agent.perform_task(data, context)
+                    keep_going = on_result(index, result)
                 except Exception as e:
-                    return {"error": f"Error in task '{task_type}' by agent '{agent.name}': {str(e)}"}
+                    print(f"Error in result callback for candidate {index}: {e}")
+                    continue
+                if keep_going is False:
+                    # Leaving the loop drops the candidates still queued
+                    return [result for result in results if result is not None]
 
-        return {"error": f"No agent found to handle task type: {task_type}"}
+        # Sort candidates by match score descending
+        results.sort(key=ranking_key, reverse=True)
+        if narrative_top_k is None:
+            narrative_top_k = LangChainConfig.MATCH_NARRATIVE_TOP_K
+        if narrative_top_k > 0:
+            self.add_match_narratives(job_post, results[:narrative_top_k], usage=options.get("usage"))
+        return results
 
-    def orchestrate_application(self, job_post: dict, candidates: list):
-        """Coordinate full hiring workflow: download → summarize → match → email."""
-        vector_db = LangChainVectorDB()
-        results = []
+    def add_match_narratives(self, job_post: dict, results: list, usage: UsageTotals = None, max_workers: int = None):
+        """Add a long-form ``match_narrative`` to each LLM-matched result, concurrently.
 
-        # Load cached CV summaries
-        existing_cv_summaries = vector_db.get_all_cv_summaries()
-        hash_to_summary = {
-            cv.get("metadata", {}).get("file_hash"): cv["text"]
-            for cv in existing_cv_summaries
-            if cv.get("metadata", {}).get("file_hash")
+        Results without a structured match (errors, embedding-only scores, narrative
+        mode) are left as they are; a failed narrative is reported in ``match_narrative_error``.
+        """
+        job_description = job_post.get("jobDescription", "")
+
+        def explain(result):
+            with attribution_scope(usage, candidate=result.get("email")):
+                return self.run_task("explain_match", {
+                    "cv_summary": result.get("cv_summary", ""),
+                    "github_summary": result.get("github_summary") or "",
+                    "job_summary": job_description,
+                    "match_analysis": result["match_analysis"]
+                })
+
+        eligible = [
+            result for result in results
+            if "error" not in result and isinstance(result.get("match_analysis"), dict)
+        ]
+        if not eligible:
+            return results
+        workers = max(1, min(len(eligible), max_workers or LangChainConfig.PIPELINE_MAX_WORKERS))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for result, narrative in zip(eligible, executor.map(explain, eligible)):
+                if self._is_error(narrative):
+                    result["match_narrative_error"] = narrative["error"] if isinstance(narrative, dict) else narrative
+                else:
+                    result["match_narrative"] = narrative
+        return results
+
+    def add_candidates_to_job(self, job_key: str, candidates: list, job_post: dict = None,
+                              usage: UsageTotals = None, **options):
+        """Process only the candidates not yet ranked for ``job_key`` and merge them into its ranking.
+
+        With an embedding shortlist the top K is taken over the whole ranking, not just the
+        new candidates; candidates ranked by embedding only are reconsidered when added again.
+
+        The job post is stored the first time a job key is seen. Candidates whose
+        processing fails are reported in ``errors`` and left out of the ranking, so
+        adding them again retries them. ``usage`` totals the LLM calls made for the new candidates.
+        ``options`` are passed to :meth:`iter_application_results`.
+        """
+        store = JobRankingStore()
+        stored_job_post = store.get_job_post(job_key)
+        if stored_job_post is None:
+            if not job_post:
+                return {"error": f"Unknown job '{job_key}': jobPost is required the first time"}
+            store.create_job(job_key, job_post)
+            stored_job_post = job_post
+        elif job_post and job_post.get("jobDescription") != stored_job_post.get("jobDescription"):
+            return {"error": f"jobPost differs from the one ranked as '{job_key}'; use a new job key"}
+
+        ranked = store.get_results(job_key)
+        new_candidates = []
+        queued = set()
+        for candidate in candidates:
+            candidate_key = self._candidate_key(candidate)
+            previous = ranked.get(candidate_key)
+            # Embedding-only entries get another chance at the shortlist when submitted again
+            if candidate_key not in queued and (previous is None or previous.get("score_source") == "embedding"):
+                queued.add(candidate_key)
+                new_candidates.append(candidate)
+        # Everyone else already ranked still competes for the top K: a new candidate is LLM-matched only
+        # if it ranks among the best K of the whole job, not just of this batch
+        pool = [
+            result["embedding_similarity"] for candidate_key, result in ranked.items()
+            if candidate_key not in queued and "embedding_similarity" in result
+        ]
+
+        errors = []
+        usage = usage or UsageTotals()
+        for index, result in self.iter_application_results(
+                stored_job_post, new_candidates, usage=usage, shortlist_pool=pool, **options):
+            if "error" in result:
+                errors.append(result)
+            else:
+                store.add_result(job_key, self._candidate_key(new_candidates[index]), result)
+
+        return {
+            "job_key": job_key,
+            "added": len(new_candidates) - len(errors),
+            "skipped": len(candidates) - len(new_candidates),
+            "errors": errors,
+            "ranking": store.get_ranking(job_key),
+            "usage": usage.summary()
         }
 
+    def iter_application_results(self, job_post: dict, candidates: list, max_workers: int = None,
+                                 run_id: str = None, resume: bool = False,
+                                 shortlist_top_k: int = None, shortlist_threshold: float = None,
+                                 shortlist_pool: list = None, time_budget_seconds: float = None,
+                                 usage: UsageTotals = None):
+        """Yield ``(index, result)`` for each candidate in completion order.
+
+        With a ``run_id`` every stage output is checkpointed; ``resume=True`` reuses
+        the checkpoints of that run and only computes the missing stages.
+        With ``shortlist_top_k`` or ``shortlist_threshold`` the CV summaries are first
+        ranked by embedding similarity to the job description, and only the shortlist
+        (the top K if ``shortlist_top_k`` is set, otherwise those above the threshold)
+        goes through GitHub summarization, LLM matching and email. Shortlisted results
+        record their ``embedding_similarity``; pass those of candidates ranked earlier
+        (a resumed job, an incremental ranking) as ``shortlist_pool`` so they keep
+        their places in the top K without being processed again.
+        ``time_budget_seconds`` (default ``PIPELINE_TIME_BUDGET_SECONDS``) bounds the whole
+        request: stages still running when it expires report a timeout, and each candidate
+        lists its ``timed_out_stages``.
+        Each result carries the candidate's LLM ``usage``; pass ``usage`` to also collect the run's total.
+        """
+        max_workers = max(1, max_workers or LangChainConfig.PIPELINE_MAX_WORKERS)
+        if shortlist_top_k is None and shortlist_threshold is None:
+            shortlist_top_k = LangChainConfig.SHORTLIST_TOP_K
+            shortlist_threshold = LangChainConfig.SHORTLIST_THRESHOLD
+        use_shortlist = shortlist_top_k is not None or shortlist_threshold is not None
+        run = PipelineRun(job_post, run_id=run_id, resume=resume, time_budget_seconds=time_budget_seconds, usage=usage)
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        # Stage threads only wait on I/O, never on other stages, so a shared pool cannot deadlock
+        run.stage_executor = ThreadPoolExecutor(max_workers=max_workers * 2)
+        try:
+            if use_shortlist:
+                results = self._iter_shortlisted_results(
+                    run, executor, candidates, shortlist_top_k, shortlist_threshold, shortlist_pool
+                )
+            else:
+                futures = {
+                    executor.submit(self._process_candidate, run, candidate): index
+                    for index, candidate in enumerate(candidates)
+                }
+                results = self._iter_completed(futures, candidates)
+            for index, result in results:
+                if "error" in result or result.get("timed_out_stages"):
+                    run.incomplete = True
+                yield index, result
+            run.discard_checkpoints()
+        finally:
+            # If the consumer stops early (e.g. a streaming client disconnects), drop queued candidates
+            executor.shutdown(wait=False, cancel_futures=True)
+            run.stage_executor.shutdown(wait=False)
+
+    def _iter_completed(self, futures: dict, candidates: list):
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {
+                    "candidate_name": self._candidate_name(candidates[index]),
+                    "error": f"Unexpected error processing candidate: {str(e)}"
+                }
+            yield index, result
+
+    def _iter_shortlisted_results(self, run, executor, candidates: list, top_k: int, threshold: float,
+                                  pool: list = None):
+        """Summarize every CV, pre-rank by embedding similarity, and LLM-match only the shortlist.
+
+        ``pool`` holds the similarities of candidates already ranked, which compete for the top K too.
+        """
+        # ---- Phase 1: CV summaries for everyone ----
+        def prepare(candidate):
+            if not (candidate.get("cvURL") or candidate.get("cvPath")):
+                return {"error": "No CV URL provided"}
+            with run.attribution(candidate):
+                outputs, error, timed_out = self._run_candidate_graph(run, candidate, self.SHORTLIST_STAGES)
+            return self._error_outputs(error, timed_out) if error else outputs
+
+        prepared = {}
+        futures = {executor.submit(prepare, candidate): index for index, candidate in enumerate(candidates)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                outputs = future.result()
+            except Exception as e:
+                outputs = {"error": f"Unexpected error processing candidate: {str(e)}"}
+            if "error" in outputs:
+                yield index, {
+                    "candidate_name": self._candidate_name(candidates[index]),
+                    **outputs,
+                    "usage": run.candidate_usage(candidates[index]).summary()
+                }
+            else:
+                prepared[index] = outputs
+
+        # ---- Phase 2: embedding pre-ranking ----
+        indices = sorted(prepared)
+        similarities = cosine_similarities(
+            run.vector_db.embeddings,
+            run.job_post.get("jobDescription", ""),
+            [prepared[index]["cv_summary"] for index in indices]
+        )
+        pool = [float(similarity) for similarity in pool or []]
+        selected = select_shortlist(list(similarities) + pool, top_k=top_k, threshold=threshold)
+        shortlisted = {indices[i] for i in selected if i < len(indices)}
+        print(f"Embedding shortlist: {len(shortlisted)}/{len(indices)} candidates sent to LLM matching"
+              + (f" ({len(pool)} ranked earlier)" if pool else ""))
+
+        for i, index in enumerate(indices):
+            if index in shortlisted:
+                continue
+            result = self._build_result(candidates[index], prepared[index]["cv_summary"], None, None)
+            result.update({
+                "score": max(0, int(round(float(similarities[i]) * 100))),
+                "score_source": "embedding",
+                "embedding_similarity": float(similarities[i]),
+                "shortlisted": False,
+                "usage": run.candidate_usage(candidates[index]).summary()
+            })
+            yield index, result
+
+        # ---- Phase 3: full LLM matching for the shortlist ----
+        futures = {
+            executor.submit(self._process_candidate, run, candidates[index], prepared[index]): index
+            for index in indices if index in shortlisted
+        }
+        similarity_of = dict(zip(indices, similarities))
+        for index, result in self._iter_completed(futures, candidates):
+            if "error" not in result:
+                result["shortlisted"] = True
+                result["embedding_similarity"] = float(similarity_of[index])
+            yield index, result
+
+    @staticmethod
+    def _candidate_name(candidate: dict) -> str:
+        return f"{candidate.get('firstName', '')} {candidate.get('lastName', '')}".strip()
+
+    @staticmethod
+    def _candidate_key(candidate: dict) -> str:
+        """Stable identity of a candidate within a run, independent of list position."""
+        identity = json.dumps([
+            candidate.get("email"), candidate.get("cvURL") or candidate.get("cvPath"), candidate.get("github_url")
+        ])
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:32]
+
+    def _candidate_stages(self, run, candidate: dict, timed_out: list) -> list:
+        """Build the per-candidate stage graph.
+
+        Every stage runs its task under its share of the run's time budget and
+        appends its name to ``timed_out`` when that runs out.
+
+        safeguard → download → cv_hash → cv_summary ─┬→ match
+                  └→ github_summary ─────────────────┘
+                                          cv_summary → email
+        """
+        job_post = run.job_post
         job_description = job_post.get("jobDescription", "")
         job_title = job_post.get("jobTitle", "Unknown Job")
 
-        for candidate in candidates:
-            full_name = f"{candidate.get('firstName', '')} {candidate.get('lastName', '')}".strip()
-            cv_url = candidate.get("cvURL")
-            github_url = candidate.get("github_url")
-            email = candidate.get("email", "unknown@example.com")
-
-            # ---- Step 1: Validate CV ----
-            if not cv_url:
-                results.append({"candidate_name": full_name, "error": "No CV URL provided"})
-                continue
+        full_name = self._candidate_name(candidate)
+        cv_url = candidate.get("cvURL")
+        github_url = candidate.get("github_url")
+        email = candidate.get("email", "unknown@example.com")
+
+        def run_stage_task(stage: str, task_type: str, data: dict):
+            result = self.run_task(task_type, data, run.stage_context(stage))
+            if self._timed_out(result):
+                timed_out.append(stage)
+            return result
+
+        def safeguard(_):
+            safeguard_result = self.run_task("safeguard_data_check", {"candidate_data": candidate})
+            if "error" in safeguard_result:
+                raise StageFailed(safeguard_result["error"])
+            return safeguard_result
 
-            download_result = self.run_task("download_file", {
+        def download(_):
+            # Local CVs (e.g. the matrix CLI over data/cv_pdfs) skip the HTTP download
+            if candidate.get("cvPath"):
+                if not os.path.exists(candidate["cvPath"]):
+                    raise StageFailed(f"CV file not found: {candidate['cvPath']}")
+                return candidate["cvPath"]
+
+            # Candidates run concurrently, so CVs whose URLs share a basename (cv.pdf) need their own file
+            url_hash = hashlib.sha256(cv_url.encode("utf-8")).hexdigest()[:16]
+            download_result = run_stage_task("download", "download_file", {
                 "url": cv_url,
-                "filename": os.path.basename(cv_url)
+                "filename": f"{url_hash}_{os.path.basename(cv_url.split('?')[0]) or 'cv.pdf'}"
             })
-
             if "error" in download_result:
-                results.append({"candidate_name": full_name, "error": download_result["error"]})
-                continue
+                raise StageFailed(download_result["error"])
 
             local_cv_path = download_result.get("file_path")
             if not local_cv_path or not os.path.exists(local_cv_path):
-                results.append({"candidate_name": full_name, "error": "Downloaded file missing"})
-                continue
+                raise StageFailed("Downloaded file missing")
+            return local_cv_path
 
-            # ---- Step 2: Summarize CV (cached if exists) ----
-            file_hash = get_file_hash(local_cv_path)
-            if file_hash in hash_to_summary:
-                cv_summary = hash_to_summary[file_hash]
-            else:
-                summary_result = self.run_task("summarize_cv", {"cv_path": local_cv_path})
-                if isinstance(summary_result, dict) and "error" in summary_result:
-                    results.append({"candidate_name": full_name, "error": summary_result["error"]})
-                    continue
+        def cv_hash(inputs):
+            return get_file_hash(inputs["download"])
 
-                cv_summary = summary_result
-                vector_db.add_text_document(
-                    text=cv_summary,
-                    doc_id=email,
-                    doc_type="cv_summary",
-                    file_hash=file_hash,
-                    email=email
-                )
-                hash_to_summary[file_hash] = cv_summary
+        def cv_summary(inputs):
+            local_cv_path = inputs["download"]
+            file_hash = inputs["cv_hash"]
+            summary = run.cached_summary(file_hash)
+            if summary is not None:
+                CV_SUMMARY_CACHE.inc(result="hit")
+                return summary
+            CV_SUMMARY_CACHE.inc(result="miss")
 
-            # ---- Step 3: Run Safeguard ----
-            safeguard_result = self.run_task("safeguard_data_check", {"candidate_data": candidate})
-            if "error" in safeguard_result:
-                results.append({"candidate_name": full_name, "error": safeguard_result["error"]})
-                continue
+            summary_result = run_stage_task("cv_summary", self.STAGE_TASK_TYPES["cv_summary"], {"cv_path": local_cv_path})
+            if isinstance(summary_result, dict) and "error" in summary_result:
+                raise StageFailed(summary_result["error"])
+            # Agents report LLM failures as "Error ..." strings: never store one as the summary
+            if self._is_error(summary_result):
+                raise StageFailed(summary_result)
 
-            # ---- Step 4: Summarize GitHub ----
-            github_summary = "No GitHub URL provided."
-            if github_url:
-                github_summary_result = self.run_task("summarize_github_profile", {"github_url": github_url})
-                if isinstance(github_summary_result, dict) and "error" in github_summary_result:
-                    github_summary = f"Error: {github_summary_result['error']}"
-                else:
-                    github_summary = github_summary_result
+            run.vector_db.add_text_document(
+                text=summary_result,
+                doc_id=email,
+                doc_type="cv_summary",
+                file_hash=file_hash,
+                email=email
+            )
+            run.cache_summary(file_hash, summary_result)
+            return summary_result
 
-            # ---- Step 5: Job Matching ----
-            #combined_summary = f"{cv_summary}\n\nGITHUB PROFILE:\n{github_summary}"
-            match_result = self.run_task("match_cv", {
-                "cv_summary": cv_summary,
-                "github_summary": github_summary,
+        def github_summary(_):
+            if not github_url:
+                return "No GitHub URL provided."
+            github_summary_result = run_stage_task("github_summary", self.STAGE_TASK_TYPES["github_summary"], {"github_url": github_url})
+            if isinstance(github_summary_result, dict) and "error" in github_summary_result:
+                return f"Error: {github_summary_result['error']}"
+            return github_summary_result
+
+        def match(inputs):
+            match_result = run_stage_task("match", self.STAGE_TASK_TYPES["match"], {
+                "cv_summary": inputs["cv_summary"],
+                "github_summary": inputs["github_summary"],
                 "job_summary": job_description
             })
+            if self._is_error(match_result):
+                raise StageFailed(match_result["error"] if isinstance(match_result, dict) else match_result)
+            return match_result
 
-            score = extract_match_score(match_result) if isinstance(match_result, str) else 0
-
-            # ---- Step 6: Send Email ----
-            email_result = self.run_task("send_email", {
-                "cv_summary": cv_summary,
+        def send_email(inputs):
+            return run_stage_task("email", "send_email", {
+                "cv_summary": inputs["cv_summary"],
                 "job_summary": job_description,
                 "candidate_email": email,
                 "candidate_name": full_name,
@@ -124,17 +741,317 @@ class TaskManager:
                 "closing_date": job_post.get("closingDate", "")
             })
 
-            # ---- Step 7: Append Results ----
-            results.append({
-                "candidate_name": full_name,
-                "email": email,
-                "score": score,
-                "match_analysis": match_result,
-                #"email_content": email_result,
-                "cv_summary": cv_summary,
-                "github_summary": github_summary
+        return [
+            # Pure CPU check: runs inline and cuts the candidate short before any I/O
+            Stage("safeguard", safeguard, inline=True, checkpoint=False),
+            # The local file path is only meaningful in this process, so downloads aren't checkpointed
+            Stage("download", download, requires=("safeguard",), checkpoint=False),
+            Stage("cv_hash", cv_hash, requires=("download",)),
+            Stage("cv_summary", cv_summary, requires=("download", "cv_hash")),
+            Stage("github_summary", github_summary, requires=("safeguard",)),
+            Stage("match", match, requires=("cv_summary", "github_summary")),
+            Stage("email", send_email, requires=("cv_summary",)),
+        ]
+
+    def _run_candidate_graph(self, run, candidate: dict, stage_names: tuple = None, completed: dict = None):
+        """Run the candidate's stage graph (optionally only ``stage_names``).
+
+        ``completed`` holds stage outputs already computed earlier in this run.
+        Returns ``(outputs, error, timed_out)``; ``error`` is the first failing stage's
+        message and ``timed_out`` lists the stages that ran out of time.
+        """
+        candidate_key = self._candidate_key(candidate)
+        completed = {**run.load_checkpoints(candidate_key), **(completed or {})}
+
+        timed_out = []
+        stages = self._candidate_stages(run, candidate, timed_out)
+        if stage_names:
+            stages = [stage for stage in stages if stage.name in stage_names]
+
+        requires = {stage.name: stage.requires for stage in stages}
+        unsaved = set()
+
+        def on_stage_done(stage, output):
+            # Timeout fallbacks and tolerated failures (e.g. "Error: ..." GitHub summaries) aren't
+            # real results, and neither is anything built on them: leave them out so a resumed run retries them
+            if stage in timed_out or self._is_error(output) or unsaved.intersection(requires[stage]):
+                unsaved.add(stage)
+                run.incomplete = True
+                return
+            run.save_checkpoint(candidate_key, stage, output)
+
+        graph = StageGraph(stages)
+        outputs, errors, _ = graph.run(run.stage_executor, completed=completed, on_stage_done=on_stage_done)
+
+        timed_out = [stage.name for stage in stages if stage.name in timed_out]
+        for stage in stages:
+            if stage.name in errors and stage.name != "email":
+                return outputs, errors[stage.name], timed_out
+        return outputs, None, timed_out
+
+    @staticmethod
+    def _build_result(candidate: dict, cv_summary: str, github_summary: str, match_result) -> dict:
+        score = extract_match_score(match_result)
+        return {
+            "candidate_name": TaskManager._candidate_name(candidate),
+            "email": candidate.get("email", "unknown@example.com"),
+            "score": score,
+            "match_analysis": match_result,
+            "cv_summary": cv_summary,
+            "github_summary": github_summary
+        }
+
+    def _process_candidate(self, run, candidate: dict, completed: dict = None):
+        """Run the per-candidate stage graph and return its result entry, with the candidate's LLM usage."""
+        with run.attribution(candidate):
+            result = self._candidate_result(run, candidate, completed)
+        result["usage"] = run.candidate_usage(candidate).summary()
+        return result
+
+    def _candidate_result(self, run, candidate: dict, completed: dict = None):
+        full_name = self._candidate_name(candidate)
+        if not (candidate.get("cvURL") or candidate.get("cvPath")):
+            return {"candidate_name": full_name, "error": "No CV URL provided"}
+
+        result_key = None
+        if run.results:
+            # Fingerprint the CV first: an unchanged candidate skips every LLM stage (and the email)
+            outputs, error, timed_out = self._run_candidate_graph(run, candidate, self.FINGERPRINT_STAGES, completed)
+            if error:
+                return {"candidate_name": full_name, **self._error_outputs(error, timed_out)}
+            result_key = run.result_key(outputs["cv_hash"], candidate.get("github_url"))
+            cached = run.cached_result(result_key, candidate)
+            if cached is not None:
+                return cached
+            completed = {**(completed or {}), **outputs}
+
+        outputs, error, timed_out = self._run_candidate_graph(run, candidate, completed=completed)
+        if error:
+            return {"candidate_name": full_name, **self._error_outputs(error, timed_out)}
+
+        result = self._build_result(candidate, outputs["cv_summary"], outputs["github_summary"], outputs["match"])
+        if timed_out:
+            result["timed_out_stages"] = timed_out
+        elif result_key:
+            run.save_result(result_key, result)
+        return result
+
+    @staticmethod
+    def _error_outputs(error: str, timed_out: list) -> dict:
+        return {"error": error, "timed_out_stages": timed_out} if timed_out else {"error": error}
+
+    def orchestrate_matrix(self, job_posts: list, candidates: list, max_workers: int = None,
+                           run_id: str = None, resume: bool = False, time_budget_seconds: float = None,
+                           usage: UsageTotals = None):
+        """Score every candidate against every job post.
+
+        CV and GitHub summaries are computed once per candidate and reused for all
+        M jobs; the M×N ``match_cv`` calls then run concurrently. Returns one entry
+        per job post, in input order, each with its own ranked ``results``.
+        Pass ``usage`` to collect the LLM usage of the whole run.
+        """
+        max_workers = max(1, max_workers or LangChainConfig.PIPELINE_MAX_WORKERS)
+        run = PipelineRun({}, run_id=run_id, resume=resume, time_budget_seconds=time_budget_seconds, usage=usage)
+        prepared = [None] * len(candidates)
+        rankings = [[] for _ in job_posts]
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        run.stage_executor = ThreadPoolExecutor(max_workers=max_workers * 2)
+        try:
+            # ---- Phase 1: per-candidate summaries, shared by all jobs ----
+            def prepare(candidate):
+                if not (candidate.get("cvURL") or candidate.get("cvPath")):
+                    return {"error": "No CV URL provided"}
+                with run.attribution(candidate):
+                    outputs, error, timed_out = self._run_candidate_graph(run, candidate, self.PREPARE_STAGES)
+                return self._error_outputs(error, timed_out) if error else outputs
+
+            def match(candidate, job_post, outputs):
+                with run.attribution(candidate):
+                    return self.run_task("match_cv", {
+                        "cv_summary": outputs["cv_summary"],
+                        "github_summary": outputs["github_summary"],
+                        "job_summary": job_post.get("jobDescription", "")
+                    }, run.stage_context("match"))
+
+            futures = {executor.submit(prepare, candidate): index for index, candidate in enumerate(candidates)}
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    prepared[index] = future.result()
+                except Exception as e:
+                    prepared[index] = {"error": f"Unexpected error processing candidate: {str(e)}"}
+
+            # ---- Phase 2: M×N job matching ----
+            match_futures = {}
+            for job_index, job_post in enumerate(job_posts):
+                for index, outputs in enumerate(prepared):
+                    if "error" in outputs:
+                        rankings[job_index].append({"candidate_name": self._candidate_name(candidates[index]), **outputs})
+                        continue
+                    if run.results:
+                        result_key = run.result_key(
+                            outputs["cv_hash"], candidates[index].get("github_url"), job_post.get("jobDescription", "")
+                        )
+                        cached = run.cached_result(result_key, candidates[index])
+                        if cached is not None:
+                            rankings[job_index].append(cached)
+                            continue
+                    future = executor.submit(match, candidates[index], job_post, outputs)
+                    match_futures[future] = (job_index, index)
+
+            for future in as_completed(match_futures):
+                job_index, index = match_futures[future]
+                outputs = prepared[index]
+                try:
+                    match_result = future.result()
+                except Exception as e:
+                    match_result = {"error": str(e)}
+                if self._is_error(match_result):
+                    error = match_result["error"] if isinstance(match_result, dict) else match_result
+                    result = {"candidate_name": self._candidate_name(candidates[index]), "error": error}
+                    if self._timed_out(match_result):
+                        result["timed_out_stages"] = ["match"]
+                    rankings[job_index].append(result)
+                    continue
+                result = self._build_result(candidates[index], outputs["cv_summary"], outputs["github_summary"], match_result)
+                if run.results:
+                    result_key = run.result_key(
+                        outputs["cv_hash"], candidates[index].get("github_url"), job_posts[job_index].get("jobDescription", "")
+                    )
+                    run.save_result(result_key, result)
+                rankings[job_index].append(result)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            run.stage_executor.shutdown(wait=False)
+
+        if any("error" in result for results in rankings for result in results):
+            run.incomplete = True
+        run.discard_checkpoints()
+
+        matrix = []
+        for job_post, results in zip(job_posts, rankings):
+            results.sort(key=ranking_key, reverse=True)
+            matrix.append({
+                "job_title": job_post.get("jobTitle", "Unknown Job"),
+                "results": results
             })
+        return matrix
 
-        # Sort candidates by match score descending
-        results.sort(key=lambda x: x.get("score", 0), reverse=True)
-        return results
+
+class PipelineRun:
+    """Shared state of one orchestrate_application run across its candidate threads."""
+
+    def __init__(self, job_post: dict, run_id: str = None, resume: bool = False,
+                 time_budget_seconds: float = None, usage: UsageTotals = None):
+        self.job_post = job_post
+        self.run_id = run_id
+        # LLM calls are logged under the run id, or a fresh id for runs without checkpoints
+        self.usage_id = run_id or uuid.uuid4().hex
+        self.usage = usage or UsageTotals()
+        self._candidate_usage = {}
+        self._usage_lock = threading.Lock()
+        self.resume = resume
+        if time_budget_seconds is None:
+            time_budget_seconds = LangChainConfig.PIPELINE_TIME_BUDGET_SECONDS
+        self.time_budget_seconds = time_budget_seconds
+        self.deadline = Deadline(time_budget_seconds)
+        self.vector_db = get_shared_vector_db()
+        self.checkpoints = PipelineCheckpointStore() if run_id else None
+        # Set when a candidate failed or a stage wasn't checkpointed, i.e. a resume has work left
+        self.incomplete = False
+        self.results = CandidateResultStore() if LangChainConfig.RESULT_CACHE_ENABLED else None
+        self.stage_executor = None
+
+        # Load cached CV summaries
+        existing_cv_summaries = self.vector_db.get_all_cv_summaries()
+        self._hash_to_summary = {
+            cv.get("metadata", {}).get("file_hash"): cv["text"]
+            for cv in existing_cv_summaries
+            if cv.get("metadata", {}).get("file_hash")
+        }
+        self._summary_lock = threading.Lock()
+
+    def cached_summary(self, file_hash: str):
+        with self._summary_lock:
+            return self._hash_to_summary.get(file_hash)
+
+    def cache_summary(self, file_hash: str, summary: str):
+        with self._summary_lock:
+            self._hash_to_summary[file_hash] = summary
+
+    def result_key(self, file_hash: str, github_url: str, job_description: str = None) -> str:
+        """Memo key of a candidate's final result: everything the result depends on."""
+        if job_description is None:
+            job_description = self.job_post.get("jobDescription", "")
+        identity = json.dumps([
+            file_hash,
+            github_url or "",
+            hashlib.sha256(job_description.encode("utf-8")).hexdigest(),
+            # Model routes of the tasks the result is built from
+            [LangChainConfig.route_for(task_type) for task_type in TaskManager.STAGE_TASK_TYPES.values()],
+            LangChainConfig.PIPELINE_PROMPT_VERSION,
+            # Offline runs share ./pipeline_state with live ones: keep their results apart
+            LangChainConfig.llm_backend_identity()
+        ])
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    def cached_result(self, result_key: str, candidate: dict):
+        cached = self.results.get(result_key)
+        if cached is None:
+            CANDIDATE_RESULT_CACHE.inc(result="miss")
+            return None
+        CANDIDATE_RESULT_CACHE.inc(result="hit")
+        # Name and email aren't part of the key, so take them from the current request
+        cached.update({
+            "candidate_name": TaskManager._candidate_name(candidate),
+            "email": candidate.get("email", "unknown@example.com"),
+            "cached": True
+        })
+        return cached
+
+    def save_result(self, result_key: str, result: dict):
+        # Only memoize clean results: a failed match or GitHub lookup should be retried next time
+        if TaskManager._is_error(result.get("match_analysis")) or TaskManager._is_error(result.get("github_summary")):
+            return
+        try:
+            self.results.put(result_key, result)
+        except Exception as e:
+            print(f"Error saving candidate result: {e}")
+
+    def candidate_usage(self, candidate: dict) -> UsageTotals:
+        """LLM usage of one candidate across every phase of this run."""
+        with self._usage_lock:
+            return self._candidate_usage.setdefault(TaskManager._candidate_key(candidate), UsageTotals())
+
+    def attribution(self, candidate: dict):
+        """Attribute the LLM calls inside the block to this run and ``candidate``."""
+        return attribution_scope(
+            self.usage, self.candidate_usage(candidate),
+            run_id=self.usage_id,
+            candidate=candidate.get("email") or TaskManager._candidate_name(candidate)
+        )
+
+    def stage_context(self, stage: str):
+        """Task context for one stage: a deadline at its share of the budget, capped by the run's."""
+        if self.time_budget_seconds is None:
+            return None
+        share = LangChainConfig.STAGE_BUDGET_SHARES.get(stage, 1.0)
+        return {"deadline": self.deadline.child(self.time_budget_seconds * share)}
+
+    def load_checkpoints(self, candidate_key: str) -> dict:
+        if not (self.checkpoints and self.resume):
+            return {}
+        return self.checkpoints.load_stages(self.run_id, candidate_key)
+
+    def save_checkpoint(self, candidate_key: str, stage: str, output):
+        if self.checkpoints:
+            self.checkpoints.save_stage(self.run_id, candidate_key, stage, output)
+
+    def discard_checkpoints(self):
+        """Delete the run's checkpoints once every candidate finished cleanly: nothing is left to resume."""
+        if self.checkpoints and not self.incomplete:
+            try:
+                self.checkpoints.delete_run(self.run_id)
+            except Exception as e:
+                print(f"Error deleting checkpoints of run {self.run_id}: {e}")
@@ -1,8 +1,19 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context
 from datetime import datetime, timedelta
+import json
+import functools
+import time
 import traceback
+from config.langchain_config import LangChainConfig
+from utils.admission import AdmissionController, AdmissionRejected
+from utils.single_flight import SingleFlight, request_key
+from utils.metrics import REGISTRY
+from utils.llm_usage import UsageTotals
 from flask_cors import CORS 
-from agents.task_manager import TaskManager
+from agents.task_manager import TaskManager, ranking_key
+from agents.pipeline_job_runner import PipelineJobRunner
+from database.job_ranking_store import JobRankingStore
+from database.llm_usage_store import get_llm_usage_store
 from agents.langchain_cv_summary_agent import LangChainCVSummaryAgent
 from agents.langchain_job_matcher_agent import LangChainJobMatcherAgent
 from agents.langchain_interview_agent import LangChainInterviewAgent
@@ -13,18 +24,18 @@ from agents.data_privacy_agent import DataPrivacyAgent
 from agents.job_post_generation_agent import JobPostGenerationAgent
 from agents.general_interview_agent import GeneralInterviewAgent
 
-# Setup agents
+# Setup agents (classes are registered by task type and constructed on first use)
 existing_agents = [
-    LangChainCVSummaryAgent(),
-    LangChainJobMatcherAgent(),
-    LangChainInterviewAgent(),
-    GeneralInterviewAgent(),
-    LangChainEmailGenerationAgent(),
-    LangChainCVInfoExtractorAgent(),
-    JobPostGenerationAgent()
+    LangChainCVSummaryAgent,
+    LangChainJobMatcherAgent,
+    LangChainInterviewAgent,
+    GeneralInterviewAgent,
+    LangChainEmailGenerationAgent,
+    LangChainCVInfoExtractorAgent,
+    JobPostGenerationAgent
 ]
-infrastructure_agents = [FileDownloadAgent()]
-safeguard_agents = [DataPrivacyAgent()]
+infrastructure_agents = [FileDownloadAgent]
+safeguard_agents = [DataPrivacyAgent]
 all_agents = existing_agents + infrastructure_agents + safeguard_agents
 
 # Initialize Task Manager
@@ -32,8 +43,110 @@ task_manager = TaskManager(all_agents)
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
+# Admission control: batch pipelines, heavy single-shot LLM calls and interactive interviews
+admission = AdmissionController(
+    LangChainConfig.ADMISSION_LIMITS,
+    total=LangChainConfig.ADMISSION_TOTAL_CONCURRENCY,
+    reserved={"interactive": LangChainConfig.ADMISSION_RESERVED_INTERACTIVE},
+    queue_timeout=LangChainConfig.ADMISSION_QUEUE_TIMEOUT_SECONDS
+)
+# Background pipeline jobs run under "batch" slots too, like synchronous ones
+job_runner = PipelineJobRunner(task_manager, admission=admission).start()
+
+
+# Identical requests already in flight (double submits, client retries) share one run
+pipeline_flights = SingleFlight()
+extract_flights = SingleFlight()
+
+
+def busy_response(error: AdmissionRejected):
+    response = jsonify({"success": False, "message": f"Server busy: {error}", "retry_after": error.retry_after})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+
+def admitted(endpoint_class: str):
+    """Run the view only once admission control grants an ``endpoint_class`` slot, else 429."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                slot = admission.acquire(endpoint_class)
+            except AdmissionRejected as e:
+                return busy_response(e)
+            try:
+                response = app.make_response(view(*args, **kwargs))
+            except Exception:
+                slot.release()
+                raise
+            # Streaming responses keep their slot until the stream is closed
+            if response.is_streamed:
+                response.call_on_close(slot.release)
+            else:
+                slot.release()
+            return response
+        return wrapper
+    return decorator
+
+
+def encode_event(event: str, payload: dict, use_sse: bool) -> str:
+    """One NDJSON line, or one Server-Sent Event with ``use_sse``."""
+    if use_sse:
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+    return json.dumps({"event": event, **payload}) + "\n"
+
+
+def event_stream(events, use_sse: bool):
+    mimetype = "text/event-stream" if use_sse else "application/x-ndjson"
+    return Response(
+        stream_with_context(events),
+        mimetype=mimetype,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ---------------------------- PIPELINE ROUTES ---------------------------- #
 
+def is_integer(value) -> bool:
+    """A JSON integer; ``true``/``false`` arrive as bools, which Python also counts as ints."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def parse_pipeline_options(data: dict):
+    """Validate the optional pipeline tuning fields. Returns (options, error_message)."""
+    options = {}
+
+    max_workers = data.get("maxWorkers")
+    if max_workers is not None:
+        if not is_integer(max_workers) or max_workers < 1:
+            return None, "maxWorkers must be a positive integer"
+        options["max_workers"] = max_workers
+
+    top_k = data.get("shortlistTopK")
+    if top_k is not None:
+        if not is_integer(top_k) or top_k < 1:
+            return None, "shortlistTopK must be a positive integer"
+        options["shortlist_top_k"] = top_k
+
+    threshold = data.get("shortlistThreshold")
+    if threshold is not None:
+        if not is_number(threshold) or not -1 <= threshold <= 1:
+            return None, "shortlistThreshold must be a number between -1 and 1"
+        options["shortlist_threshold"] = float(threshold)
+
+    budget = data.get("timeBudgetSeconds")
+    if budget is not None:
+        if not is_number(budget) or budget <= 0:
+            return None, "timeBudgetSeconds must be a positive number"
+        options["time_budget_seconds"] = float(budget)
+
+    return options, None
+
+
 @app.route('/trigger_pipeline', methods=['POST'])
 def trigger_pipeline():
     try:
@@ -44,15 +157,175 @@ def trigger_pipeline():
 
         job_post = data.get("jobPost", {})
         candidates = data.get("candidateList", [])
-        results = task_manager.orchestrate_application(job_post, candidates)
-
-        return jsonify({"success": True, "results": results})
+        options, error = parse_pipeline_options(data)
+        if error:
+            return jsonify({"success": False, "message": error}), 400
+        # Long-form match narratives for the best candidates (others: POST /explain_match on demand)
+        narrative_top_k = data.get("narrativeTopK")
+        if narrative_top_k is not None:
+            if not is_integer(narrative_top_k) or narrative_top_k < 0:
+                return jsonify({"success": False, "message": "narrativeTopK must be a non-negative integer"}), 400
+            options["narrative_top_k"] = narrative_top_k
+
+        # Async mode: queue a background job and let the client poll /jobs/<job_id>
+        if data.get("async") or request.args.get("async") in ("1", "true"):
+            try:
+                job_id = job_runner.submit(job_post, candidates, options)
+            except AdmissionRejected as e:
+                return busy_response(e)
+            return jsonify({
+                "success": True,
+                "job_id": job_id,
+                "status": "queued",
+                "status_url": f"/jobs/{job_id}"
+            }), 202
+
+        # Checkpointed runs: pass the same runId with resume=true to redo only the missing stages
+        run_id = data.get("runId")
+        resume = bool(data.get("resume"))
+        if resume and not run_id:
+            return jsonify({"success": False, "message": "resume requires a runId"}), 400
+
+        def run_pipeline():
+            with admission.admit("batch"):
+                usage = UsageTotals()
+                results = task_manager.orchestrate_application(
+                    job_post, candidates, run_id=run_id, resume=resume, usage=usage, **options
+                )
+                return results, usage.summary()
+
+        # Duplicates wait on the running computation without taking an admission slot
+        key = request_key("trigger_pipeline", job_post, candidates, options, run_id, resume)
+        try:
+            (results, usage), shared = pipeline_flights.do(key, run_pipeline)
+        except AdmissionRejected as e:
+            return busy_response(e)
+
+        response = {"success": True, "results": results, "usage": usage}
+        if shared:
+            response["coalesced"] = True
+        if run_id:
+            response["run_id"] = run_id
+        return jsonify(response)
     except Exception:
         tb = traceback.format_exc()
         print("Error in /trigger_pipeline:", tb)
         return jsonify({"success": False, "message": "Internal server error", "error": tb}), 500
 
 
+@app.route('/trigger_pipeline/stream', methods=['POST'])
+@admitted("batch")
+def trigger_pipeline_stream():
+    """Stream each candidate's result as it completes, then the final ranking.
+
+    Emits NDJSON by default, or Server-Sent Events with ``?format=sse``.
+    Only the ranking (name, email, score) is kept in memory between events.
+    """
+    try:
+        content = request.json or {}
+        data = content.get("data")
+        if not data:
+            return jsonify({"success": False, "message": "Missing application data"}), 400
+
+        job_post = data.get("jobPost", {})
+        candidates = data.get("candidateList", [])
+        options, error = parse_pipeline_options(data)
+        if error:
+            return jsonify({"success": False, "message": error}), 400
+
+        use_sse = request.args.get("format") == "sse"
+
+        def encode(event: str, payload: dict) -> str:
+            return encode_event(event, payload, use_sse)
+
+        def generate():
+            ranking = []
+            usage = UsageTotals()
+            try:
+                yield encode("start", {"total": len(candidates)})
+                for index, result in task_manager.iter_application_results(job_post, candidates, usage=usage, **options):
+                    ranking.append({
+                        "index": index,
+                        "candidate_name": result.get("candidate_name"),
+                        "email": result.get("email"),
+                        "score": result.get("score", 0),
+                        "score_source": result.get("score_source", "llm"),
+                        "timed_out_stages": result.get("timed_out_stages", []),
+                        "error": result.get("error")
+                    })
+                    yield encode("candidate", {"index": index, "completed": len(ranking), "result": result})
+
+                ranking.sort(key=ranking_key, reverse=True)
+                yield encode("ranking", {"success": True, "ranking": ranking, "usage": usage.summary()})
+            except Exception:
+                tb = traceback.format_exc()
+                print("Error in /trigger_pipeline/stream:", tb)
+                yield encode("error", {"success": False, "message": "Internal server error", "error": tb})
+
+        return event_stream(generate(), use_sse)
+    except Exception:
+        tb = traceback.format_exc()
+        print("Error in /trigger_pipeline/stream:", tb)
+        return jsonify({"success": False, "message": "Internal server error", "error": tb}), 500
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_pipeline_job(job_id):
+    try:
+        job = job_runner.get_job(job_id)
+        if not job:
+            return jsonify({"success": False, "message": f"Job not found: {job_id}"}), 404
+
+        return jsonify({"success": True, "job": job})
+    except Exception:
+        tb = traceback.format_exc()
+        print("Error in /jobs:", tb)
+        return jsonify({"success": False, "message": "Internal server error", "error": tb}), 500
+
+
+@app.route('/rankings/<job_key>', methods=['GET'])
+def get_job_ranking(job_key):
+    try:
+        store = JobRankingStore()
+        job_post = store.get_job_post(job_key)
+        if job_post is None:
+            return jsonify({"success": False, "message": f"Job not found: {job_key}"}), 404
+        return jsonify({
+            "success": True,
+            "job_key": job_key,
+            "job_title": job_post.get("jobTitle", "Unknown Job"),
+            "ranking": store.get_ranking(job_key)
+        })
+    except Exception:
+        tb = traceback.format_exc()
+        print("Error in /rankings:", tb)
+        return jsonify({"success": False, "message": "Internal server error", "error": tb}), 500
+
+
+@app.route('/rankings/<job_key>/candidates', methods=['POST'])
+@admitted("batch")
+def add_candidates_to_job(job_key):
+    try:
+        content = request.json or {}
+        data = content.get("data")
+        if not data:
+            return jsonify({"success": False, "message": "Missing application data"}), 400
+
+        candidates = data.get("candidateList", [])
+        options, error = parse_pipeline_options(data)
+        if error:
+            return jsonify({"success": False, "message": error}), 400
+
+        result = task_manager.add_candidates_to_job(job_key, candidates, job_post=data.get("jobPost"), **options)
+        if "error" in result:
+            return jsonify({"success": False, "message": result["error"]}), 400
+        return jsonify({"success": True, **result})
+    except Exception:
+        tb = traceback.format_exc()
+        print("Error in /rankings/candidates:", tb)
+        return jsonify({"success": False, "message": "Internal server error", "error": tb}), 500
+
+
 @app.route('/extract_profile', methods=['POST'])
 def extract_profile():
     try:
@@ -61,7 +334,14 @@ def extract_profile():
         if not cv_url:
             return jsonify({"success": False, "message": "Missing cvURL"}), 400
 
-        result = task_manager.run_task("extract_profile_info", {"cv_url": cv_url})
+        def run_extraction():
+            with admission.admit("heavy"):
+                return task_manager.run_task("extract_profile_info", {"cv_url": cv_url})
+
+        try:
+            result, _ = extract_flights.do(request_key("extract_profile", cv_url), run_extraction)
+        except AdmissionRejected as e:
+            return busy_response(e)
         if result.get("error"):
             return jsonify({"success": False, "message": result["error"], "raw": result.get("raw_response", "")}), 500
 
@@ -73,6 +353,7 @@ def extract_profile():
 
 
 @app.route('/generate_emails', methods=['POST'])
+@admitted("batch")
 def generate_emails():
     try:
         data = request.json or {}
@@ -136,7 +417,47 @@ def generate_emails():
         return jsonify({"success": False, "message": "Internal server error", "error": tb}), 500
 
 
+@app.route('/explain_match', methods=['POST'])
+@admitted("heavy")
+def explain_match():
+    """Long-form match analysis for one shortlisted candidate, on demand.
+
+    ``data.result`` is a candidate entry from a pipeline run or ranking; the job
+    comes from ``data.jobPost`` or, for stored rankings, ``data.jobKey``.
+    """
+    try:
+        content = request.json or {}
+        data = content.get("data") or {}
+        result = data.get("result") or {}
+        job_post = data.get("jobPost")
+        if job_post is None and data.get("jobKey"):
+            job_post = JobRankingStore().get_job_post(data["jobKey"])
+            if job_post is None:
+                return jsonify({"success": False, "message": f"Job not found: {data['jobKey']}"}), 404
+        if not job_post or not result.get("cv_summary"):
+            return jsonify({"success": False, "message": "Missing jobPost (or jobKey) or result.cv_summary"}), 400
+        if result.get("score_source") == "embedding":
+            return jsonify({"success": False, "message": "Candidate was not shortlisted for LLM matching"}), 400
+
+        narrative = task_manager.run_task("explain_match", {
+            "cv_summary": result["cv_summary"],
+            "github_summary": result.get("github_summary") or "",
+            "job_summary": job_post.get("jobDescription", ""),
+            "match_analysis": result.get("match_analysis"),
+            "candidate_email": result.get("email")
+        })
+        if TaskManager._is_error(narrative):
+            message = narrative["error"] if isinstance(narrative, dict) else narrative
+            return jsonify({"success": False, "message": message}), 500
+        return jsonify({"success": True, "candidate_name": result.get("candidate_name"), "match_narrative": narrative})
+    except Exception:
+        tb = traceback.format_exc()
+        print("Error in /explain_match:", tb)
+        return jsonify({"success": False, "message": "Internal server error", "error": tb}), 500
+
+
 @app.route('/generate_job_post', methods=['POST'])
+@admitted("heavy")
 def generate_job_post():
     try:
         data = request.json or {}
@@ -164,33 +485,72 @@ def generate_job_post():
         print("Error in /generate_job_post:", tb)
         return jsonify({"status": "error", "message": "Internal server error", "error": tb}), 500
 
+def question_stream(route: str, task_type: str, data: dict, build_payload):
+    """Stream a question-generating task for the interview pages.
+
+    Emits ``token`` events while the model writes the question, then one ``result``
+    event carrying the JSON the non-streaming route returns (NDJSON, or SSE with
+    ``?format=sse``). The question in ``result`` is authoritative.
+    """
+    use_sse = request.args.get("format") == "sse"
+
+    def generate():
+        try:
+            for kind, value in task_manager.stream_task(task_type, data):
+                if kind == "token":
+                    yield encode_event("token", {"text": value}, use_sse)
+                else:
+                    payload, _ = build_payload(value)
+                    yield encode_event("result", payload, use_sse)
+        except Exception:
+            tb = traceback.format_exc()
+            print(f"Error in {route}:", tb)
+            yield encode_event("error", {"success": False, "message": "Internal server error", "error": tb}, use_sse)
+
+    return event_stream(generate(), use_sse)
+
+
+def start_interview_task():
+    """Task data for /start_interview, or a 400 response."""
+    content = request.json or {}
+    email = content.get("email")
+    job_description = content.get("job_description", "")
+
+    if not email:
+        return None, (jsonify({"success": False, "message": "Missing email"}), 400)
+
+    return {
+        "task_type": "start_interview",
+        "email": email,
+        "job_description": job_description,
+        "violations": []
+    }, None
+
+
+def start_interview_payload(result):
+    if isinstance(result, dict) and "error" in result:
+        return {"success": False, "message": result["error"]}, 500
+
+    return {
+        "success": True,
+        "question": str(result.get("question")),
+        "violations": []
+    }, 200
+
+
 @app.route('/start_interview', methods=['POST'])
+@admitted("interactive")
 def start_interview():
     try:
-        content = request.json or {}
-        email = content.get("email")
-        job_description = content.get("job_description", "")
-
-        if not email:
-            return jsonify({"success": False, "message": "Missing email"}), 400
+        data, error_response = start_interview_task()
+        if error_response:
+            return error_response
 
         # Use run_task instead of perform_task
-        result = task_manager.run_task("start_interview", {
-            "task_type": "start_interview",
-            "email": email,
-            "job_description": job_description,
-            "violations":[]
-
-        })
+        result = task_manager.run_task("start_interview", data)
 
-        if isinstance(result, dict) and "error" in result:
-            return jsonify({"success": False, "message": result["error"]}), 500
-
-        return jsonify({
-            "success": True, 
-            "question": str(result.get("question")),
-            "violations":[]
-            })
+        payload, status = start_interview_payload(result)
+        return jsonify(payload), status
     except Exception:
         tb = traceback.format_exc()
         print("Error in /start_interview:", tb)
@@ -199,6 +559,20 @@ def start_interview():
             "message": "Internal server error", 
             "error": tb}), 500
 
+
+@app.route('/start_interview/stream', methods=['POST'])
+@admitted("interactive")
+def start_interview_stream():
+    try:
+        data, error_response = start_interview_task()
+        if error_response:
+            return error_response
+        return question_stream("/start_interview/stream", "start_interview", data, start_interview_payload)
+    except Exception:
+        tb = traceback.format_exc()
+        print("Error in /start_interview/stream:", tb)
+        return jsonify({"success": False, "message": "Internal server error", "error": tb}), 500
+
 # @app.route('/next_question', methods=['POST'])
 # def next_question():
 #     try:
@@ -253,51 +627,66 @@ def start_interview():
 #             "trace": tb
 #         }), 500
 
+def next_question_task():
+    """Task data for /next_question, or a 400 response."""
+    content = request.json or {}
+    email = content.get("email")
+    qa_history = content.get("qa_history", [])
+    violations = content.get("violations", [])
+
+    if not email:
+        return None, (jsonify({"success": False, "message": "Missing email"}), 400)
+
+    return {
+        "task_type": "continue_interview",
+        "email": email,
+        "qa_history": qa_history,
+        "violations": violations
+    }, None
+
+
+def next_question_payload(result):
+    # Handle error from agent
+    if "error" in result:
+        return {"success": False, "message": result["error"]}, 500
+
+    # If interview finished
+    if result.get("finished"):
+        evaluation = result.get("evaluation", {})
+        
+        # Directly use the LLM-generated feedback instead of placeholders
+        return {
+            "success": True,
+            "finished": True,
+            "message": result.get("message"),
+            "qa_history": result.get("qa_history", []),
+            "violations": result.get("violations", []),
+            "evaluation": evaluation  # pass actual feedback here
+        }, 200
+
+    # If interview not finished, return next question
+    return {
+        "success": True,
+        "finished": False,
+        "next_question": result.get("next_question"),
+        "qa_history": result.get("qa_history", []),
+        "violations": result.get("violations", [])
+    }, 200
+
+
 @app.route('/next_question', methods=['POST'])
+@admitted("interactive")
 def next_question():
     try:
-        content = request.json or {}
-        email = content.get("email")
-        qa_history = content.get("qa_history", [])
-        violations = content.get("violations", [])
-
-        if not email:
-            return jsonify({"success": False, "message": "Missing email"}), 400
+        data, error_response = next_question_task()
+        if error_response:
+            return error_response
 
         # Run the interview task
-        result = task_manager.run_task("continue_interview", {
-            "task_type": "continue_interview",
-            "email": email,
-            "qa_history": qa_history,
-            "violations": violations
-        })
-
-        # Handle error from agent
-        if "error" in result:
-            return jsonify({"success": False, "message": result["error"]}), 500
+        result = task_manager.run_task("continue_interview", data)
 
-        # If interview finished
-        if result.get("finished"):
-            evaluation = result.get("evaluation", {})
-            
-            # Directly use the LLM-generated feedback instead of placeholders
-            return jsonify({
-                "success": True,
-                "finished": True,
-                "message": result.get("message"),
-                "qa_history": result.get("qa_history", []),
-                "violations": result.get("violations", []),
-                "evaluation": evaluation  # pass actual feedback here
-            })
-
-        # If interview not finished, return next question
-        return jsonify({
-            "success": True,
-            "finished": False,
-            "next_question": result.get("next_question"),
-            "qa_history": result.get("qa_history", []),
-            "violations": result.get("violations", [])
-        })
+        payload, status = next_question_payload(result)
+        return jsonify(payload), status
 
     except Exception as e:
         tb = traceback.format_exc()
@@ -308,7 +697,23 @@ def next_question():
             "trace": tb
         }), 500
 
+
+@app.route('/next_question/stream', methods=['POST'])
+@admitted("interactive")
+def next_question_stream():
+    """Streams the next question; the final evaluation is not streamed, it arrives whole in ``result``."""
+    try:
+        data, error_response = next_question_task()
+        if error_response:
+            return error_response
+        return question_stream("/next_question/stream", "continue_interview", data, next_question_payload)
+    except Exception:
+        tb = traceback.format_exc()
+        print("Error in /next_question/stream:", tb)
+        return jsonify({"success": False, "message": "Internal server error", "error": tb}), 500
+
 @app.route('/complete_interview', methods=['POST'])
+@admitted("interactive")
 def complete_interview():
     try:
         content = request.json or {}
@@ -342,7 +747,17 @@ def complete_interview():
 
 # ---------------------------- GENERAL INTERVIEW ROUTES ---------------------------- #
 
+def start_general_payload(result):
+    return {
+        "success": True,
+        "question": result.get("question"),
+        "qa_history": [],
+        "message": "General interview started."
+    }, 200
+
+
 @app.route('/start_general_interview', methods=['POST'])
+@admitted("interactive")
 def start_general_interview():
     try:
         content = request.json or {}
@@ -356,61 +771,111 @@ def start_general_interview():
             "qa_history": []
         })
 
-        return jsonify({
-            "success": True,
-            "question": result.get("question"),
-            "qa_history": [],
-            "message": "General interview started."
-        })
+        payload, status = start_general_payload(result)
+        return jsonify(payload), status
 
     except Exception:
         tb = traceback.format_exc()
         return jsonify({"success": False, "message": "Internal server error", "error": tb}), 500
 
 
-@app.route('/answer_general', methods=['POST'])
-def answer_general():
+@app.route('/start_general_interview/stream', methods=['POST'])
+@admitted("interactive")
+def start_general_interview_stream():
     try:
         content = request.json or {}
         email = content.get("email")
-        answer = content.get("answer")
-        question = content.get("question")
-        qa_history = content.get("qa_history", [])
+        if not email:
+            return jsonify({"success": False, "message": "Missing email"}), 400
 
-        if not email or answer is None or not question:
-            return jsonify({"success": False, "message": "Missing email, question, or answer"}), 400
+        return question_stream("/start_general_interview/stream", "start_general_interview", {
+            "task_type": "start_general_interview",
+            "email": email,
+            "qa_history": []
+        }, start_general_payload)
 
-        # Append current Q&A
-        qa_history.append({"question": question, "answer": answer})
+    except Exception:
+        tb = traceback.format_exc()
+        return jsonify({"success": False, "message": "Internal server error", "error": tb}), 500
 
-        # Stop after 5 questions
-        if len(qa_history) >= 5:
-            return jsonify({
-                "success": True,
-                "finished": True,
-                "message": "General interview finished. Let's move on to technical questions.",
-                "qa_history": qa_history
-            })
 
-        # Get next question from agent (LLM)
-        result = task_manager.run_task("answer_general", {
-            "task_type": "answer_general",
-            "email": email,
-            "qa_history": qa_history
-        })
+def answer_general_task():
+    """Task data for /answer_general, or the response to send without asking the LLM."""
+    content = request.json or {}
+    email = content.get("email")
+    answer = content.get("answer")
+    question = content.get("question")
+    qa_history = content.get("qa_history", [])
 
-        return jsonify({
+    if not email or answer is None or not question:
+        return None, (jsonify({"success": False, "message": "Missing email, question, or answer"}), 400)
+
+    # Append current Q&A
+    qa_history.append({"question": question, "answer": answer})
+
+    # Stop after 5 questions
+    if len(qa_history) >= 5:
+        return None, jsonify({
             "success": True,
-            "question": result.get("question"),
+            "finished": True,
+            "message": "General interview finished. Let's move on to technical questions.",
             "qa_history": qa_history
         })
 
+    return {
+        "task_type": "answer_general",
+        "email": email,
+        "qa_history": qa_history
+    }, None
+
+
+def answer_general_payload(result, qa_history):
+    return {
+        "success": True,
+        "question": result.get("question"),
+        "qa_history": qa_history
+    }, 200
+
+
+@app.route('/answer_general', methods=['POST'])
+@admitted("interactive")
+def answer_general():
+    try:
+        data, early_response = answer_general_task()
+        if early_response:
+            return early_response
+
+        # Get next question from agent (LLM)
+        result = task_manager.run_task("answer_general", data)
+
+        payload, status = answer_general_payload(result, data["qa_history"])
+        return jsonify(payload), status
+
+    except Exception:
+        tb = traceback.format_exc()
+        return jsonify({"success": False, "message": "Internal server error", "error": tb}), 500
+
+
+@app.route('/answer_general/stream', methods=['POST'])
+@admitted("interactive")
+def answer_general_stream():
+    try:
+        data, early_response = answer_general_task()
+        if early_response:
+            return early_response
+
+        return question_stream(
+            "/answer_general/stream", "answer_general", data,
+            lambda result: answer_general_payload(result, data["qa_history"])
+        )
+
     except Exception:
         tb = traceback.format_exc()
         return jsonify({"success": False, "message": "Internal server error", "error": tb}), 500
 
 
 @app.route('/terminate_general', methods=['POST'])
+@admitted("interactive")
 def terminate_general():
     try:
         content = request.json or {}
@@ -459,10 +924,50 @@ def health_check():
     return jsonify({
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "service": "smart-recruitment-ai"
+        "service": "smart-recruitment-ai",
+        "admission": admission.snapshot()
     })
 
 
+# LLM usage (tokens, latency, cost) from the per-call log, shared by every worker process
+@app.route('/usage')
+def llm_usage():
+    """Filter with run_id, candidate, session, task_type, model or status, e.g.
+    ``/usage?run_id=<job id>&group_by=task_type`` or ``/usage?group_by=session&since_hours=24``.
+    ``slowest=N`` adds the N slowest calls.
+    """
+    try:
+        if not LangChainConfig.LLM_USAGE_ENABLED:
+            return jsonify({"success": False, "message": "LLM usage logging is disabled (LLM_USAGE_ENABLED)"}), 404
+
+        store = get_llm_usage_store()
+        filters = {name: request.args.get(name) for name in store.FILTERS if request.args.get(name)}
+        group_by = request.args.get("group_by")
+        if group_by and group_by not in store.GROUPS:
+            return jsonify({"success": False, "message": f"group_by must be one of {', '.join(store.GROUPS)}"}), 400
+        try:
+            since_hours = float(request.args["since_hours"]) if request.args.get("since_hours") else None
+            slowest = int(request.args.get("slowest", 0))
+        except ValueError:
+            return jsonify({"success": False, "message": "since_hours must be a number and slowest an integer"}), 400
+        since = time.time() - since_hours * 3600 if since_hours is not None else None
+
+        response = {"success": True, "filters": filters, "usage": store.summary(filters, group_by=group_by, since=since)}
+        if slowest > 0:
+            response["slowest"] = store.slowest(filters, limit=slowest, since=since)
+        return jsonify(response)
+    except Exception:
+        tb = traceback.format_exc()
+        print("Error in /usage:", tb)
+        return jsonify({"success": False, "message": "Internal server error", "error": tb}), 500
+
+
+# Prometheus scrape endpoint (per-process values)
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=False, use_reloader=False)
 
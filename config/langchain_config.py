@@ -1,4 +1,6 @@
 import os
+import json
+import threading
 from groq import Groq
 # Use modern HuggingFace embeddings to avoid deprecation warnings
 try:
@@ -7,6 +9,9 @@ except ImportError:
     from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
 from dotenv import load_dotenv
+from config.fake_llm import (
+    RecordingChatModel, ReplayChatModel, SyntheticChatModel, get_fixture_store, parse_error_rates
+)
 
 # Try to import ChatGroq, fallback to direct Groq if not available
 try:
@@ -18,9 +23,33 @@ except ImportError:
 
 load_dotenv()
 
+
+def _merge_route_overrides(routes: dict, overrides: str) -> dict:
+    """Apply a JSON object of per-task route overrides (field by field) to ``routes``."""
+    for task_type, override in json.loads(overrides or "{}").items():
+        routes[task_type] = {**routes.get(task_type, {}), **override}
+    return routes
+
+
 class LangChainConfig:
     # Groq Configuration
-    GROQ_API_KEY = os.getenv("GROQ_API_KEY", "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")
+    GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+    # LLM backend: groq (live), record (live + save fixtures), replay (fixtures only) or synthetic
+    LLM_BACKEND = os.getenv("LLM_BACKEND", "groq").lower()
+    LLM_FIXTURE_PATH = os.getenv("LLM_FIXTURE_PATH", "./pipeline_state/llm_fixtures.jsonl")
+    # What replay does with an unrecorded prompt: "error" or "synthetic"
+    LLM_REPLAY_MISSING = os.getenv("LLM_REPLAY_MISSING", "error").lower()
+    # groq and record get real completions; replay and synthetic answers must not mix with them
+    LLM_BACKEND_LIVE = LLM_BACKEND in ("groq", "record")
+    LLM_SYNTHETIC_LATENCY_MS = float(os.getenv("LLM_SYNTHETIC_LATENCY_MS", "800"))
+    LLM_SYNTHETIC_LATENCY_STDDEV_MS = float(os.getenv("LLM_SYNTHETIC_LATENCY_STDDEV_MS", "300"))
+    # e.g. "429:0.05,503:0.01,timeout:0.01" (probability per call)
+    LLM_SYNTHETIC_ERROR_RATES = parse_error_rates(os.getenv("LLM_SYNTHETIC_ERROR_RATES", ""))
+    LLM_SYNTHETIC_SEED = int(os.getenv("LLM_SYNTHETIC_SEED")) if os.getenv("LLM_SYNTHETIC_SEED") else None
+    # Live web search in matching prompts; off by default with fake backends so prompts stay replayable
+    MARKET_RESEARCH_ENABLED = os.getenv(
+        "MARKET_RESEARCH_ENABLED", "true" if LLM_BACKEND == "groq" else "false"
+    ).lower() == "true"
     
     # Available Groq models (updated for current models)
     GROQ_MODELS = {
@@ -34,6 +63,83 @@ class LangChainConfig:
     MODEL_NAME = GROQ_MODELS["llama-3.3-70b"]  # Use current model
     TEMPERATURE = 0.7
     MAX_TOKENS = 2048
+    FAST_MODEL_NAME = os.getenv("LLM_FAST_MODEL", GROQ_MODELS["llama-3.1-8b"])
+    # Job matching: "structured" = compact JSON (score, skills, recommendation, focus areas);
+    # "narrative" = the long-form analysis for every candidate. In structured mode the
+    # narrative is written on demand (explain_match) for shortlisted candidates only.
+    MATCH_OUTPUT_MODE = os.getenv("MATCH_OUTPUT_MODE", "structured").lower()
+    MATCH_NARRATIVE_TOP_K = int(os.getenv("MATCH_NARRATIVE_TOP_K", "0"))
+    # Task-aware model routing: short, low-stakes generations go to the fast model.
+    # Tasks without a route (CV/GitHub summaries, evaluation, email, match narratives) use
+    # the defaults above. ``json_mode`` asks the API for a JSON object. Override per task
+    # with LLM_MODEL_ROUTES, a JSON object such as
+    # {"match_cv": {"model": "llama-3.1-8b", "max_tokens": 1024}}; model aliases from
+    # GROQ_MODELS are accepted.
+    MODEL_ROUTES = _merge_route_overrides({
+        **({"match_cv": {"temperature": 0.0, "max_tokens": 512, "json_mode": True}}
+           if MATCH_OUTPUT_MODE == "structured" else {}),
+        "extract_profile_info": {"model": FAST_MODEL_NAME, "temperature": 0.0, "max_tokens": 256},
+        "extract_cv_info": {"model": FAST_MODEL_NAME, "temperature": 0.0, "max_tokens": 256},
+        "start_general_interview": {"model": FAST_MODEL_NAME, "max_tokens": 128},
+        "answer_general": {"model": FAST_MODEL_NAME, "max_tokens": 128},
+        "start_interview": {"model": FAST_MODEL_NAME, "max_tokens": 256},
+        "continue_interview": {"model": FAST_MODEL_NAME, "max_tokens": 256},
+        "conduct_full_interview": {"model": FAST_MODEL_NAME, "max_tokens": 256}
+    }, os.getenv("LLM_MODEL_ROUTES"))
+    # Upper bound on a single LLM HTTP request; pipeline deadlines can cut calls shorter
+    LLM_REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "60"))
+    HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "30"))
+    # Keep-alive pool shared by every LLM client in the process (see config/llm_gateway.py)
+    LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+    LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    # Groq rate limits, paced per model as Groq enforces them (0 = unlimited, the default);
+    # shared through SQLite by every worker on the host. To stay within Groq's free tier, set
+    # e.g. LLM_RATE_LIMITS={"llama-3.3-70b-versatile": [30, 12000], "llama-3.1-8b-instant": [30, 6000]}
+    # ([requests, tokens] per minute); models not listed use LLM_RATE_LIMIT_RPM / _TPM.
+    LLM_RATE_LIMIT_RPM = int(os.getenv("LLM_RATE_LIMIT_RPM", "0"))
+    LLM_RATE_LIMIT_TPM = int(os.getenv("LLM_RATE_LIMIT_TPM", "0"))
+    LLM_RATE_LIMITS = json.loads(os.getenv("LLM_RATE_LIMITS") or "{}")
+    LLM_RATE_LIMIT_SHARED = os.getenv("LLM_RATE_LIMIT_SHARED", "true").lower() == "true"
+    LLM_RATE_LIMIT_DB_PATH = os.getenv("LLM_RATE_LIMIT_DB_PATH", "./pipeline_state/rate_limit.db")
+    LLM_RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("LLM_RATE_LIMIT_MAX_WAIT_SECONDS", "120"))
+    LLM_EXPECTED_COMPLETION_TOKENS = int(os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", "512"))
+    # Retries of 429 / 5xx / connection errors with jittered exponential backoff
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+    LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "1"))
+    LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "30"))
+    # Disk-backed LLM response cache keyed by (model, temperature, max_tokens, normalized prompt)
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./pipeline_state/llm_cache.db")
+    LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+    # Conversational tasks should get a fresh completion every time
+    LLM_CACHE_DISABLED_TASKS = set(filter(None, os.getenv(
+        "LLM_CACHE_DISABLED_TASKS",
+        "start_interview,continue_interview,conduct_full_interview,start_general_interview,answer_general"
+    ).split(",")))
+    # Per-call LLM usage log (tokens, latency, cost, run / candidate / interview attribution) behind /usage
+    LLM_USAGE_ENABLED = os.getenv("LLM_USAGE_ENABLED", "true").lower() == "true"
+    LLM_USAGE_DB_PATH = os.getenv("LLM_USAGE_DB_PATH", "./pipeline_state/llm_usage.db")
+    LLM_USAGE_RETENTION_DAYS = float(os.getenv("LLM_USAGE_RETENTION_DAYS", "30"))
+    # USD per million (prompt, completion) tokens; override with LLM_PRICES, e.g.
+    # {"llama-3.3-70b-versatile": [0.59, 0.79]}. Models without a price cost 0.
+    LLM_PRICES = {
+        "llama-3.3-70b-versatile": (0.59, 0.79),
+        "llama-3.1-8b-instant": (0.05, 0.08),
+        **json.loads(os.getenv("LLM_PRICES") or "{}")
+    }
+    # Token budgets for the variable parts of each prompt (CV text, summaries, Q&A history...);
+    # the fixed instructions come on top. See utils/token_budget.py
+    PROMPT_TOKEN_BUDGETS = {
+        "summarize_cv": int(os.getenv("PROMPT_BUDGET_SUMMARIZE_CV", "1500")),
+        "extract_profile_info": int(os.getenv("PROMPT_BUDGET_EXTRACT_PROFILE", "1000")),
+        "summarize_github": int(os.getenv("PROMPT_BUDGET_SUMMARIZE_GITHUB", "1500")),
+        "match_cv": int(os.getenv("PROMPT_BUDGET_MATCH_CV", "3000")),
+        "send_email": int(os.getenv("PROMPT_BUDGET_SEND_EMAIL", "800")),
+        "interview": int(os.getenv("PROMPT_BUDGET_INTERVIEW", "2000")),
+        "evaluate_interview": int(os.getenv("PROMPT_BUDGET_EVALUATE_INTERVIEW", "4000")),
+        "general_interview": int(os.getenv("PROMPT_BUDGET_GENERAL_INTERVIEW", "1000"))
+    }
     
     # Vector Store Configuration
     CHROMA_DB_PATH = "./cv_chroma_db"
@@ -44,29 +150,176 @@ class LangChainConfig:
     CV_FOLDER = "data/cv_pdfs"
     JOB_FOLDER = "data/job_ads"
     UPLOAD_FOLDER = "./temp_uploads"
+
+    # Pipeline Configuration
+    PIPELINE_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", "4"))
+    # Embedding shortlist before LLM matching: the top K if set, else those at or above
+    # the threshold (both unset = every candidate is LLM-matched)
+    SHORTLIST_TOP_K = int(os.getenv("SHORTLIST_TOP_K")) if os.getenv("SHORTLIST_TOP_K") else None
+    SHORTLIST_THRESHOLD = float(os.getenv("SHORTLIST_THRESHOLD")) if os.getenv("SHORTLIST_THRESHOLD") else None
+    PIPELINE_DB_PATH = os.getenv("PIPELINE_DB_PATH", "./pipeline_state/pipeline_state.db")
+    # Memoize final per-candidate results by (CV hash, GitHub URL, job description, model, prompt version)
+    RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+    RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+    RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "20000"))
+    # Stage checkpoints are deleted once a run has nothing left to resume, and after this long in any case
+    CHECKPOINT_RETENTION_SECONDS = float(os.getenv("CHECKPOINT_RETENTION_SECONDS", str(7 * 24 * 3600)))
+    # Bump when the summary/matching prompts change so memoized results are recomputed
+    PIPELINE_PROMPT_VERSION = os.getenv("PIPELINE_PROMPT_VERSION", "1")
+    # Request-level time budget (unset = no budget); each stage may use at most its share of it
+    PIPELINE_TIME_BUDGET_SECONDS = float(os.getenv("PIPELINE_TIME_BUDGET_SECONDS")) if os.getenv("PIPELINE_TIME_BUDGET_SECONDS") else None
+    STAGE_BUDGET_SHARES = {
+        "download": 0.25,
+        "cv_summary": 0.5,
+        "github_summary": 0.4,
+        "match": 0.5,
+        "email": 0.3
+    }
+    # Threads that run deadline-bound tasks so the caller can stop waiting on a stuck one
+    TASK_DEADLINE_WORKERS = int(os.getenv("TASK_DEADLINE_WORKERS", "32"))
+
+    # Background pipeline jobs
+    PIPELINE_JOB_WORKERS = int(os.getenv("PIPELINE_JOB_WORKERS", "2"))
+    PIPELINE_JOB_HEARTBEAT_SECONDS = int(os.getenv("PIPELINE_JOB_HEARTBEAT_SECONDS", "10"))
+    PIPELINE_JOB_LEASE_SECONDS = int(os.getenv("PIPELINE_JOB_LEASE_SECONDS", "60"))
+    # Queued + running background jobs per process before new submissions get a 429
+    PIPELINE_JOB_MAX_BACKLOG = int(os.getenv("PIPELINE_JOB_MAX_BACKLOG", "20"))
+
+    # Admission control (per process): concurrent requests and queue depth per endpoint class
+    ADMISSION_LIMITS = {
+        "batch": {
+            "concurrency": int(os.getenv("ADMISSION_BATCH_CONCURRENCY", "2")),
+            "queue": int(os.getenv("ADMISSION_BATCH_QUEUE", "4"))
+        },
+        "heavy": {
+            "concurrency": int(os.getenv("ADMISSION_HEAVY_CONCURRENCY", "4")),
+            "queue": int(os.getenv("ADMISSION_HEAVY_QUEUE", "8"))
+        },
+        "interactive": {
+            "concurrency": int(os.getenv("ADMISSION_INTERACTIVE_CONCURRENCY", "8")),
+            "queue": int(os.getenv("ADMISSION_INTERACTIVE_QUEUE", "16"))
+        }
+    }
+    ADMISSION_TOTAL_CONCURRENCY = int(os.getenv("ADMISSION_TOTAL_CONCURRENCY", "8"))
+    # Slots only interactive (interview) requests may use
+    ADMISSION_RESERVED_INTERACTIVE = int(os.getenv("ADMISSION_RESERVED_INTERACTIVE", "2"))
+    ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "30"))
     
     @classmethod
-    def get_llm(cls, model_name=None, temperature=None):
-        """Get Groq LLM via LangChain (with fallback to direct client)"""
+    def route_for(cls, task_type: str = None) -> dict:
+        """Model, temperature and max_tokens for LLM calls made on behalf of ``task_type``."""
+        route = cls.MODEL_ROUTES.get(task_type) or {}
+        model = route.get("model") or cls.MODEL_NAME
+        return {
+            "model": cls.GROQ_MODELS.get(model, model),
+            "temperature": route.get("temperature", cls.TEMPERATURE),
+            "max_tokens": route.get("max_tokens") or cls.MAX_TOKENS,
+            "json_mode": bool(route.get("json_mode"))
+        }
+
+    @classmethod
+    def llm_backend_identity(cls) -> str:
+        """Where completions come from (live Groq, a fixture file or synthetic), for memo keys."""
+        if cls.LLM_BACKEND_LIVE:
+            return "groq"
+        if cls.LLM_BACKEND == "replay":
+            return f"replay:{os.path.abspath(cls.LLM_FIXTURE_PATH)}:{cls.LLM_REPLAY_MISSING}"
+        return cls.LLM_BACKEND
+
+    @classmethod
+    def rate_limit_for(cls, model: str) -> tuple:
+        """(requests, tokens) per minute allowed for ``model``; model aliases from GROQ_MODELS are accepted."""
+        for name, limits in cls.LLM_RATE_LIMITS.items():
+            if cls.GROQ_MODELS.get(name, name) == model:
+                return int(limits[0]), int(limits[1])
+        return cls.LLM_RATE_LIMIT_RPM, cls.LLM_RATE_LIMIT_TPM
+
+    @classmethod
+    def llm_cost(cls, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        """USD cost of one call to ``model`` from ``LLM_PRICES``."""
+        prompt_price, completion_price = cls.LLM_PRICES.get(model) or (0, 0)
+        return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+    @classmethod
+    def get_llm(cls, model_name=None, temperature=None, max_tokens=None, http_client=None, max_retries=2,
+                json_mode=False, http_async_client=None):
+        """Get the chat client for LLM_BACKEND: Groq (LangChain or direct client) or a stand-in from config/fake_llm.py"""
+        model_name = model_name or cls.MODEL_NAME
+        temperature = cls.TEMPERATURE if temperature is None else temperature
+        max_tokens = max_tokens or cls.MAX_TOKENS
+
+        if cls.LLM_BACKEND == "synthetic":
+            return cls._synthetic_llm(model_name)
+        if cls.LLM_BACKEND == "replay":
+            fallback = cls._synthetic_llm(model_name) if cls.LLM_REPLAY_MISSING == "synthetic" else None
+            return ReplayChatModel(get_fixture_store(cls.LLM_FIXTURE_PATH), model_name, fallback=fallback)
+
+        client = cls._groq_llm(model_name, temperature, max_tokens, http_client, max_retries, json_mode, http_async_client)
+        if cls.LLM_BACKEND == "record":
+            return RecordingChatModel(
+                client, get_fixture_store(cls.LLM_FIXTURE_PATH), model_name, temperature, max_tokens, json_mode
+            )
+        if cls.LLM_BACKEND != "groq":
+            raise ValueError(f"Unknown LLM_BACKEND '{cls.LLM_BACKEND}' (expected groq, record, replay or synthetic)")
+        return client
+
+    @classmethod
+    def _synthetic_llm(cls, model_name):
+        return SyntheticChatModel(
+            model_name,
+            latency_ms=cls.LLM_SYNTHETIC_LATENCY_MS,
+            latency_stddev_ms=cls.LLM_SYNTHETIC_LATENCY_STDDEV_MS,
+            error_rates=cls.LLM_SYNTHETIC_ERROR_RATES,
+            seed=cls.LLM_SYNTHETIC_SEED
+        )
+
+    @classmethod
+    def _groq_llm(cls, model_name, temperature, max_tokens, http_client, max_retries, json_mode=False,
+                  http_async_client=None):
+        """Get Groq LLM via LangChain (with fallback to direct client).
+
+        ``http_async_client`` pools the connections of ``ainvoke`` calls. The direct client
+        is sync only and takes ``json_mode`` per request instead (see LLMGateway._send).
+        """
+        if not cls.GROQ_API_KEY:
+            raise ValueError("GROQ_API_KEY is not set (use LLM_BACKEND=replay or synthetic to run without Groq)")
         if LANGCHAIN_GROQ_AVAILABLE:
             return ChatGroq(
                 groq_api_key=cls.GROQ_API_KEY,
-                model_name=model_name or cls.MODEL_NAME,
-                temperature=temperature or cls.TEMPERATURE,
-                max_tokens=cls.MAX_TOKENS
+                model_name=model_name,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                request_timeout=cls.LLM_REQUEST_TIMEOUT_SECONDS,
+                max_retries=max_retries,
+                http_client=http_client,
+                http_async_client=http_async_client,
+                model_kwargs={"response_format": {"type": "json_object"}} if json_mode else {}
             )
         else:
             # Fallback to direct Groq client
-            return Groq(api_key=cls.GROQ_API_KEY)
+            return Groq(
+                api_key=cls.GROQ_API_KEY,
+                timeout=cls.LLM_REQUEST_TIMEOUT_SECONDS,
+                max_retries=max_retries,
+                http_client=http_client
+            )
     
+    _embeddings = None
+    _embeddings_lock = threading.Lock()
+
     @classmethod
     def get_embeddings(cls):
-        return HuggingFaceEmbeddings(model_name=cls.EMBEDDING_MODEL)
+        """Return the process-wide embeddings model, loading it on first use."""
+        if cls._embeddings is None:
+            with cls._embeddings_lock:
+                if cls._embeddings is None:
+                    cls._embeddings = HuggingFaceEmbeddings(model_name=cls.EMBEDDING_MODEL)
+        return cls._embeddings
     
     @classmethod
-    def get_vectorstore(cls):
+    def get_vectorstore(cls, embeddings=None):
         return Chroma(
             persist_directory=cls.CHROMA_DB_PATH,
-            embedding_function=cls.get_embeddings(),
+            embedding_function=embeddings or cls.get_embeddings(),
             collection_name=cls.COLLECTION_NAME
         )
@@ -0,0 +1,492 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config.langchain_config import LangChainConfig, LANGCHAIN_GROQ_AVAILABLE
+from config.fake_llm import prompt_hash
+from database.llm_response_cache import LLMResponseCache
+from database.llm_usage_store import get_llm_usage_store
+from utils.metrics import LLM_CACHE, LLM_COST, LLM_RETRIES, LLM_TOKENS, LLM_CALL_DURATION, LLM_OUTPUT_QUALITY
+from utils.rate_limiter import RateLimiter, is_retryable, retry_after_seconds, backoff_delay, status_code_of
+from utils.task_context import current_task_type, current_attribution, current_usage_totals
+from utils.token_budget import count_tokens
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+if LANGCHAIN_GROQ_AVAILABLE:
+    from langchain_core.messages import HumanMessage
+
+
+class LLMGateway:
+    """Single entry point for LLM calls in this process.
+
+    Owns the keep-alive HTTP connection pools shared by every Groq client (one
+    sync pool, plus an async one per event loop running ``ainvoke``), and
+    hides whether the LangChain ChatGroq client or the raw Groq client is in use.
+    Clients are created once per (model, temperature, max_tokens) combination;
+    unless a call passes them explicitly, those come from the model route of the
+    current task type (``LangChainConfig.MODEL_ROUTES``).
+    Completions are served from a disk-backed response cache when possible,
+    except for task types listed in ``LLM_CACHE_DISABLED_TASKS``. Model calls are
+    paced by per-model requests/tokens-per-minute limiters (neither applies to the
+    replay and synthetic backends), and 429s, 5xx and
+    connection errors are retried with jittered exponential backoff.
+    Every call (cache hits included) is logged with its tokens, latency, cost and
+    the run / candidate / interview session it was made for (see ``attribution_scope``).
+    """
+
+    def __init__(self):
+        self._http_client = None
+        self._http_limits = None
+        if httpx is not None:
+            self._http_limits = httpx.Limits(
+                max_connections=LangChainConfig.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LangChainConfig.LLM_MAX_KEEPALIVE_CONNECTIONS
+            )
+            self._http_client = httpx.Client(limits=self._http_limits, timeout=LangChainConfig.LLM_REQUEST_TIMEOUT_SECONDS)
+        self._clients = {}
+        # event loop -> {"http": async pool, "clients": {settings: client}} for ainvoke calls
+        self._loop_clients = {}
+        self._lock = threading.Lock()
+        live = LangChainConfig.LLM_BACKEND_LIVE
+        # Replay/synthetic answers must never be served to live runs, and offline runs
+        # shouldn't measure cache hits or wait on Groq's rate limits
+        self._cache = LLMResponseCache() if LangChainConfig.LLM_CACHE_ENABLED and live else None
+        self._usage = get_llm_usage_store() if LangChainConfig.LLM_USAGE_ENABLED else None
+        # model -> RateLimiter (see _limiter)
+        self._limiters = {}
+
+    def _limiter(self, model: str) -> RateLimiter:
+        """Rate-limit buckets of ``model``: Groq counts requests and tokens per model."""
+        with self._lock:
+            limiter = self._limiters.get(model)
+            if limiter is None:
+                rpm, tpm = LangChainConfig.rate_limit_for(model) if LangChainConfig.LLM_BACKEND_LIVE else (0, 0)
+                shared = LangChainConfig.LLM_RATE_LIMIT_SHARED and (rpm or tpm)
+                limiter = RateLimiter(
+                    rpm, tpm,
+                    db_path=LangChainConfig.LLM_RATE_LIMIT_DB_PATH if shared else None,
+                    name=f"groq:{model}"
+                )
+                self._limiters[model] = limiter
+        return limiter
+
+    def _settings(self, model, temperature, max_tokens):
+        route = LangChainConfig.route_for(current_task_type())
+        return (
+            model or route["model"],
+            route["temperature"] if temperature is None else temperature,
+            max_tokens or route["max_tokens"],
+            route["json_mode"]
+        )
+
+    def record_output(self, valid: bool):
+        """Let an agent report whether the completion it got was usable (quality per model route)."""
+        LLM_OUTPUT_QUALITY.inc(
+            task_type=current_task_type() or "unknown",
+            model=LangChainConfig.route_for(current_task_type())["model"],
+            result="valid" if valid else "invalid"
+        )
+
+    @staticmethod
+    def _observe_call(model: str, started: float, status: str):
+        LLM_CALL_DURATION.observe(
+            time.perf_counter() - started, task_type=current_task_type() or "unknown", model=model, status=status
+        )
+
+    def _client(self, model, temperature, max_tokens, json_mode=False):
+        key = (model, temperature, max_tokens, json_mode)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                # Retries happen here, paced by the rate limiter, not inside the client
+                client = LangChainConfig.get_llm(
+                    model_name=model, temperature=temperature, max_tokens=max_tokens,
+                    http_client=self._http_client, max_retries=0, json_mode=json_mode
+                )
+                self._clients[key] = client
+        return client
+
+    def _async_client(self, model, temperature, max_tokens, json_mode=False):
+        """The ``_client`` for ``ainvoke`` calls on the running event loop.
+
+        An httpx async pool is bound to the loop that opened its connections, so each
+        loop gets its own pool (and clients using it). Those of closed loops, e.g. from
+        earlier ``asyncio.run`` calls, are dropped when a new loop shows up.
+        """
+        loop = asyncio.get_running_loop()
+        key = (model, temperature, max_tokens, json_mode)
+        with self._lock:
+            pool = self._loop_clients.get(loop)
+            if pool is None:
+                for closed in [other for other in self._loop_clients if other.is_closed()]:
+                    del self._loop_clients[closed]
+                http = None
+                if httpx is not None:
+                    http = httpx.AsyncClient(limits=self._http_limits, timeout=LangChainConfig.LLM_REQUEST_TIMEOUT_SECONDS)
+                pool = self._loop_clients[loop] = {"http": http, "clients": {}}
+            client = pool["clients"].get(key)
+            if client is None:
+                client = LangChainConfig.get_llm(
+                    model_name=model, temperature=temperature, max_tokens=max_tokens,
+                    http_client=self._http_client, http_async_client=pool["http"],
+                    max_retries=0, json_mode=json_mode
+                )
+                pool["clients"][key] = client
+        return client
+
+    @staticmethod
+    def _cache_key(prompt: str, model: str, temperature: float, max_tokens: int, json_mode: bool = False) -> str:
+        # Whitespace-only differences (indentation, trailing newlines) map to the same entry
+        normalized = " ".join(prompt.split())
+        identity = json.dumps([model, temperature, max_tokens, json_mode, hashlib.sha256(normalized.encode("utf-8")).hexdigest()])
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    def _cached(self, cache_key: str, task_type: str, validate=None):
+        try:
+            response = self._cache.get(cache_key)
+        except Exception as e:
+            print(f"Error reading LLM cache: {e}")
+            return None
+        # Entries written before the caller validated completions may be unusable
+        if response is not None and not self._cacheable(response, validate):
+            response = None
+        LLM_CACHE.inc(task_type=task_type, result="miss" if response is None else "hit")
+        return response
+
+    def invoke(self, prompt: str, model: str = None, temperature: float = None, max_tokens: int = None,
+               cache: bool = True, validate=None) -> str:
+        """Send one user prompt and return the completion text.
+
+        Pass ``cache=False`` to always call the model. Routes with ``json_mode``
+        ask the API for a JSON object (the prompt must still describe it).
+        ``validate(text)`` tells whether a completion is usable: one that isn't is
+        returned but never cached, so the next identical call asks the model again.
+        """
+        model, temperature, max_tokens, json_mode = self._settings(model, temperature, max_tokens)
+        cache_key = self._cache_key_for(prompt, model, temperature, max_tokens, json_mode, cache)
+        if cache_key:
+            started = time.perf_counter()
+            response = self._cached(cache_key, current_task_type() or "unknown", validate)
+            if response is not None:
+                self._log_usage(self._usage_record(prompt, response, model, {}, "success", started, started, cached=True))
+                return response
+
+        response = self._complete(prompt, model, temperature, max_tokens, json_mode)
+        if cache_key and self._cacheable(response, validate):
+            self._store(cache_key, model, response)
+        return response
+
+    async def ainvoke(self, prompt: str, model: str = None, temperature: float = None, max_tokens: int = None,
+                      cache: bool = True, validate=None) -> str:
+        """Async ``invoke``: awaits the model call on the event loop instead of blocking a thread."""
+        model, temperature, max_tokens, json_mode = self._settings(model, temperature, max_tokens)
+        cache_key = self._cache_key_for(prompt, model, temperature, max_tokens, json_mode, cache)
+        if cache_key:
+            started = time.perf_counter()
+            response = await asyncio.to_thread(self._cached, cache_key, current_task_type() or "unknown", validate)
+            if response is not None:
+                record = self._usage_record(prompt, response, model, {}, "success", started, started, cached=True)
+                await asyncio.to_thread(self._log_usage, record)
+                return response
+
+        response = await self._acomplete(prompt, model, temperature, max_tokens, json_mode)
+        if cache_key and self._cacheable(response, validate):
+            await asyncio.to_thread(self._store, cache_key, model, response)
+        return response
+
+    def _cache_key_for(self, prompt, model, temperature, max_tokens, json_mode, cache):
+        """Cache key for this call, or None when the call must not use the cache."""
+        if not cache or not self._cache or (current_task_type() or "unknown") in LangChainConfig.LLM_CACHE_DISABLED_TASKS:
+            return None
+        return self._cache_key(prompt, model, temperature, max_tokens, json_mode)
+
+    @staticmethod
+    def _cacheable(response: str, validate=None) -> bool:
+        if not response:
+            return False
+        try:
+            return validate is None or bool(validate(response))
+        except Exception:
+            return False
+
+    def _store(self, cache_key: str, model: str, response: str):
+        try:
+            self._cache.put(cache_key, model, response)
+        except Exception as e:
+            print(f"Error writing LLM cache: {e}")
+
+    @staticmethod
+    def _estimate_tokens(prompt: str, max_tokens: int) -> int:
+        # Prompt tokens plus a typical completion length
+        return count_tokens(prompt) + min(max_tokens, LangChainConfig.LLM_EXPECTED_COMPLETION_TOKENS)
+
+    @staticmethod
+    def _usage_record(prompt: str, text: str, model: str, usage: dict, status: str, started: float,
+                      call_started: float, attempts: int = 1, cached: bool = False) -> dict:
+        """Tokens, cost, latency and attribution of one LLM call.
+
+        Token counts fall back to local counts when the API reports none; cache hits
+        and calls that failed before producing anything cost nothing. ``started`` is
+        when the last attempt began, ``call_started`` when the call first waited for
+        the rate limiter. Also updates the token and cost metrics and the usage
+        totals of the enclosing attribution scopes.
+        """
+        now = time.perf_counter()
+        if cached or (status == "error" and not text):
+            prompt_tokens = completion_tokens = 0
+        else:
+            prompt_tokens = usage.get("prompt_tokens") or count_tokens(prompt)
+            completion_tokens = usage.get("completion_tokens") or count_tokens(text)
+        task_type = current_task_type() or "unknown"
+        cost = LangChainConfig.llm_cost(model, prompt_tokens, completion_tokens)
+        record = {
+            "task_type": task_type,
+            "model": model,
+            "status": status,
+            "cached": cached,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cost_usd": cost,
+            "latency_seconds": now - started,
+            "total_seconds": now - call_started,
+            "attempts": attempts,
+            "prompt_hash": prompt_hash(prompt)[:16],
+            **current_attribution()
+        }
+        for totals in current_usage_totals():
+            totals.add(record)
+
+        if not cached:
+            LLM_TOKENS.inc(prompt_tokens, task_type=task_type, model=model, kind="prompt")
+            LLM_TOKENS.inc(completion_tokens, task_type=task_type, model=model, kind="completion")
+            LLM_COST.inc(cost, task_type=task_type, model=model)
+            print(
+                f"LLM call [{task_type}] {model}: {prompt_tokens} prompt + {completion_tokens} completion tokens, "
+                f"{record['latency_seconds']:.2f}s, ${cost:.5f} ({status})"
+            )
+        return record
+
+    def _log_usage(self, record: dict):
+        if not self._usage:
+            return
+        try:
+            self._usage.record(record)
+        except Exception as e:
+            print(f"Error logging LLM usage: {e}")
+
+    @staticmethod
+    def _used_tokens(record: dict) -> int:
+        return record["prompt_tokens"] + record["completion_tokens"]
+
+    @staticmethod
+    def _retry_delay(attempt: int, error: Exception):
+        """Seconds to wait before retrying ``error``, or None when it should be raised."""
+        if attempt >= LangChainConfig.LLM_MAX_RETRIES or not is_retryable(error):
+            return None
+        delay = backoff_delay(
+            attempt,
+            LangChainConfig.LLM_RETRY_BASE_SECONDS,
+            LangChainConfig.LLM_RETRY_MAX_SECONDS,
+            retry_after_seconds(error)
+        )
+        status = status_code_of(error)
+        LLM_RETRIES.inc(reason=str(status) if status else type(error).__name__)
+        print(f"LLM call failed ({status or type(error).__name__}), retry {attempt + 1} in {delay:.1f}s")
+        return delay
+
+    def _complete(self, prompt: str, model: str, temperature: float, max_tokens: int, json_mode: bool = False) -> str:
+        estimate = self._estimate_tokens(prompt, max_tokens)
+        call_started = time.perf_counter()
+        attempt = 0
+        while True:
+            self._limiter(model).acquire(estimate, max_wait=LangChainConfig.LLM_RATE_LIMIT_MAX_WAIT_SECONDS)
+            started = time.perf_counter()
+            try:
+                text, usage = self._send(prompt, model, temperature, max_tokens, json_mode)
+                self._observe_call(model, started, "success")
+            except Exception as e:
+                self._observe_call(model, started, "error")
+                delay = self._retry_delay(attempt, e)
+                if delay is None:
+                    self._log_usage(self._usage_record(prompt, "", model, {}, "error", started, call_started, attempt + 1))
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+
+            record = self._usage_record(prompt, text, model, usage, "success", started, call_started, attempt + 1)
+            self._limiter(model).settle(self._used_tokens(record) - estimate)
+            self._log_usage(record)
+            return text
+
+    async def _acomplete(self, prompt: str, model: str, temperature: float, max_tokens: int,
+                         json_mode: bool = False) -> str:
+        estimate = self._estimate_tokens(prompt, max_tokens)
+        call_started = time.perf_counter()
+        attempt = 0
+        while True:
+            await self._limiter(model).acquire_async(estimate, max_wait=LangChainConfig.LLM_RATE_LIMIT_MAX_WAIT_SECONDS)
+            started = time.perf_counter()
+            try:
+                text, usage = await self._asend(prompt, model, temperature, max_tokens, json_mode)
+                self._observe_call(model, started, "success")
+            except Exception as e:
+                self._observe_call(model, started, "error")
+                delay = self._retry_delay(attempt, e)
+                if delay is None:
+                    record = self._usage_record(prompt, "", model, {}, "error", started, call_started, attempt + 1)
+                    await asyncio.to_thread(self._log_usage, record)
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+
+            record = self._usage_record(prompt, text, model, usage, "success", started, call_started, attempt + 1)
+            await asyncio.to_thread(self._limiter(model).settle, self._used_tokens(record) - estimate)
+            await asyncio.to_thread(self._log_usage, record)
+            return text
+
+    @staticmethod
+    def _is_chat_model(client) -> bool:
+        """ChatGroq and the stand-ins in config/fake_llm.py take messages; the raw Groq client doesn't."""
+        return hasattr(client, "invoke")
+
+    @staticmethod
+    def _messages(prompt: str) -> list:
+        if LANGCHAIN_GROQ_AVAILABLE:
+            return [HumanMessage(content=prompt)]
+        return [{"role": "user", "content": prompt}]
+
+    @staticmethod
+    def _response_format(json_mode: bool) -> dict:
+        """Extra create() arguments for the raw Groq client (ChatGroq gets them when it is built)."""
+        return {"response_format": {"type": "json_object"}} if json_mode else {}
+
+    def _send(self, prompt: str, model: str, temperature: float, max_tokens: int, json_mode: bool = False):
+        """One model call; returns ``(text, usage)`` with the API's token counts (possibly empty)."""
+        client = self._client(model, temperature, max_tokens, json_mode)
+
+        if self._is_chat_model(client):
+            message = client.invoke(self._messages(prompt))
+            return message.content, (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+
+        response = client.chat.completions.create(
+            messages=[{"role": "user", "content": prompt}],
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **self._response_format(json_mode)
+        )
+        usage = getattr(response, "usage", None)
+        return response.choices[0].message.content, {
+            "prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "completion_tokens": getattr(usage, "completion_tokens", None)
+        }
+
+    async def _asend(self, prompt: str, model: str, temperature: float, max_tokens: int, json_mode: bool = False):
+        """Async ``_send``; the raw Groq client has no async API here, so it runs on a thread."""
+        client = self._async_client(model, temperature, max_tokens, json_mode)
+
+        if self._is_chat_model(client):
+            message = await client.ainvoke(self._messages(prompt))
+            return message.content, (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+
+        return await asyncio.to_thread(self._send, prompt, model, temperature, max_tokens, json_mode)
+
+    def batch(self, prompts: list, model: str = None, temperature: float = None, max_tokens: int = None,
+              max_concurrency: int = None, return_exceptions: bool = False, cache: bool = True) -> list:
+        """Run several prompts concurrently; results come back in input order.
+
+        With ``return_exceptions=True`` a failed prompt yields its exception instead of raising.
+        """
+        def call(prompt):
+            try:
+                return self.invoke(prompt, model=model, temperature=temperature, max_tokens=max_tokens, cache=cache)
+            except Exception as e:
+                if return_exceptions:
+                    return e
+                raise
+
+        if not prompts:
+            return []
+        workers = max(1, min(len(prompts), max_concurrency or LangChainConfig.LLM_MAX_CONNECTIONS))
+        # Worker threads keep the caller's task context (cache opt-out, attribution)
+        contexts = [contextvars.copy_context() for _ in prompts]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda ctx, prompt: ctx.run(call, prompt), contexts, prompts))
+
+    def stream(self, prompt: str, model: str = None, temperature: float = None, max_tokens: int = None):
+        """Yield the completion text in chunks as the model produces them.
+
+        Paced like ``invoke``; failures are retried only until the first chunk
+        has been yielded, since a partly delivered stream can't be restarted.
+        """
+        model, temperature, max_tokens, json_mode = self._settings(model, temperature, max_tokens)
+        client = self._client(model, temperature, max_tokens, json_mode)
+        estimate = self._estimate_tokens(prompt, max_tokens)
+        parts = []
+        call_started = started = time.perf_counter()
+        status = "error"
+        attempt = 0
+        try:
+            while True:
+                self._limiter(model).acquire(estimate, max_wait=LangChainConfig.LLM_RATE_LIMIT_MAX_WAIT_SECONDS)
+                started = time.perf_counter()
+                try:
+                    for text in self._stream_chunks(client, prompt, model, temperature, max_tokens, json_mode):
+                        parts.append(text)
+                        yield text
+                    break
+                except Exception as e:
+                    delay = None if parts else self._retry_delay(attempt, e)
+                    if delay is None:
+                        raise
+                    attempt += 1
+                    time.sleep(delay)
+            status = "success"
+        finally:
+            self._observe_call(model, call_started, status)
+            # Streams carry no usage block, so count what was actually produced (also if the reader stopped early)
+            self._log_usage(self._usage_record(prompt, "".join(parts), model, {}, status, started, call_started, attempt + 1))
+
+    @classmethod
+    def _stream_chunks(cls, client, prompt: str, model: str, temperature: float, max_tokens: int,
+                       json_mode: bool = False):
+        if cls._is_chat_model(client):
+            for chunk in client.stream(cls._messages(prompt)):
+                if chunk.content:
+                    yield chunk.content
+            return
+
+        response = client.chat.completions.create(
+            messages=[{"role": "user", "content": prompt}],
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            **cls._response_format(json_mode)
+        )
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+_shared_gateway = None
+_shared_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Return the process-wide LLM gateway, creating it on first use."""
+    global _shared_gateway
+    if _shared_gateway is None:
+        with _shared_gateway_lock:
+            if _shared_gateway is None:
+                _shared_gateway = LLMGateway()
+    return _shared_gateway
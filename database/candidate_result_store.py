@@ -0,0 +1,75 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from config.langchain_config import LangChainConfig
+
+
+class CandidateResultStore:
+    """SQLite-backed memo of final per-candidate pipeline results.
+
+    Keyed by a hash of everything the result depends on (CV file, GitHub URL,
+    job description and model/prompt version), so re-triggering a job only
+    does work for new or changed candidates. Results older than ``ttl_seconds``
+    are ignored and purged; past ``max_entries`` the oldest results are evicted.
+    """
+
+    # Evict every this many writes rather than on each one
+    EVICT_EVERY = 50
+
+    def __init__(self, db_path: str = None, ttl_seconds: float = None, max_entries: int = None):
+        self.db_path = db_path or LangChainConfig.PIPELINE_DB_PATH
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else LangChainConfig.RESULT_CACHE_TTL_SECONDS
+        self.max_entries = max_entries if max_entries is not None else LangChainConfig.RESULT_CACHE_MAX_ENTRIES
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS candidate_results (
+                    result_key TEXT PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_candidate_results_created ON candidate_results (created_at)")
+
+    def get(self, result_key: str):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT result FROM candidate_results WHERE result_key = ? AND created_at >= ?",
+                (result_key, time.time() - self.ttl_seconds)
+            ).fetchone()
+        return json.loads(row["result"]) if row else None
+
+    def put(self, result_key: str, result: dict):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO candidate_results (result_key, result, created_at) VALUES (?, ?, ?)",
+                (result_key, json.dumps(result), time.time())
+            )
+
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % self.EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def evict(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM candidate_results WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            conn.execute("""
+                DELETE FROM candidate_results WHERE result_key IN (
+                    SELECT result_key FROM candidate_results ORDER BY created_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
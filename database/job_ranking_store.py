@@ -0,0 +1,103 @@
+import json
+import os
+import sqlite3
+import time
+from config.langchain_config import LangChainConfig
+
+
+class JobRankingStore:
+    """SQLite-backed ranking of processed candidates per job post.
+
+    Entries are kept ordered by an index on (llm_scored, score), so adding a
+    candidate is a single insert and reading the ranking never re-sorts in Python.
+    """
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or LangChainConfig.PIPELINE_DB_PATH
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_rankings (
+                    job_key TEXT PRIMARY KEY,
+                    job_post TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_ranking_entries (
+                    job_key TEXT NOT NULL,
+                    candidate_key TEXT NOT NULL,
+                    llm_scored INTEGER NOT NULL,
+                    score REAL NOT NULL,
+                    result TEXT NOT NULL,
+                    added_at REAL NOT NULL,
+                    PRIMARY KEY (job_key, candidate_key)
+                )
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_job_ranking_order
+                ON job_ranking_entries (job_key, llm_scored DESC, score DESC, added_at)
+            """)
+
+    def get_job_post(self, job_key: str):
+        with self._connect() as conn:
+            row = conn.execute("SELECT job_post FROM job_rankings WHERE job_key = ?", (job_key,)).fetchone()
+        return json.loads(row["job_post"]) if row else None
+
+    def create_job(self, job_key: str, job_post: dict):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO job_rankings (job_key, job_post, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (job_key, json.dumps(job_post), now, now)
+            )
+
+    def get_results(self, job_key: str) -> dict:
+        """Stored results of the job keyed by candidate key."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT candidate_key, result FROM job_ranking_entries WHERE job_key = ?", (job_key,)
+            ).fetchall()
+        return {row["candidate_key"]: json.loads(row["result"]) for row in rows}
+
+    def add_result(self, job_key: str, candidate_key: str, result: dict):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO job_ranking_entries
+                    (job_key, candidate_key, llm_scored, score, result, added_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    job_key,
+                    candidate_key,
+                    0 if result.get("score_source") == "embedding" else 1,
+                    result.get("score", 0),
+                    json.dumps(result),
+                    now
+                )
+            )
+            conn.execute("UPDATE job_rankings SET updated_at = ? WHERE job_key = ?", (now, job_key))
+
+    def get_ranking(self, job_key: str) -> list:
+        """Results for the job, best first (same order as ``ranking_key``)."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                SELECT result FROM job_ranking_entries WHERE job_key = ?
+                ORDER BY llm_scored DESC, score DESC, added_at
+                """,
+                (job_key,)
+            ).fetchall()
+        return [json.loads(row["result"]) for row in rows]
@@ -1,4 +1,5 @@
 import os
+import threading
 from langchain_chroma import Chroma
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
@@ -9,7 +10,9 @@ from utils.hash_utils import get_file_hash
 class LangChainVectorDB:
     def __init__(self):
         self.embeddings = LangChainConfig.get_embeddings()
-        self.vectorstore = LangChainConfig.get_vectorstore()
+        self.vectorstore = LangChainConfig.get_vectorstore(self.embeddings)
+        # Serializes duplicate-check + insert so concurrent writers can't both add the same CV
+        self._write_lock = threading.RLock()
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
             chunk_overlap=200
@@ -34,6 +37,10 @@ class LangChainVectorDB:
             return False
 
     def add_text_document(self, text: str, doc_id: str, doc_type: str = "summary", file_hash: str = None, email: str = None, source: str = None):
+        with self._write_lock:
+            return self._add_text_document(text, doc_id, doc_type, file_hash, email, source)
+
+    def _add_text_document(self, text: str, doc_id: str, doc_type: str, file_hash: str, email: str, source: str):
         try:
             doc_id_to_use = file_hash if file_hash else doc_id
 
@@ -76,6 +83,10 @@ class LangChainVectorDB:
             return False
 
     def add_cv_summary(self, file_path: str, summary: str, email: str = None):
+        with self._write_lock:
+            return self._add_cv_summary(file_path, summary, email)
+
+    def _add_cv_summary(self, file_path: str, summary: str, email: str = None):
         try:
             file_hash = get_file_hash(file_path)
             print(f"Storing summary with email: {email}")
@@ -171,6 +182,21 @@ class LangChainVectorDB:
         except Exception as e:
             print(f"Error searching CV summary by email {email}: {e}")
             return None
+
+
+_shared_vector_db = None
+_shared_vector_db_lock = threading.Lock()
+
+
+def get_shared_vector_db() -> LangChainVectorDB:
+    """Return the process-wide vector DB handle, creating it on first use."""
+    global _shared_vector_db
+    if _shared_vector_db is None:
+        with _shared_vector_db_lock:
+            if _shared_vector_db is None:
+                _shared_vector_db = LangChainVectorDB()
+    return _shared_vector_db
+
         
 if __name__ == "__main__":
     # Create DB instance
@@ -0,0 +1,81 @@
+import os
+import sqlite3
+import threading
+import time
+from config.langchain_config import LangChainConfig
+
+
+class LLMResponseCache:
+    """SQLite-backed cache of LLM completions with TTL and LRU eviction.
+
+    Entries older than ``ttl_seconds`` are ignored and purged; once the table
+    grows past ``max_entries`` the least recently used entries are evicted.
+    """
+
+    # Evict every this many writes rather than on each one
+    EVICT_EVERY = 50
+
+    def __init__(self, db_path: str = None, ttl_seconds: float = None, max_entries: int = None):
+        self.db_path = db_path or LangChainConfig.LLM_CACHE_PATH
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else LangChainConfig.LLM_CACHE_TTL_SECONDS
+        self.max_entries = max_entries if max_entries is not None else LangChainConfig.LLM_CACHE_MAX_ENTRIES
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    cache_key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_last_used ON llm_responses (last_used_at)")
+
+    def get(self, cache_key: str):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT response, created_at FROM llm_responses WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row["created_at"] > self.ttl_seconds:
+                conn.execute("DELETE FROM llm_responses WHERE cache_key = ?", (cache_key,))
+                return None
+            conn.execute("UPDATE llm_responses SET last_used_at = ? WHERE cache_key = ?", (now, cache_key))
+        return row["response"]
+
+    def put(self, cache_key: str, model: str, response: str):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (cache_key, model, response, created_at, last_used_at) VALUES (?, ?, ?, ?, ?)",
+                (cache_key, model, response, now, now)
+            )
+
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % self.EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def evict(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            conn.execute("""
+                DELETE FROM llm_responses WHERE cache_key IN (
+                    SELECT cache_key FROM llm_responses ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
@@ -0,0 +1,154 @@
+import os
+import sqlite3
+import threading
+import time
+from config.langchain_config import LangChainConfig
+
+
+class LLMUsageStore:
+    """SQLite log of every LLM call: tokens, latency, cost, model and task type,
+    attributed to a pipeline run, candidate email and/or interview session.
+
+    Records older than ``retention_days`` are purged every so often.
+    """
+
+    FILTERS = ("run_id", "candidate", "session", "task_type", "model", "status")
+    GROUPS = ("task_type", "model", "run_id", "candidate", "session", "status")
+    # Purge old records every this many writes rather than on each one
+    PURGE_EVERY = 500
+
+    def __init__(self, db_path: str = None, retention_days: float = None):
+        self.db_path = db_path or LangChainConfig.LLM_USAGE_DB_PATH
+        self.retention_days = retention_days if retention_days is not None else LangChainConfig.LLM_USAGE_RETENTION_DAYS
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_calls (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at REAL NOT NULL,
+                    task_type TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    cached INTEGER NOT NULL,
+                    prompt_tokens INTEGER NOT NULL,
+                    completion_tokens INTEGER NOT NULL,
+                    cost_usd REAL NOT NULL,
+                    latency_seconds REAL NOT NULL,
+                    total_seconds REAL NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    prompt_hash TEXT,
+                    run_id TEXT,
+                    candidate TEXT,
+                    session TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_created ON llm_calls (created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_run ON llm_calls (run_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_candidate ON llm_calls (candidate)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_session ON llm_calls (session)")
+
+    def record(self, call: dict):
+        with self._connect() as conn:
+            conn.execute("""
+                INSERT INTO llm_calls (
+                    created_at, task_type, model, status, cached, prompt_tokens, completion_tokens, cost_usd,
+                    latency_seconds, total_seconds, attempts, prompt_hash, run_id, candidate, session
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                call.get("created_at") or time.time(), call["task_type"], call["model"], call["status"],
+                int(bool(call.get("cached"))), call["prompt_tokens"], call["completion_tokens"], call["cost_usd"],
+                call["latency_seconds"], call.get("total_seconds", call["latency_seconds"]), call.get("attempts", 1),
+                call.get("prompt_hash"), call.get("run_id"), call.get("candidate"), call.get("session")
+            ))
+
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self.PURGE_EVERY == 0
+        if purge:
+            self.purge()
+
+    def purge(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM llm_calls WHERE created_at < ?", (time.time() - self.retention_days * 86400,))
+
+    def _where(self, filters: dict, since: float = None):
+        clauses, params = [], []
+        for name in self.FILTERS:
+            if filters.get(name):
+                clauses.append(f"{name} = ?")
+                params.append(filters[name])
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def summary(self, filters: dict = None, group_by: str = None, since: float = None) -> dict:
+        """Totals of the matching calls, plus one row per ``group_by`` value (most expensive first)."""
+        if group_by is not None and group_by not in self.GROUPS:
+            raise ValueError(f"group_by must be one of {', '.join(self.GROUPS)}")
+        where, params = self._where(filters or {}, since)
+        columns = """
+            COUNT(*) AS calls,
+            COALESCE(SUM(cached), 0) AS cached_calls,
+            COALESCE(SUM(status = 'error'), 0) AS failed_calls,
+            COALESCE(SUM(prompt_tokens), 0) AS prompt_tokens,
+            COALESCE(SUM(completion_tokens), 0) AS completion_tokens,
+            COALESCE(SUM(cost_usd), 0) AS cost_usd,
+            COALESCE(SUM(latency_seconds), 0) AS latency_seconds,
+            AVG(CASE WHEN cached = 0 THEN latency_seconds END) AS avg_latency_seconds,
+            MAX(latency_seconds) AS max_latency_seconds
+        """
+        with self._connect() as conn:
+            summary = self._row(conn.execute(f"SELECT {columns} FROM llm_calls{where}", params).fetchone())
+            if group_by:
+                rows = conn.execute(
+                    f"SELECT {group_by}, {columns} FROM llm_calls{where} GROUP BY {group_by} ORDER BY cost_usd DESC, calls DESC",
+                    params
+                ).fetchall()
+                summary["groups"] = [self._row(row) for row in rows]
+        return summary
+
+    def slowest(self, filters: dict = None, limit: int = 10, since: float = None) -> list:
+        """The slowest model calls (cache hits excluded), slowest first."""
+        where, params = self._where(filters or {}, since)
+        where = f"{where} AND cached = 0" if where else " WHERE cached = 0"
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM llm_calls{where} ORDER BY latency_seconds DESC LIMIT ?", params + [limit]
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    def _row(row) -> dict:
+        data = dict(row)
+        data["total_tokens"] = data["prompt_tokens"] + data["completion_tokens"]
+        data["cost_usd"] = round(data["cost_usd"], 6)
+        for field in ("latency_seconds", "avg_latency_seconds", "max_latency_seconds"):
+            if data.get(field) is not None:
+                data[field] = round(data[field], 3)
+        return data
+
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+def get_llm_usage_store() -> LLMUsageStore:
+    """Return the process-wide usage store, creating it on first use."""
+    global _shared_store
+    if _shared_store is None:
+        with _shared_store_lock:
+            if _shared_store is None:
+                _shared_store = LLMUsageStore()
+    return _shared_store
@@ -0,0 +1,67 @@
+import json
+import os
+import sqlite3
+import time
+from config.langchain_config import LangChainConfig
+
+
+class PipelineCheckpointStore:
+    """SQLite-backed store of per-candidate stage outputs, keyed by pipeline run id.
+
+    Lets a partially failed or interrupted run be resumed, paying only for the
+    stages that never completed. Checkpoints older than ``retention_seconds``
+    are purged whenever a store is opened, i.e. once per checkpointed run.
+    """
+
+    def __init__(self, db_path: str = None, retention_seconds: float = None):
+        self.db_path = db_path or LangChainConfig.PIPELINE_DB_PATH
+        self.retention_seconds = (
+            retention_seconds if retention_seconds is not None else LangChainConfig.CHECKPOINT_RETENTION_SECONDS
+        )
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._init_db()
+        self.purge()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS stage_checkpoints (
+                    run_id TEXT NOT NULL,
+                    candidate_key TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    output TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (run_id, candidate_key, stage)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_stage_checkpoints_created ON stage_checkpoints (created_at)")
+
+    def save_stage(self, run_id: str, candidate_key: str, stage: str, output):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO stage_checkpoints (run_id, candidate_key, stage, output, created_at) VALUES (?, ?, ?, ?, ?)",
+                (run_id, candidate_key, stage, json.dumps(output), time.time())
+            )
+
+    def load_stages(self, run_id: str, candidate_key: str) -> dict:
+        """Return ``{stage: output}`` for every stage this candidate completed in the run."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT stage, output FROM stage_checkpoints WHERE run_id = ? AND candidate_key = ?",
+                (run_id, candidate_key)
+            ).fetchall()
+        return {row["stage"]: json.loads(row["output"]) for row in rows}
+
+    def delete_run(self, run_id: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM stage_checkpoints WHERE run_id = ?", (run_id,))
+
+    def purge(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM stage_checkpoints WHERE created_at < ?", (time.time() - self.retention_seconds,))
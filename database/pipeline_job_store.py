@@ -0,0 +1,172 @@
+import json
+import os
+import sqlite3
+import time
+import uuid
+from config.langchain_config import LangChainConfig
+
+
+class PipelineJobStore:
+    """SQLite-backed store for background pipeline jobs and their partial results.
+
+    Jobs are leased by a worker through a heartbeat timestamp from the moment
+    they are queued, so a job whose owner died (e.g. a restarted gunicorn worker)
+    can be reclaimed by another one, whether it was still queued or already running.
+    """
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or LangChainConfig.PIPELINE_DB_PATH
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pipeline_jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    total INTEGER NOT NULL,
+                    owner TEXT,
+                    heartbeat_at REAL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    error TEXT
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pipeline_job_results (
+                    job_id TEXT NOT NULL,
+                    candidate_index INTEGER NOT NULL,
+                    result TEXT NOT NULL,
+                    PRIMARY KEY (job_id, candidate_index)
+                )
+            """)
+
+    def create_job(self, payload: dict, total: int, owner: str) -> str:
+        """Queue a job owned (and heartbeated) by ``owner`` until it runs."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO pipeline_jobs (id, status, payload, total, owner, heartbeat_at, created_at, updated_at)
+                VALUES (?, 'queued', ?, ?, ?, ?, ?, ?)
+                """,
+                (job_id, json.dumps(payload), total, owner, now, now, now)
+            )
+        return job_id
+
+    def reclaim_job(self, job_id: str, owner: str, lease_seconds: int) -> bool:
+        """Take over a queued or running job whose owner stopped heartbeating; it is queued again for ``owner``."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """
+                UPDATE pipeline_jobs SET status = 'queued', owner = ?, heartbeat_at = ?, updated_at = ?
+                WHERE id = ? AND status IN ('queued', 'running') AND (heartbeat_at IS NULL OR heartbeat_at < ?)
+                """,
+                (owner, now, now, job_id, now - lease_seconds)
+            )
+            return cursor.rowcount == 1
+
+    def claim_job(self, job_id: str, owner: str) -> bool:
+        """Start a queued job owned by ``owner``; False if another worker reclaimed it meanwhile."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """
+                UPDATE pipeline_jobs SET status = 'running', heartbeat_at = ?, updated_at = ?
+                WHERE id = ? AND owner = ? AND status = 'queued'
+                """,
+                (now, now, job_id, owner)
+            )
+            return cursor.rowcount == 1
+
+    def find_stale_jobs(self, lease_seconds: int) -> list:
+        """Return ids of jobs that are queued or running without a live owner."""
+        cutoff = time.time() - lease_seconds
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                SELECT id FROM pipeline_jobs
+                WHERE status IN ('queued', 'running') AND (heartbeat_at IS NULL OR heartbeat_at < ?)
+                ORDER BY created_at
+                """,
+                (cutoff,)
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+    def heartbeat(self, job_ids: list, owner: str):
+        if not job_ids:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE pipeline_jobs SET heartbeat_at = ? WHERE id = ? AND owner = ? AND status IN ('queued', 'running')",
+                [(now, job_id, owner) for job_id in job_ids]
+            )
+
+    def record_result(self, job_id: str, candidate_index: int, result: dict, owner: str) -> bool:
+        """Store a candidate's result; False (nothing stored) if ``owner`` no longer owns the running job."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE pipeline_jobs SET updated_at = ?, heartbeat_at = ? WHERE id = ? AND owner = ? AND status = 'running'",
+                (now, now, job_id, owner)
+            )
+            if cursor.rowcount != 1:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO pipeline_job_results (job_id, candidate_index, result) VALUES (?, ?, ?)",
+                (job_id, candidate_index, json.dumps(result))
+            )
+        return True
+
+    def finish_job(self, job_id: str, status: str, owner: str, error: str = None) -> bool:
+        """Mark the job completed/failed; False if ``owner`` lost it to another worker."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE pipeline_jobs SET status = ?, error = ?, updated_at = ? WHERE id = ? AND owner = ? AND status = 'running'",
+                (status, error, now, job_id, owner)
+            )
+            return cursor.rowcount == 1
+
+    def get_payload(self, job_id: str):
+        with self._connect() as conn:
+            row = conn.execute("SELECT payload FROM pipeline_jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row["payload"]) if row else None
+
+    def get_results(self, job_id: str) -> dict:
+        """Return completed candidate results keyed by their index in the candidate list."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT candidate_index, result FROM pipeline_job_results WHERE job_id = ?",
+                (job_id,)
+            ).fetchall()
+        return {row["candidate_index"]: json.loads(row["result"]) for row in rows}
+
+    def get_job(self, job_id: str):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM pipeline_jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row:
+            return None
+
+        results = list(self.get_results(job_id).values())
+        results.sort(key=lambda x: x.get("score", 0), reverse=True)
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "progress": {"total": row["total"], "completed": len(results)},
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "error": row["error"],
+            "results": results
+        }
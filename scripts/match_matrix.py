@@ -0,0 +1,104 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import re
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agents.central_managing_ai import task_manager
+from utils.pdf_utils import extract_text_from_pdf
+from utils.hash_utils import get_file_hash
+from utils.llm_usage import UsageTotals
+
+# Score every CV against every job ad and write one ranked CSV per job.
+#
+#   python scripts/match_matrix.py                          # data/job_ads × data/cv_pdfs
+#   python scripts/match_matrix.py --candidates cands.json  # candidateList from the API
+#   python scripts/match_matrix.py --jobs jobs.json --workers 8
+
+
+def load_job_posts(jobs_file: str, jobs_dir: str) -> list:
+    if jobs_file:
+        with open(jobs_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    job_posts = []
+    for job_path in sorted(glob.glob(os.path.join(jobs_dir, "*.pdf"))):
+        job_text = extract_text_from_pdf(job_path)
+        if not job_text:
+            print(f"Skipping job ad with no text: {job_path}")
+            continue
+        job_posts.append({
+            "jobTitle": os.path.splitext(os.path.basename(job_path))[0],
+            "jobDescription": job_text
+        })
+    return job_posts
+
+
+def load_candidates(candidates_file: str, cvs_dir: str) -> list:
+    if candidates_file:
+        with open(candidates_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    return [
+        {"firstName": os.path.splitext(os.path.basename(cv_path))[0], "cvPath": cv_path}
+        for cv_path in sorted(glob.glob(os.path.join(cvs_dir, "*.pdf")))
+    ]
+
+
+def write_rankings(matrix: list, candidates: list, out_dir: str):
+    os.makedirs(out_dir, exist_ok=True)
+    # cv_id matches the existing results/*.csv files: the CV file hash when the CV is local
+    cv_ids = {}
+    for candidate in candidates:
+        name = f"{candidate.get('firstName', '')} {candidate.get('lastName', '')}".strip()
+        cv_path = candidate.get("cvPath")
+        cv_ids[name] = get_file_hash(cv_path) if cv_path and os.path.exists(cv_path) else (candidate.get("email") or name)
+
+    for job in matrix:
+        safe_title = re.sub(r"[^A-Za-z0-9_-]+", "_", job["job_title"]).strip("_") or "job"
+        out_path = os.path.join(out_dir, f"ranked_candidates_{safe_title}.csv")
+        with open(out_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["cv_id", "candidate_name", "score", "analysis"])
+            for result in job["results"]:
+                analysis = result.get("match_analysis") or result.get("error", "")
+                writer.writerow([
+                    cv_ids.get(result["candidate_name"], result["candidate_name"]),
+                    result["candidate_name"],
+                    result.get("score", 0),
+                    analysis if isinstance(analysis, str) else json.dumps(analysis)
+                ])
+        print(f"Wrote {len(job['results'])} ranked candidates to {out_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Match every candidate against every job post.")
+    parser.add_argument("--jobs", help="JSON file with a list of jobPost objects (default: PDFs in --jobs-dir)")
+    parser.add_argument("--jobs-dir", default="data/job_ads")
+    parser.add_argument("--candidates", help="JSON file with a candidateList (default: PDFs in --cvs-dir)")
+    parser.add_argument("--cvs-dir", default="data/cv_pdfs")
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent candidates / match calls")
+    parser.add_argument("--time-budget", type=float, default=None, help="Seconds for the whole run; late stages time out")
+    parser.add_argument("--out", default="results")
+    args = parser.parse_args()
+
+    job_posts = load_job_posts(args.jobs, args.jobs_dir)
+    candidates = load_candidates(args.candidates, args.cvs_dir)
+    if not job_posts or not candidates:
+        print("Need at least one job post and one candidate.")
+        return
+
+    print(f"Matching {len(candidates)} candidates against {len(job_posts)} jobs ...")
+    usage = UsageTotals()
+    matrix = task_manager.orchestrate_matrix(job_posts, candidates, max_workers=args.workers,
+                                           time_budget_seconds=args.time_budget, usage=usage)
+    write_rankings(matrix, candidates, args.out)
+    totals = usage.summary()
+    print(f"LLM usage: {totals['calls']} calls ({totals['cached_calls']} cached), "
+          f"{totals['total_tokens']} tokens, ${totals['cost_usd']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
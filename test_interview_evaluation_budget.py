@@ -0,0 +1,22 @@
+from config.langchain_config import LangChainConfig
+from agents.langchain_interview_agent import LangChainInterviewAgent
+
+
+def test_long_interview_keeps_every_answer():
+    budget = LangChainConfig.PROMPT_TOKEN_BUDGETS["evaluate_interview"]
+    # Questions alone are well over the evaluation budget
+    qa_history = [
+        {
+            "question": f"Question {i}: " + "describe how you would design and scale this system " * 40,
+            "answer": f"Answer {i}: I would start by profiling the workload " + "and then iterate " * 60
+        }
+        for i in range(1, 61)
+    ]
+    assert sum(len(pair["question"]) for pair in qa_history) // 4 > budget
+
+    agent = LangChainInterviewAgent.__new__(LangChainInterviewAgent)
+    call = agent._evaluation_call("Backend engineer with five years of Python.", qa_history)
+
+    for i in range(1, 61):
+        assert f"A{i}: Answer {i}: I would start" in call.prompt
+        assert f"Q{i}: Question {i}:" in call.prompt
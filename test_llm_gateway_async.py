@@ -0,0 +1,39 @@
+import asyncio
+from config.langchain_config import LangChainConfig
+from config.llm_gateway import LLMGateway
+
+
+class LoopBoundMessage:
+    def __init__(self, content):
+        self.content = content
+        self.response_metadata = {}
+
+
+class LoopBoundChatModel:
+    """Stands in for ChatGroq over an httpx async pool: only usable on the loop it was first used on."""
+
+    def __init__(self, **kwargs):
+        self.loop = None
+
+    def invoke(self, messages):
+        return LoopBoundMessage("sync")
+
+    async def ainvoke(self, messages):
+        loop = asyncio.get_running_loop()
+        if self.loop is None:
+            self.loop = loop
+        if loop is not self.loop:
+            raise RuntimeError("Event loop is closed")
+        return LoopBoundMessage("async")
+
+
+def test_ainvoke_from_consecutive_event_loops(monkeypatch):
+    monkeypatch.setattr(LangChainConfig, "get_llm", classmethod(lambda cls, **kwargs: LoopBoundChatModel(**kwargs)))
+    gateway = LLMGateway()
+    gateway._cache = None
+    gateway._usage = None
+
+    assert asyncio.run(gateway.ainvoke("first prompt")) == "async"
+    assert asyncio.run(gateway.ainvoke("second prompt")) == "async"
+    # The first loop's clients are dropped once it is closed
+    assert len(gateway._loop_clients) == 1
@@ -0,0 +1,38 @@
+from config.llm_gateway import LLMGateway
+from database.llm_response_cache import LLMResponseCache
+from agents.langchain_job_matcher_agent import parse_match_json
+
+
+def make_gateway(tmp_path, completions):
+    gateway = LLMGateway()
+    gateway._cache = LLMResponseCache(db_path=str(tmp_path / "llm_cache.db"))
+    gateway._usage = None
+    calls = []
+
+    def complete(prompt, model, temperature, max_tokens, json_mode=False):
+        calls.append(prompt)
+        return completions[len(calls) - 1]
+
+    gateway._complete = complete
+    return gateway, calls
+
+
+def is_match(text):
+    return parse_match_json(text) is not None
+
+
+def test_invalid_completion_is_not_cached(tmp_path):
+    gateway, calls = make_gateway(tmp_path, ["not json", '{"score": 80}'])
+
+    assert gateway.invoke("match prompt", validate=is_match) == "not json"
+    # The malformed completion must not be served again: the model is asked a second time
+    assert gateway.invoke("match prompt", validate=is_match) == '{"score": 80}'
+    assert len(calls) == 2
+
+
+def test_valid_completion_is_cached(tmp_path):
+    gateway, calls = make_gateway(tmp_path, ['{"score": 80}'])
+
+    assert gateway.invoke("match prompt", validate=is_match) == '{"score": 80}'
+    assert gateway.invoke("match prompt", validate=is_match) == '{"score": 80}'
+    assert len(calls) == 1
@@ -0,0 +1,24 @@
+import pytest
+from app import app, parse_pipeline_options
+
+
+@pytest.mark.parametrize("field", ["maxWorkers", "shortlistTopK", "shortlistThreshold", "timeBudgetSeconds"])
+def test_pipeline_options_reject_booleans(field):
+    options, error = parse_pipeline_options({field: True})
+    assert options is None
+    assert field in error
+
+
+def test_pipeline_options_accept_numbers():
+    options, error = parse_pipeline_options({"maxWorkers": 2, "shortlistTopK": 5, "shortlistThreshold": 0.3})
+    assert error is None
+    assert options == {"max_workers": 2, "shortlist_top_k": 5, "shortlist_threshold": 0.3}
+
+
+def test_trigger_pipeline_rejects_boolean_narrative_top_k():
+    client = app.test_client()
+    response = client.post("/trigger_pipeline", json={
+        "data": {"jobPost": {"jobDescription": "Python developer"}, "candidateList": [], "narrativeTopK": True}
+    })
+    assert response.status_code == 400
+    assert "narrativeTopK" in response.get_json()["message"]
@@ -0,0 +1,113 @@
+# utils/admission.py
+import math
+import threading
+import time
+from contextlib import contextmanager
+from utils.metrics import ADMISSION_DECISIONS
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; ``retry_after`` is a hint in whole seconds."""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Slot:
+    def __init__(self, controller, endpoint_class: str):
+        self._controller = controller
+        self._endpoint_class = endpoint_class
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release(self._endpoint_class, time.monotonic() - self._started)
+
+
+class AdmissionController:
+    """Per-process admission control for expensive endpoints.
+
+    Each endpoint class has its own concurrency limit and a bounded wait queue.
+    All classes also share ``total`` running slots, of which ``reserved[cls]`` can
+    only be used by that class, so e.g. batch pipelines can never take the last
+    slots that interactive interviews rely on. A request that finds the queue
+    full, or waits longer than ``queue_timeout``, is rejected with a Retry-After hint.
+    """
+
+    def __init__(self, limits: dict, total: int, reserved: dict = None, queue_timeout: float = 30):
+        # limits: endpoint_class -> {"concurrency": int, "queue": int}
+        self.limits = limits
+        self.total = total
+        self.reserved = reserved or {}
+        self.queue_timeout = queue_timeout
+        self._running = {name: 0 for name in limits}
+        self._waiting = {name: 0 for name in limits}
+        # Smoothed time a request of each class holds its slot, used for Retry-After
+        self._hold_seconds = {name: 1.0 for name in limits}
+        self._cond = threading.Condition()
+
+    def _can_run(self, endpoint_class: str) -> bool:
+        if self._running[endpoint_class] >= self.limits[endpoint_class]["concurrency"]:
+            return False
+        held_for_others = sum(
+            max(0, reserved - self._running.get(name, 0))
+            for name, reserved in self.reserved.items() if name != endpoint_class
+        )
+        return sum(self._running.values()) + held_for_others < self.total
+
+    def _retry_after(self, endpoint_class: str) -> int:
+        concurrency = max(1, self.limits[endpoint_class]["concurrency"])
+        backlog = self._waiting[endpoint_class] + 1
+        return max(1, math.ceil(self._hold_seconds[endpoint_class] * backlog / concurrency))
+
+    def acquire(self, endpoint_class: str) -> _Slot:
+        """Wait for a slot of ``endpoint_class``; call ``release()`` on the result when done."""
+        if endpoint_class not in self.limits:
+            raise ValueError(f"Unknown endpoint class: {endpoint_class}")
+
+        with self._cond:
+            if not self._can_run(endpoint_class):
+                if self._waiting[endpoint_class] >= self.limits[endpoint_class]["queue"]:
+                    ADMISSION_DECISIONS.inc(endpoint_class=endpoint_class, outcome="rejected")
+                    raise AdmissionRejected(
+                        f"Too many '{endpoint_class}' requests queued", self._retry_after(endpoint_class)
+                    )
+
+                self._waiting[endpoint_class] += 1
+                try:
+                    if not self._cond.wait_for(lambda: self._can_run(endpoint_class), timeout=self.queue_timeout):
+                        ADMISSION_DECISIONS.inc(endpoint_class=endpoint_class, outcome="timeout")
+                        raise AdmissionRejected(
+                            f"Timed out waiting for a '{endpoint_class}' slot", self._retry_after(endpoint_class)
+                        )
+                finally:
+                    self._waiting[endpoint_class] -= 1
+
+            self._running[endpoint_class] += 1
+            ADMISSION_DECISIONS.inc(endpoint_class=endpoint_class, outcome="admitted")
+            return _Slot(self, endpoint_class)
+
+    @contextmanager
+    def admit(self, endpoint_class: str):
+        """``with admission.admit("batch"): ...`` holds a slot for the duration of the block."""
+        slot = self.acquire(endpoint_class)
+        try:
+            yield
+        finally:
+            slot.release()
+
+    def _release(self, endpoint_class: str, held_seconds: float):
+        with self._cond:
+            self._running[endpoint_class] -= 1
+            self._hold_seconds[endpoint_class] = 0.8 * self._hold_seconds[endpoint_class] + 0.2 * held_seconds
+            self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                name: {"running": self._running[name], "waiting": self._waiting[name], **limit}
+                for name, limit in self.limits.items()
+            }
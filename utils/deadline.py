@@ -0,0 +1,42 @@
+# utils/deadline.py
+import time
+
+
+class Deadline:
+    """An absolute point in time that work has to finish by.
+
+    Created from a time budget in seconds; ``None`` means no limit. Child deadlines
+    (e.g. one per pipeline stage) never outlive their parent.
+    """
+
+    def __init__(self, seconds: float = None, parent: "Deadline" = None):
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+        if parent is not None and parent.expires_at is not None:
+            if self.expires_at is None or parent.expires_at < self.expires_at:
+                self.expires_at = parent.expires_at
+
+    def remaining(self):
+        """Seconds left (never negative), or ``None`` when unbounded."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def child(self, seconds: float = None) -> "Deadline":
+        """A deadline ``seconds`` from now, capped at this one."""
+        return Deadline(seconds, parent=self)
+
+    def timeout(self, default: float = None):
+        """Timeout to hand to a blocking call: the time left, capped at ``default``."""
+        remaining = self.remaining()
+        if remaining is None:
+            return default
+        return remaining if default is None else min(remaining, default)
+
+
+def deadline_from_context(context: dict):
+    """Return the ``Deadline`` carried in a task context, if any."""
+    deadline = (context or {}).get("deadline")
+    return deadline if isinstance(deadline, Deadline) else None
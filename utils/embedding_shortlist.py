@@ -0,0 +1,33 @@
+# utils/embedding_shortlist.py
+import numpy as np
+
+
+def cosine_similarities(embeddings, query_text: str, documents: list) -> np.ndarray:
+    """Cosine similarity between one query and many documents, using a LangChain embeddings model.
+
+    The query is embedded once and all documents in a single batch.
+    """
+    if not documents:
+        return np.zeros(0)
+
+    query_vector = np.asarray(embeddings.embed_query(query_text), dtype=np.float32)
+    doc_matrix = np.asarray(embeddings.embed_documents(documents), dtype=np.float32)
+
+    query_norm = np.linalg.norm(query_vector) or 1.0
+    doc_norms = np.linalg.norm(doc_matrix, axis=1)
+    doc_norms[doc_norms == 0] = 1.0
+    return (doc_matrix @ query_vector) / (doc_norms * query_norm)
+
+
+def select_shortlist(similarities, top_k: int = None, threshold: float = None) -> set:
+    """Return indices that pass the shortlist: the ``top_k`` most similar, or else those at or above ``threshold``.
+
+    ``top_k`` takes precedence, so ``threshold`` only applies when ``top_k`` is None;
+    when neither is given everyone passes.
+    """
+    similarities = np.asarray(similarities)
+    if top_k is not None:
+        return {int(i) for i in np.argsort(-similarities, kind="stable")[:max(0, top_k)]}
+    if threshold is not None:
+        return {int(i) for i in np.flatnonzero(similarities >= threshold)}
+    return set(range(len(similarities)))
@@ -1,18 +1,23 @@
 # utils/file_utils.py
 import requests
 import os
+import threading
 
-def download_pdf_from_url(url, save_dir="data/cv_pdfs", filename=None):
+def download_pdf_from_url(url, save_dir="data/cv_pdfs", filename=None, timeout=30):
     try:
         os.makedirs(save_dir, exist_ok=True)
         if not filename:
             # Extract filename from URL and remove query parameters
             filename = url.split("/")[-1].split("?")[0]
         file_path = os.path.join(save_dir, filename)
-        response = requests.get(url)
+        response = requests.get(url, timeout=timeout)
         if response.status_code == 200:
-            with open(file_path, "wb") as f:
+            # Write to a private temp file and swap it in, so a concurrent download of the
+            # same URL never leaves a half-written file for a reader
+            tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
                 f.write(response.content)
+            os.replace(tmp_path, file_path)
             return file_path
         else:
             print(f"❌ Failed to download file: {url} (status code {response.status_code})")
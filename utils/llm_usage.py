@@ -0,0 +1,51 @@
+# utils/llm_usage.py
+import threading
+
+USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "cost_usd", "latency_seconds")
+
+
+def _empty() -> dict:
+    return {"calls": 0, "cached_calls": 0, "failed_calls": 0, **{field: 0 for field in USAGE_FIELDS}}
+
+
+def _add(totals: dict, record: dict):
+    totals["calls"] += 1
+    if record.get("cached"):
+        totals["cached_calls"] += 1
+    if record.get("status") == "error":
+        totals["failed_calls"] += 1
+    for field in USAGE_FIELDS:
+        totals[field] += record.get(field) or 0
+
+
+def _rounded(totals: dict) -> dict:
+    return {
+        **totals,
+        "total_tokens": totals["prompt_tokens"] + totals["completion_tokens"],
+        "cost_usd": round(totals["cost_usd"], 6),
+        "latency_seconds": round(totals["latency_seconds"], 3)
+    }
+
+
+class UsageTotals:
+    """Running totals of LLM call records (see LLMGateway), overall and per task type.
+
+    Pass one to ``attribution_scope`` to collect the calls made inside it, e.g. one
+    pipeline run or one candidate.
+    """
+
+    def __init__(self):
+        self._totals = _empty()
+        self._by_task = {}
+        self._lock = threading.Lock()
+
+    def add(self, record: dict):
+        with self._lock:
+            _add(self._totals, record)
+            _add(self._by_task.setdefault(record.get("task_type") or "unknown", _empty()), record)
+
+    def summary(self) -> dict:
+        with self._lock:
+            summary = _rounded(self._totals)
+            summary["by_task"] = {task: _rounded(totals) for task, totals in sorted(self._by_task.items())}
+        return summary
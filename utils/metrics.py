@@ -0,0 +1,169 @@
+# utils/metrics.py
+import threading
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels, rendered in Prometheus text format."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels, rendered in Prometheus text format."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    labels = _format_labels(self.labelnames, key, ("le", repr(float(bound))))
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.labelnames, key, ("le", "+Inf"))
+                lines.append(f"{self.name}_bucket{labels} {series['count']}")
+                plain = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{plain} {series['sum']}")
+                lines.append(f"{self.name}_count{plain} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format.
+
+        Values are per process; with several gunicorn workers each scrape sees one worker.
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+TASK_DURATION = REGISTRY.register(Histogram(
+    "smart_recruitment_task_duration_seconds",
+    "Wall time of TaskManager.run_task by task type, agent and outcome.",
+    ("task_type", "agent", "status")
+))
+
+CV_SUMMARY_CACHE = REGISTRY.register(Counter(
+    "smart_recruitment_cv_summary_cache_total",
+    "CV summary lookups in the pipeline, by whether the cached summary was reused.",
+    ("result",)
+))
+
+ADMISSION_DECISIONS = REGISTRY.register(Counter(
+    "smart_recruitment_admission_total",
+    "Requests seen by the admission controller, by endpoint class and outcome.",
+    ("endpoint_class", "outcome")
+))
+
+CANDIDATE_RESULT_CACHE = REGISTRY.register(Counter(
+    "smart_recruitment_candidate_result_cache_total",
+    "Memoized per-candidate pipeline result lookups, by hit or miss.",
+    ("result",)
+))
+
+LLM_CACHE = REGISTRY.register(Counter(
+    "smart_recruitment_llm_cache_total",
+    "LLM response cache lookups, by task type and hit or miss.",
+    ("task_type", "result")
+))
+
+LLM_TOKENS = REGISTRY.register(Counter(
+    "smart_recruitment_llm_tokens_total",
+    "Tokens sent to and generated by the LLM, by task type, model and prompt or completion.",
+    ("task_type", "model", "kind")
+))
+
+LLM_COST = REGISTRY.register(Counter(
+    "smart_recruitment_llm_cost_usd_total",
+    "Estimated LLM spend in USD (LangChainConfig.LLM_PRICES), by task type and model.",
+    ("task_type", "model")
+))
+
+LLM_CALL_DURATION = REGISTRY.register(Histogram(
+    "smart_recruitment_llm_call_duration_seconds",
+    "Latency of single LLM requests by task type, routed model and outcome.",
+    ("task_type", "model", "status")
+))
+
+LLM_OUTPUT_QUALITY = REGISTRY.register(Counter(
+    "smart_recruitment_llm_output_quality_total",
+    "LLM outputs checked by the agents, by task type, routed model and whether they were usable.",
+    ("task_type", "model", "result")
+))
+
+LLM_RETRIES = REGISTRY.register(Counter(
+    "smart_recruitment_llm_retries_total",
+    "LLM calls retried by the gateway, by HTTP status or error type.",
+    ("reason",)
+))
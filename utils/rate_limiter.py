@@ -0,0 +1,171 @@
+# utils/rate_limiter.py
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a caller waited longer than allowed for rate-limit capacity."""
+
+
+class RateLimiter:
+    """Token-bucket pacing for requests per minute and tokens per minute.
+
+    Both buckets refill continuously and a caller proceeds only when both can
+    cover its cost. With ``db_path`` the bucket levels live in SQLite, so every
+    process on the host (e.g. each gunicorn worker) shares the same budget;
+    otherwise they are shared by the threads of this process.
+    A limit of 0 disables that bucket.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, db_path: str = None, name: str = "default"):
+        self.capacity = {"requests": float(requests_per_minute), "tokens": float(tokens_per_minute)}
+        self.rate = {bucket: capacity / 60.0 for bucket, capacity in self.capacity.items()}
+        self.name = name
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        now = time.time()
+        self._levels = {bucket: (capacity, now) for bucket, capacity in self.capacity.items()}
+        if db_path:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self._init_db()
+
+    def _connect(self):
+        # Autocommit mode so BEGIN IMMEDIATE controls the transaction explicitly
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def _init_db(self):
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rate_buckets (
+                    name TEXT NOT NULL,
+                    bucket TEXT NOT NULL,
+                    level REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (name, bucket)
+                )
+            """)
+        finally:
+            conn.close()
+
+    def _take(self, levels: dict, costs: dict, now: float, force: bool = False):
+        """Refill ``levels`` and take ``costs`` if every bucket can cover it (always, with ``force``).
+
+        Returns ``(new_levels, wait_seconds)``; ``wait_seconds`` is 0 when the costs were taken.
+        """
+        refilled = {}
+        wait = 0.0
+        for bucket, cost in costs.items():
+            capacity = self.capacity[bucket]
+            if capacity <= 0:
+                continue
+            level, updated_at = levels.get(bucket, (capacity, now))
+            level = min(capacity, level + (now - updated_at) * self.rate[bucket])
+            refilled[bucket] = level
+            # A single call larger than the bucket only has to wait for a full bucket
+            needed = min(cost, capacity)
+            if level < needed:
+                wait = max(wait, (needed - level) / self.rate[bucket])
+
+        if wait > 0 and not force:
+            return {bucket: (level, now) for bucket, level in refilled.items()}, wait
+        return {bucket: (level - costs[bucket], now) for bucket, level in refilled.items()}, 0.0
+
+    def _apply(self, costs: dict, force: bool = False) -> float:
+        now = time.time()
+        if not self.db_path:
+            with self._lock:
+                levels, wait = self._take(self._levels, costs, now, force)
+                self._levels.update(levels)
+            return wait
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT bucket, level, updated_at FROM rate_buckets WHERE name = ?", (self.name,)
+            ).fetchall()
+            stored = {bucket: (level, updated_at) for bucket, level, updated_at in rows}
+            levels, wait = self._take(stored, costs, now, force)
+            conn.executemany(
+                "INSERT OR REPLACE INTO rate_buckets (name, bucket, level, updated_at) VALUES (?, ?, ?, ?)",
+                [(self.name, bucket, level, updated_at) for bucket, (level, updated_at) in levels.items()]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return wait
+
+    def acquire(self, tokens: int, max_wait: float = None):
+        """Block until one request of about ``tokens`` tokens fits both budgets."""
+        started = time.monotonic()
+        while True:
+            wait = self._apply({"requests": 1, "tokens": tokens})
+            if wait <= 0:
+                return
+            if max_wait is not None and time.monotonic() - started + wait > max_wait:
+                raise RateLimitTimeout(f"Waited too long for LLM rate-limit capacity ({max_wait:.0f}s)")
+            # Jitter so callers woken together don't all retry at the same instant
+            time.sleep(wait * random.uniform(1.0, 1.2))
+
+    async def acquire_async(self, tokens: int, max_wait: float = None):
+        """``acquire`` for coroutines: waits with ``asyncio.sleep`` instead of blocking the thread."""
+        started = time.monotonic()
+        while True:
+            costs = {"requests": 1, "tokens": tokens}
+            # The SQLite-backed buckets take a file lock, so keep that off the event loop
+            wait = await asyncio.to_thread(self._apply, costs) if self.db_path else self._apply(costs)
+            if wait <= 0:
+                return
+            if max_wait is not None and time.monotonic() - started + wait > max_wait:
+                raise RateLimitTimeout(f"Waited too long for LLM rate-limit capacity ({max_wait:.0f}s)")
+            await asyncio.sleep(wait * random.uniform(1.0, 1.2))
+
+    def settle(self, token_delta: int):
+        """Correct the token bucket once the real usage is known (positive = used more than estimated)."""
+        if token_delta:
+            self._apply({"tokens": token_delta}, force=True)
+
+
+def status_code_of(error: Exception):
+    """HTTP status code carried by an API client exception, if any."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error: Exception) -> bool:
+    """429s, 5xx responses and connection/timeout errors are worth retrying."""
+    status = status_code_of(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    name = type(error).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+def retry_after_seconds(error: Exception):
+    """The server's Retry-After hint, when the exception carries the response headers."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: float = None) -> float:
+    """Full-jitter exponential backoff, never shorter than the server's Retry-After."""
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, retry_after + random.uniform(0, base))
+    return delay
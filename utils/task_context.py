@@ -0,0 +1,48 @@
+# utils/task_context.py
+import contextvars
+from contextlib import contextmanager
+
+# Task type being run by TaskManager.run_task on this thread / context
+CURRENT_TASK_TYPE = contextvars.ContextVar("current_task_type", default=None)
+
+
+@contextmanager
+def task_scope(task_type: str):
+    """Mark everything inside the block (e.g. LLM calls) as done on behalf of ``task_type``."""
+    token = CURRENT_TASK_TYPE.set(task_type)
+    try:
+        yield
+    finally:
+        CURRENT_TASK_TYPE.reset(token)
+
+
+def current_task_type():
+    return CURRENT_TASK_TYPE.get()
+
+
+# Who LLM calls are made for (run_id, candidate, session) and the usage totals collecting them
+CURRENT_ATTRIBUTION = contextvars.ContextVar("current_attribution", default=({}, ()))
+
+
+@contextmanager
+def attribution_scope(*totals, **labels):
+    """Attribute LLM calls inside the block to ``labels`` and add them to ``totals``.
+
+    Labels and totals of enclosing scopes still apply; empty labels are ignored.
+    ``totals`` are objects with an ``add(record)`` method (see utils/llm_usage.py).
+    """
+    outer_labels, outer_totals = CURRENT_ATTRIBUTION.get()
+    merged = {**outer_labels, **{name: value for name, value in labels.items() if value}}
+    token = CURRENT_ATTRIBUTION.set((merged, outer_totals + tuple(t for t in totals if t is not None and t not in outer_totals)))
+    try:
+        yield
+    finally:
+        CURRENT_ATTRIBUTION.reset(token)
+
+
+def current_attribution() -> dict:
+    return dict(CURRENT_ATTRIBUTION.get()[0])
+
+
+def current_usage_totals() -> tuple:
+    return CURRENT_ATTRIBUTION.get()[1]
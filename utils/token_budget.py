@@ -0,0 +1,182 @@
+# utils/token_budget.py
+import re
+
+# tiktoken is optional; without it tokens are estimated at ~4 characters each
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _ENCODING = None
+
+CHARS_PER_TOKEN = 4
+TRUNCATION_MARKER = "\n[...truncated]"
+
+# CV section headings and how much each section matters for screening (lower = kept first).
+# Text before the first heading (name, title, contact details) is always kept first.
+CV_SECTIONS = {
+    "skills": (1, ("skills", "technical skills", "core competencies", "competencies", "technologies", "tech stack")),
+    "experience": (2, ("experience", "work experience", "professional experience", "employment",
+                       "employment history", "work history", "internships", "internship")),
+    "projects": (3, ("projects", "personal projects", "academic projects", "key projects")),
+    "summary": (4, ("summary", "profile", "professional summary", "objective", "career objective", "about me")),
+    "education": (5, ("education", "academic background", "qualifications", "academic qualifications")),
+    "certifications": (6, ("certifications", "certificates", "courses", "licenses", "training")),
+    "achievements": (7, ("achievements", "awards", "honors", "honours", "publications")),
+    "languages": (9, ("languages",)),
+    "activities": (9, ("volunteering", "volunteer experience", "extracurricular activities", "activities", "leadership")),
+    "interests": (10, ("interests", "hobbies", "hobbies and interests")),
+    "references": (11, ("references", "referees", "declaration")),
+}
+PREAMBLE_PRIORITY = 0
+OTHER_PRIORITY = 8
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut ``text`` to about ``max_tokens`` tokens, preferring a line or word boundary."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    if _ENCODING is not None:
+        cut = _ENCODING.decode(_ENCODING.encode(text, disallowed_special=())[:max_tokens])
+    else:
+        cut = text[:max_tokens * CHARS_PER_TOKEN]
+    # Back off to a boundary unless that would throw away more than a fifth of the allowance
+    boundary = max(cut.rfind("\n"), cut.rfind(" "))
+    if boundary > len(cut) * 0.8:
+        cut = cut[:boundary]
+    return cut.rstrip() + TRUNCATION_MARKER
+
+
+def fit_sections(sections: list, max_tokens: int) -> dict:
+    """Fit several prompt sections into one token budget.
+
+    ``sections`` is a list of ``(name, text, weight)``. Sections smaller than their
+    weighted share of the budget are kept whole and the unused share is handed to
+    the rest, so only the largest sections get truncated. Returns ``{name: text}``.
+    """
+    counts = {name: count_tokens(text) for name, text, _ in sections}
+    if sum(counts.values()) <= max_tokens:
+        return {name: text for name, text, _ in sections}
+
+    weights = {name: max(weight, 0.0001) for name, _, weight in sections}
+    allowance = {}
+    remaining = max_tokens
+    pending = [name for name, _, _ in sections]
+    while pending:
+        total_weight = sum(weights[name] for name in pending)
+        shares = {name: remaining * weights[name] / total_weight for name in pending}
+        fitting = [name for name in pending if counts[name] <= shares[name]]
+        if not fitting:
+            for name in pending:
+                allowance[name] = int(shares[name])
+            break
+        for name in fitting:
+            allowance[name] = counts[name]
+            remaining -= counts[name]
+            pending.remove(name)
+
+    return {name: truncate_to_tokens(text, allowance[name]) for name, text, _ in sections}
+
+
+def _section_kind(line: str):
+    """The CV section a heading line starts, or None when the line is not a heading."""
+    stripped = line.strip()
+    if not stripped or len(stripped) > 40:
+        return None
+    normalized = " ".join(re.sub(r"[^a-z& ]", " ", stripped.lower()).split()).replace("&", "and")
+    if not normalized:
+        return None
+    for kind, (_, headings) in CV_SECTIONS.items():
+        if normalized in headings:
+            return kind
+    # Short headings like "Technical Skills & Tools" or "PROFESSIONAL EXPERIENCE:"
+    if len(normalized.split()) <= 4:
+        for kind, (_, headings) in CV_SECTIONS.items():
+            if any(normalized.startswith(heading) or normalized.endswith(heading) for heading in headings):
+                return kind
+    return None
+
+
+def split_cv_sections(cv_text: str) -> list:
+    """Split CV text at recognised headings into ``[(kind, text), ...]`` in document order."""
+    sections = []
+    kind, lines = "preamble", []
+    for line in cv_text.splitlines():
+        heading = _section_kind(line)
+        if heading is not None:
+            if any(l.strip() for l in lines):
+                sections.append((kind, "\n".join(lines)))
+            kind, lines = heading, []
+        lines.append(line)
+    if any(l.strip() for l in lines):
+        sections.append((kind, "\n".join(lines)))
+    return sections
+
+
+def fit_cv_text(cv_text: str, max_tokens: int) -> str:
+    """Fit CV text into ``max_tokens`` keeping the most useful sections.
+
+    Sections are kept in priority order (contact header, skills, experience,
+    projects, ...) and the first one that no longer fits is truncated; lower
+    priority sections such as hobbies and references are dropped. The kept
+    sections stay in their original order.
+    """
+    if count_tokens(cv_text) <= max_tokens:
+        return cv_text
+
+    sections = split_cv_sections(cv_text)
+
+    def priority(index):
+        kind = sections[index][0]
+        if kind == "preamble":
+            return PREAMBLE_PRIORITY
+        return CV_SECTIONS[kind][0] if kind in CV_SECTIONS else OTHER_PRIORITY
+
+    kept = {}
+    remaining = max_tokens
+    for index in sorted(range(len(sections)), key=priority):
+        if remaining <= 0:
+            break
+        text = sections[index][1]
+        tokens = count_tokens(text)
+        if tokens > remaining:
+            text = truncate_to_tokens(text, remaining)
+            tokens = remaining
+        kept[index] = text
+        remaining -= tokens
+
+    dropped = [sections[i][0] for i in range(len(sections)) if i not in kept]
+    if dropped:
+        print(f"CV text over budget ({max_tokens} tokens), dropped sections: {', '.join(dropped)}")
+    return "\n".join(kept[index] for index in sorted(kept))
+
+
+def recent_qa_pairs(qa_history: list, max_tokens: int) -> list:
+    """The most recent Q&A pairs that fit in ``max_tokens``, oldest first.
+
+    The latest pair is always kept (with its answer truncated if needed), since
+    the next question follows from it.
+    """
+    kept = []
+    remaining = max_tokens
+    for pair in reversed(qa_history or []):
+        tokens = count_tokens(pair.get("question", "")) + count_tokens(pair.get("answer", ""))
+        if tokens > remaining:
+            if not kept:
+                question = pair.get("question", "")
+                answer = truncate_to_tokens(pair.get("answer", ""), remaining - count_tokens(question))
+                kept.append({**pair, "answer": answer})
+            break
+        kept.append(pair)
+        remaining -= tokens
+    kept.reverse()
+    return kept